@@ -13,4 +13,22 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'medisure.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Imported once the app registry is ready
+from tracker.blockfrost_async import close_shared_client, open_shared_client  # noqa: E402
+
+
+async def application(scope, receive, send):
+    """Django, plus lifespan events that own each worker's pooled Blockfrost client"""
+    if scope['type'] != 'lifespan':
+        return await django_application(scope, receive, send)
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await open_shared_client()
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await close_shared_client()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
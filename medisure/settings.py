@@ -26,6 +26,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'tracker.middleware.RequestMetricsMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
@@ -60,9 +61,43 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Take the write lock at BEGIN so concurrent checkouts queue instead of failing to upgrade.
+        # SQLite has one mode per connection, so every atomic() block takes the write lock;
+        # the app only opens atomic() around writes, so keep read-only code out of them.
+        'OPTIONS': {
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 20,
+        },
     }
 }
 
+# Covering indexes (Index.include) are created on PostgreSQL and ignored by SQLite
+SILENCED_SYSTEM_CHECKS = ['models.W040']
+
+# 'default' holds the caches other processes invalidate (QR verification,
+# journeys, pharmacy dashboards), so it must be shared by every web worker and
+# by the management commands: a database table created by migration
+# tracker 0018 (run `manage.py createcachetable` after changing CACHE_TABLE).
+# The Blockfrost cache only memoises chain lookups
+# and stays per process; LocMemCache evicts least-recently-used keys once
+# MAX_ENTRIES is reached.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': os.getenv('CACHE_TABLE', 'tracker_cache'),
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.getenv('CACHE_MAX_ENTRIES', '50000')),
+        },
+    },
+    'blockfrost': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'blockfrost',
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.getenv('BLOCKFROST_CACHE_MAX_ENTRIES', '10000')),
+        },
+    },
+}
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -95,11 +130,70 @@ CORS_ALLOW_ALL_ORIGINS = True
 REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.AllowAny',
-    ]
+    ],
+    'DEFAULT_PAGINATION_CLASS': 'tracker.pagination.KeysetPagination',
+    'PAGE_SIZE': int(os.getenv('API_PAGE_SIZE', '50')),
 }
 
+# Batches inserted per transaction by /api/mint/bulk/
+BULK_MINT_CHUNK_SIZE = int(os.getenv('BULK_MINT_CHUNK_SIZE', '1000'))
+
 BLOCKFROST_PROJECT_ID = os.getenv('BLOCKFROST_PROJECT_ID', '')
 BLOCKFROST_NETWORK = 'preprod'
+BLOCKFROST_POOL_SIZE = int(os.getenv('BLOCKFROST_POOL_SIZE', '10'))
+BLOCKFROST_CONNECT_TIMEOUT = float(os.getenv('BLOCKFROST_CONNECT_TIMEOUT', '3.05'))
+BLOCKFROST_READ_TIMEOUT = float(os.getenv('BLOCKFROST_READ_TIMEOUT', '10'))
+BLOCKFROST_MAX_WORKERS = int(os.getenv('BLOCKFROST_MAX_WORKERS', str(BLOCKFROST_POOL_SIZE)))
+
+# Seconds to cache each Blockfrost call type (None = forever, 0 = never).
+BLOCKFROST_CACHE_ALIAS = 'blockfrost'
+BLOCKFROST_CACHE_TTLS = {
+    'asset': None,
+    'address': None,
+    'transaction_utxos': None,
+    'asset_history': 60,
+    'asset_addresses': 15,
+}
+BLOCKFROST_NEGATIVE_CACHE_TTL = 30
+
+# Holder answers from the local AssetHolding index are trusted for this many
+# seconds after the last `manage.py sync_chain_index` pass.
+CHAIN_INDEX_MAX_AGE = int(os.getenv('CHAIN_INDEX_MAX_AGE', '120'))
+
+# Public QR verification responses (/api/verify/<qr_code>/) are cached until the
+# batch is saved again by any process (the default cache is shared); unknown codes
+# and Blockfrost failures only for the retry TTL.
+QR_VERIFY_CACHE_TTL = int(os.getenv('QR_VERIFY_CACHE_TTL', '86400'))
+QR_VERIFY_RETRY_TTL = int(os.getenv('QR_VERIFY_RETRY_TTL', '30'))
+QR_VERIFY_MAX_AGE = int(os.getenv('QR_VERIFY_MAX_AGE', '300'))
+
+# Seconds a cached /api/journey/ timeline may show stale entity names; new
+# transactions drop the entry immediately.
+JOURNEY_CACHE_TTL = int(os.getenv('JOURNEY_CACHE_TTL', '300'))
+
+# Seconds a cached /api/pharmacy/dashboard/ may show stale batch details; stock
+# and transaction writes drop the entry immediately.
+PHARMACY_DASHBOARD_CACHE_TTL = int(os.getenv('PHARMACY_DASHBOARD_CACHE_TTL', '300'))
+
+# `manage.py sweep_inventory`: a pharmacy's low-stock threshold is this share of its
+# average unexpired stock line, and never below the floor.
+LOW_STOCK_RATIO = float(os.getenv('LOW_STOCK_RATIO', '0.2'))
+LOW_STOCK_MIN_THRESHOLD = int(os.getenv('LOW_STOCK_MIN_THRESHOLD', '5'))
+
+# When enabled, /api/transfer/ and /api/pharmacy/receive/ answer 202 and leave
+# the on-chain holder check to `manage.py run_chain_verifier`.
+CHAIN_VERIFICATION_DEFERRED = os.getenv('CHAIN_VERIFICATION_DEFERRED', 'False') == 'True'
+CHAIN_VERIFICATION_MAX_ATTEMPTS = int(os.getenv('CHAIN_VERIFICATION_MAX_ATTEMPTS', '8'))
+CHAIN_VERIFICATION_BACKOFF_BASE = int(os.getenv('CHAIN_VERIFICATION_BACKOFF_BASE', '10'))
+CHAIN_VERIFICATION_BACKOFF_MAX = int(os.getenv('CHAIN_VERIFICATION_BACKOFF_MAX', '600'))
+
+# Per-endpoint latency, query and Blockfrost metrics served at /api/_metrics;
+# quantiles cover each endpoint's last METRICS_WINDOW requests.
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'True') == 'True'
+METRICS_WINDOW = int(os.getenv('METRICS_WINDOW', '1024'))
+# Token scrapers send as `Authorization: Bearer <token>` to read /api/_metrics;
+# staff sessions can always read it.
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
 
 STATIC_ROOT = BASE_DIR / 'staticfiles'
 STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
@@ -7,3 +7,4 @@ class TrackerConfig(AppConfig):
 
     def ready(self):
         import tracker.models
+        import tracker.signals
@@ -0,0 +1,122 @@
+import json
+
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
+
+from .blockfrost_async import with_blockfrost_session
+from .models import Batch, ChainVerification
+from .verification import (
+    acheck_receipt_holder,
+    acheck_transfer_holder,
+    queue_verification,
+    record_receipt,
+    record_transfer,
+    verification_accepted_body,
+    verification_mode_deferred,
+)
+from .verify_cache import aget_verification, conditional_verification_response
+
+# Async variants of the chain-bound endpoints for ASGI deployments
+# (e.g. `uvicorn medisure.asgi:application`). They share the helpers in
+# tracker.verification with the sync views and only await on the network.
+
+def _request_data(request):
+    if not request.body:
+        return {}
+    return json.loads(request.body)
+
+async def _verification_accepted(request, kind, batch, wallet_address, payload):
+    pending = await sync_to_async(queue_verification)(kind, batch, wallet_address, payload)
+    return JsonResponse(verification_accepted_body(request, pending, batch), status=202)
+
+@require_GET
+@with_blockfrost_session
+async def verify_medicine(request, qr_code):
+    try:
+        entry = await aget_verification(qr_code)
+        if not entry['found']:
+            return JsonResponse({'success': False, 'error': 'Invalid QR code'}, status=404)
+        return conditional_verification_response(request, entry, JsonResponse)
+
+    except Exception as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+
+@csrf_exempt
+@require_POST
+@with_blockfrost_session
+async def transfer_batch(request):
+    try:
+        transfer_data = _request_data(request)
+        to_wallet = transfer_data.get('to_wallet')
+        batch = await Batch.objects.aget(batch_id=transfer_data['batch_id'])
+
+        # Sync identifiers if provided by frontend
+        updated_policy = transfer_data.get('policy_id')
+        updated_asset = transfer_data.get('asset_name')
+        if updated_policy: batch.policy_id = updated_policy
+        if updated_asset: batch.asset_name = updated_asset
+        if updated_policy or updated_asset: await batch.asave()
+
+        if batch.policy_id and batch.asset_name:
+            if verification_mode_deferred(transfer_data, request.GET):
+                return await _verification_accepted(request, ChainVerification.KIND_TRANSFER, batch, to_wallet, {
+                    'from_wallet': transfer_data['from_wallet'],
+                    'tx_hash': transfer_data['tx_hash']
+                })
+
+            verification = await acheck_transfer_holder(to_wallet, batch.policy_id, batch.asset_name)
+
+            if not verification.get('success') or not verification.get('has_asset'):
+                return JsonResponse({'success': False, 'error': 'Asset not found in receiving wallet'}, status=400)
+
+        await sync_to_async(record_transfer)(batch, transfer_data['from_wallet'], to_wallet, transfer_data['tx_hash'])
+
+        return JsonResponse({
+            'success': True,
+            'message': 'Transfer recorded successfully',
+            'batch_id': batch.batch_id
+        }, status=201)
+
+    except Batch.DoesNotExist:
+        return JsonResponse({'success': False, 'error': 'Batch not found'}, status=404)
+    except Exception as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+
+@csrf_exempt
+@require_POST
+@with_blockfrost_session
+async def receive_batch(request):
+    try:
+        data = _request_data(request)
+        batch_id = data.get('batch_id')
+        wallet_address = data.get('wallet_address')
+        price = data.get('price_per_unit')
+
+        if not all([batch_id, wallet_address, price]):
+            return JsonResponse({'error': 'batch_id, wallet_address, and price_per_unit are required'}, status=400)
+
+        batch = await Batch.objects.aget(id=batch_id)
+
+        if verification_mode_deferred(data, request.GET):
+            return await _verification_accepted(request, ChainVerification.KIND_RECEIVE, batch, wallet_address, {
+                'price_per_unit': str(price)
+            })
+
+        verification = await acheck_receipt_holder(wallet_address, batch.policy_id, batch.asset_name)
+        if not verification.get('has_asset'):
+            return JsonResponse({'error': 'Asset not verified in your wallet on-chain'}, status=400)
+
+        inventory = await sync_to_async(record_receipt)(batch, wallet_address, price, int(verification.get('quantity', 1)))
+
+        return JsonResponse({
+            'success': True,
+            'message': 'Batch received and added to inventory',
+            'inventory_id': str(inventory.id)
+        }, status=201)
+
+    except Batch.DoesNotExist:
+        return JsonResponse({'error': 'Batch not found'}, status=404)
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=400)
@@ -6,6 +6,7 @@ from rest_framework.authtoken.models import Token
 from django.contrib.auth.models import User
 from django.contrib.auth import authenticate
 from tracker.models import Manufacturer, Pharmacy, Distributor
+from tracker.wallets import entity_name
 
 @api_view(['POST'])
 @permission_classes([AllowAny])
@@ -87,20 +88,7 @@ def signin(request):
             entity_id = profile.entity_id
             
             # Fetch entity name
-            name = user.username
-            if entity_id:
-                if role == 'manufacturer':
-                    try:
-                        name = Manufacturer.objects.get(id=entity_id).name
-                    except: pass
-                elif role == 'pharmacy':
-                    try:
-                        name = Pharmacy.objects.get(id=entity_id).name
-                    except: pass
-                elif role == 'distributor':
-                    try:
-                        name = Distributor.objects.get(id=entity_id).name
-                    except: pass
+            name = entity_name(role, entity_id) or user.username
 
             return Response({
                 'success': True,
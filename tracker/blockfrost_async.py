@@ -0,0 +1,288 @@
+import asyncio
+import time
+import weakref
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+import httpx
+from asgiref.sync import sync_to_async
+from blockfrost import ApiError
+from blockfrost.config import DEFAULT_API_VERSION, USER_AGENT
+from blockfrost.utils import convert_json_to_object
+from django.conf import settings
+
+from .blockfrost_utils import (
+    CachedNotFound,
+    cache_policy,
+    get_blockfrost_cache,
+    record_cache_event,
+    unpack_cached,
+)
+from .chain_index import lookup_indexed_holding
+from .metrics import record_blockfrost_call
+
+# Errors the async helpers report as {'success': False} instead of raising
+ASYNC_BLOCKFROST_ERRORS = (ApiError, CachedNotFound, httpx.HTTPError)
+
+class AsyncBlockfrostClient:
+    """Async Blockfrost REST client on a pooled keep-alive httpx connection pool"""
+
+    def __init__(self, project_id, base_url, pool_size=10, timeout=(3.05, 10)):
+        connect_timeout, read_timeout = timeout
+        self.client = httpx.AsyncClient(
+            base_url=f"{base_url}/{DEFAULT_API_VERSION}",
+            headers={'project_id': project_id, 'User-Agent': USER_AGENT},
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+            timeout=httpx.Timeout(read_timeout, connect=connect_timeout)
+        )
+
+    async def _get(self, path, params=None):
+        if params:
+            params = {key: value for key, value in params.items() if value is not None}
+        started = time.perf_counter()
+        try:
+            response = await self.client.get(path, params=params)
+        finally:
+            record_blockfrost_call(time.perf_counter() - started)
+        if response.status_code != 200:
+            raise ApiError(response)
+        return response.json()
+
+    async def _get_list(self, path, count=None, page=None, order=None, gather_pages=False):
+        params = {'count': count, 'page': page, 'order': order}
+        results = await self._get(path, params)
+        if gather_pages:
+            page_size = count or 100
+            page_data = results
+            while len(page_data) == page_size:
+                params['page'] = (params['page'] or 1) + 1
+                page_data = await self._get(path, params)
+                results.extend(page_data)
+        return results
+
+    async def asset(self, asset):
+        return convert_json_to_object(await self._get(f"/assets/{asset}"))
+
+    async def asset_history(self, asset, **kwargs):
+        return convert_json_to_object(await self._get_list(f"/assets/{asset}/history", **kwargs))
+
+    async def asset_addresses(self, asset, **kwargs):
+        return convert_json_to_object(await self._get_list(f"/assets/{asset}/addresses", **kwargs))
+
+    async def address(self, address):
+        return convert_json_to_object(await self._get(f"/addresses/{address}"))
+
+    async def transaction_utxos(self, hash):
+        return convert_json_to_object(await self._get(f"/txs/{hash}/utxos"))
+
+    async def aclose(self):
+        await self.client.aclose()
+
+# httpx connections belong to the event loop that opened them. A long-lived
+# ASGI server loop shares one pooled client, opened and closed by the lifespan
+# handler in medisure.asgi; anywhere else (e.g. async_to_sync under WSGI, where
+# every call gets a fresh loop) a client lives for one blockfrost_session only.
+_shared_clients = weakref.WeakKeyDictionary()
+_session_client = ContextVar('async_blockfrost_client', default=None)
+
+def _new_client():
+    return AsyncBlockfrostClient(
+        project_id=settings.BLOCKFROST_PROJECT_ID,
+        base_url=f"https://cardano-{settings.BLOCKFROST_NETWORK}.blockfrost.io/api",
+        pool_size=settings.BLOCKFROST_POOL_SIZE,
+        timeout=(settings.BLOCKFROST_CONNECT_TIMEOUT, settings.BLOCKFROST_READ_TIMEOUT)
+    )
+
+async def open_shared_client():
+    """Open the pooled client for the running server loop (ASGI lifespan startup)"""
+    loop = asyncio.get_running_loop()
+    if loop not in _shared_clients:
+        _shared_clients[loop] = _new_client()
+
+async def close_shared_client():
+    """Close the pooled client of the running server loop (ASGI lifespan shutdown)"""
+    client = _shared_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
+
+@asynccontextmanager
+async def blockfrost_session():
+    """Scope async Blockfrost calls: use the loop's shared pool, else a client closed on exit"""
+    if _session_client.get() is not None or asyncio.get_running_loop() in _shared_clients:
+        yield
+        return
+    client = _new_client()
+    token = _session_client.set(client)
+    try:
+        yield
+    finally:
+        _session_client.reset(token)
+        await client.aclose()
+
+def with_blockfrost_session(view):
+    """Run an async view inside blockfrost_session()"""
+    @wraps(view)
+    async def wrapper(*args, **kwargs):
+        async with blockfrost_session():
+            return await view(*args, **kwargs)
+    return wrapper
+
+def get_async_blockfrost_api():
+    """Return the Blockfrost client of the current session or server loop"""
+    client = _session_client.get() or _shared_clients.get(asyncio.get_running_loop())
+    if client is None:
+        raise RuntimeError('Async Blockfrost calls must run inside blockfrost_session()')
+    return client
+
+async def acached_lookup(kind, key, fetch, use_cache=True):
+    """Async counterpart of blockfrost_utils.cached_lookup sharing the same cache entries"""
+    cache_key, ttl = cache_policy(kind, key)
+    if ttl == 0:
+        return await fetch()
+
+    cache = get_blockfrost_cache()
+    if use_cache:
+        cached = await cache.aget(cache_key)
+        if cached is not None:
+            return unpack_cached(kind, cached)
+        record_cache_event(kind, 'misses')
+
+    try:
+        value = await fetch()
+    except ApiError as e:
+        if e.status_code == 404:
+            await cache.aset(cache_key, (False, str(e)), settings.BLOCKFROST_NEGATIVE_CACHE_TTL)
+        raise
+    await cache.aset(cache_key, (True, value), ttl)
+    return value
+
+async def afetch_asset_addresses(policy_id, asset_name, use_cache=True):
+    """Return the current holders of an asset as a list"""
+    asset_id = f"{policy_id}{asset_name}"
+    addresses = await acached_lookup('asset_addresses', asset_id, lambda: get_async_blockfrost_api().asset_addresses(asset_id), use_cache)
+    if not isinstance(addresses, list):
+        addresses = [addresses] if hasattr(addresses, 'address') else []
+    return addresses
+
+async def aget_transaction_utxos(tx_hash):
+    """Get UTXOs for a transaction"""
+    try:
+        api = get_async_blockfrost_api()
+        return {
+            'success': True,
+            'data': await acached_lookup('transaction_utxos', tx_hash, lambda: api.transaction_utxos(tx_hash))
+        }
+    except ASYNC_BLOCKFROST_ERRORS as e:
+        return {
+            'success': False,
+            'error': str(e)
+        }
+
+async def aget_address_info(address):
+    """Get information for an address"""
+    try:
+        api = get_async_blockfrost_api()
+        return {
+            'success': True,
+            'data': await acached_lookup('address', address, lambda: api.address(address))
+        }
+    except ASYNC_BLOCKFROST_ERRORS as e:
+        return {
+            'success': False,
+            'error': str(e)
+        }
+
+async def aget_asset_info(policy_id, asset_name):
+    """Get asset information from Blockfrost"""
+    try:
+        api = get_async_blockfrost_api()
+        asset_id = f"{policy_id}{asset_name}"
+        return {
+            'success': True,
+            'data': await acached_lookup('asset', asset_id, lambda: api.asset(asset_id))
+        }
+    except ASYNC_BLOCKFROST_ERRORS as e:
+        return {
+            'success': False,
+            'error': str(e)
+        }
+
+async def aget_asset_history(policy_id, asset_name):
+    """Get transaction history for an asset"""
+    try:
+        api = get_async_blockfrost_api()
+        asset_id = f"{policy_id}{asset_name}"
+        return {
+            'success': True,
+            'data': await acached_lookup('asset_history', asset_id, lambda: api.asset_history(asset_id))
+        }
+    except ASYNC_BLOCKFROST_ERRORS as e:
+        return {
+            'success': False,
+            'error': str(e)
+        }
+
+async def averify_wallet_has_asset(wallet_address, policy_id, asset_name, attempts=3, retry_delay=10):
+    """Verify if a wallet holds a specific asset without blocking the event loop between retries"""
+    indexed = await sync_to_async(lookup_indexed_holding)(wallet_address, policy_id, asset_name)
+    if indexed is not None:
+        return indexed
+
+    for attempt in range(attempts):
+        try:
+            # Always ask the chain here; a cached holder list may predate the transfer being verified
+            addresses = await afetch_asset_addresses(policy_id, asset_name, use_cache=False)
+            for addr in addresses:
+                if addr.address == wallet_address:
+                    return {
+                        'success': True,
+                        'has_asset': True,
+                        'quantity': getattr(addr, 'quantity', '1')
+                    }
+        except ASYNC_BLOCKFROST_ERRORS as e:
+            if attempt == attempts - 1:
+                return {
+                    'success': False,
+                    'error': str(e)
+                }
+
+        if attempt < attempts - 1:
+            await asyncio.sleep(retry_delay)
+
+    return {
+        'success': True,
+        'has_asset': False
+    }
+
+async def _astake_address(holder_item, semaphore):
+    async with semaphore:
+        info = await aget_address_info(holder_item.address)
+    return holder_item, info['data'].stake_address if info['success'] else None
+
+async def averify_stake_has_asset(wallet_address, policy_id, asset_name):
+    """Verify if any address sharing the wallet's stake key holds a specific asset"""
+    try:
+        target_info = await aget_address_info(wallet_address)
+        target_stake = target_info['data'].stake_address if target_info['success'] else None
+        if not target_stake:
+            return {'success': True, 'has_asset': False}
+
+        holders = await afetch_asset_addresses(policy_id, asset_name)
+        semaphore = asyncio.Semaphore(settings.BLOCKFROST_MAX_WORKERS)
+        tasks = [asyncio.ensure_future(_astake_address(holder_item, semaphore)) for holder_item in holders]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                holder_item, holder_stake = await next_done
+                if holder_stake == target_stake:
+                    return {'success': True, 'has_asset': True, 'quantity': holder_item.quantity}
+        finally:
+            for task in tasks:
+                task.cancel()
+
+        return {'success': True, 'has_asset': False}
+    except ASYNC_BLOCKFROST_ERRORS as e:
+        return {
+            'success': False,
+            'error': str(e)
+        }
@@ -1,12 +1,208 @@
-from blockfrost import BlockFrostApi, ApiError
+import contextvars
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import requests
+from requests.adapters import HTTPAdapter
+from blockfrost import ApiError
+from blockfrost.config import DEFAULT_API_VERSION, USER_AGENT
+from blockfrost.utils import convert_json_to_object
 from django.conf import settings
+from django.core.cache import caches
+
+from .metrics import record_blockfrost_call
+
+logger = logging.getLogger(__name__)
+
+class CachedNotFound(Exception):
+    """A Blockfrost 404 replayed from the negative cache"""
+
+# Errors the helpers below report as {'success': False} instead of raising
+BLOCKFROST_ERRORS = (ApiError, CachedNotFound, requests.RequestException)
+
+class BlockfrostClient:
+    """Blockfrost REST client that keeps one pooled keep-alive session per worker"""
+
+    def __init__(self, project_id, base_url, pool_size=10, timeout=(3.05, 10)):
+        self.url = f"{base_url}/{DEFAULT_API_VERSION}"
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.headers.update({
+            'project_id': project_id,
+            'User-Agent': USER_AGENT
+        })
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def _get(self, path, params=None):
+        started = time.perf_counter()
+        try:
+            response = self.session.get(f"{self.url}{path}", params=params, timeout=self.timeout)
+        finally:
+            record_blockfrost_call(time.perf_counter() - started)
+        if response.status_code != 200:
+            raise ApiError(response)
+        return response.json()
+
+    def _get_list(self, path, count=None, page=None, order=None, gather_pages=False):
+        params = {'count': count, 'page': page, 'order': order}
+        results = self._get(path, params)
+        if gather_pages:
+            page_size = count or 100
+            page_data = results
+            while len(page_data) == page_size:
+                params['page'] = (params['page'] or 1) + 1
+                page_data = self._get(path, params)
+                results.extend(page_data)
+        return results
+
+    def asset(self, asset):
+        return convert_json_to_object(self._get(f"/assets/{asset}"))
+
+    def asset_history(self, asset, **kwargs):
+        return convert_json_to_object(self._get_list(f"/assets/{asset}/history", **kwargs))
+
+    def asset_addresses(self, asset, **kwargs):
+        return convert_json_to_object(self._get_list(f"/assets/{asset}/addresses", **kwargs))
+
+    def asset_transactions(self, asset, **kwargs):
+        return convert_json_to_object(self._get_list(f"/assets/{asset}/transactions", **kwargs))
+
+    def address(self, address):
+        return convert_json_to_object(self._get(f"/addresses/{address}"))
+
+    def transaction_utxos(self, hash):
+        return convert_json_to_object(self._get(f"/txs/{hash}/utxos"))
+
+    def close(self):
+        self.session.close()
+
+_client = None
+_client_pid = None
+_client_lock = threading.Lock()
 
 def get_blockfrost_api():
-    """Initialize and return Blockfrost API instance"""
-    return BlockFrostApi(
-        project_id=settings.BLOCKFROST_PROJECT_ID,
-        base_url=f"https://cardano-{settings.BLOCKFROST_NETWORK}.blockfrost.io/api"
-    )
+    """Return the process-wide Blockfrost client, creating it on first use in each worker"""
+    global _client, _client_pid
+    # A forked worker must not share the parent's sockets, so the client is keyed by pid
+    if _client is None or _client_pid != os.getpid():
+        with _client_lock:
+            if _client is None or _client_pid != os.getpid():
+                _client = BlockfrostClient(
+                    project_id=settings.BLOCKFROST_PROJECT_ID,
+                    base_url=f"https://cardano-{settings.BLOCKFROST_NETWORK}.blockfrost.io/api",
+                    pool_size=settings.BLOCKFROST_POOL_SIZE,
+                    timeout=(settings.BLOCKFROST_CONNECT_TIMEOUT, settings.BLOCKFROST_READ_TIMEOUT)
+                )
+                _client_pid = os.getpid()
+    return _client
+
+_cache_stats = {}
+_cache_stats_lock = threading.Lock()
+
+def record_cache_event(kind, outcome):
+    with _cache_stats_lock:
+        counters = _cache_stats.setdefault(kind, {'hits': 0, 'misses': 0, 'negative_hits': 0})
+        counters[outcome] += 1
+
+def blockfrost_cache_stats():
+    """Return per-call-type cache hit/miss counters for this process"""
+    with _cache_stats_lock:
+        return {kind: dict(counters) for kind, counters in _cache_stats.items()}
+
+def to_plain_data(value):
+    """Convert Blockfrost Namespace results into JSON-serializable dicts and lists"""
+    if isinstance(value, list):
+        return [to_plain_data(item) for item in value]
+    if hasattr(value, 'to_dict'):
+        return {key: to_plain_data(item) for key, item in value.to_dict().items()}
+    return value
+
+def get_blockfrost_cache():
+    """Return the Django cache backing Blockfrost lookups"""
+    return caches[settings.BLOCKFROST_CACHE_ALIAS]
+
+def cache_policy(kind, key):
+    """Return the cache key and TTL for a Blockfrost call type"""
+    return f"blockfrost:{kind}:{key}", settings.BLOCKFROST_CACHE_TTLS.get(kind, 0)
+
+def unpack_cached(kind, cached):
+    """Return a cached value, or raise CachedNotFound for a remembered 404"""
+    found, value = cached
+    if found:
+        record_cache_event(kind, 'hits')
+        return value
+    record_cache_event(kind, 'negative_hits')
+    raise CachedNotFound(value)
+
+def cached_lookup(kind, key, fetch, use_cache=True):
+    """Return fetch() through the Blockfrost cache using the TTL configured for this call type.
+
+    A TTL of None caches forever and 0 disables caching. 404s are remembered for
+    BLOCKFROST_NEGATIVE_CACHE_TTL seconds and replayed as CachedNotFound. With
+    use_cache=False the network is always hit but the fresh result is still stored.
+    """
+    cache_key, ttl = cache_policy(kind, key)
+    if ttl == 0:
+        return fetch()
+
+    cache = get_blockfrost_cache()
+    if use_cache:
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return unpack_cached(kind, cached)
+        record_cache_event(kind, 'misses')
+
+    try:
+        value = fetch()
+    except ApiError as e:
+        if e.status_code == 404:
+            cache.set(cache_key, (False, str(e)), settings.BLOCKFROST_NEGATIVE_CACHE_TTL)
+        raise
+    cache.set(cache_key, (True, value), ttl)
+    return value
+
+def peek_cached(kind, key):
+    """Return a cached Blockfrost result without touching the network, or None"""
+    cached = get_blockfrost_cache().get(cache_policy(kind, key)[0])
+    if cached is not None and cached[0]:
+        record_cache_event(kind, 'hits')
+        return cached[1]
+    return None
+
+def fetch_asset_addresses(policy_id, asset_name, use_cache=True):
+    """Return the current holders of an asset as a list"""
+    asset_id = f"{policy_id}{asset_name}"
+    addresses = cached_lookup('asset_addresses', asset_id, lambda: get_blockfrost_api().asset_addresses(asset_id), use_cache)
+    if not isinstance(addresses, list):
+        addresses = [addresses] if hasattr(addresses, 'address') else []
+    return addresses
+
+class ContextThreadPoolExecutor(ThreadPoolExecutor):
+    """Thread pool that runs tasks in the submitter's context, so request metrics follow them"""
+
+    def submit(self, fn, /, *args, **kwargs):
+        return super().submit(contextvars.copy_context().run, fn, *args, **kwargs)
+
+_executor = None
+_executor_pid = None
+
+def get_lookup_executor():
+    """Return the bounded thread pool used to fan out independent Blockfrost lookups"""
+    global _executor, _executor_pid
+    if _executor is None or _executor_pid != os.getpid():
+        with _client_lock:
+            if _executor is None or _executor_pid != os.getpid():
+                _executor = ContextThreadPoolExecutor(
+                    max_workers=settings.BLOCKFROST_MAX_WORKERS,
+                    thread_name_prefix='blockfrost'
+                )
+                _executor_pid = os.getpid()
+    return _executor
 
 def get_transaction_utxos(tx_hash):
     """Get UTXOs for a transaction"""
@@ -14,9 +210,9 @@ def get_transaction_utxos(tx_hash):
         api = get_blockfrost_api()
         return {
             'success': True,
-            'data': api.transaction_utxos(tx_hash)
+            'data': cached_lookup('transaction_utxos', tx_hash, lambda: api.transaction_utxos(tx_hash))
         }
-    except ApiError as e:
+    except BLOCKFROST_ERRORS as e:
         return {
             'success': False,
             'error': str(e)
@@ -28,9 +224,9 @@ def get_address_info(address):
         api = get_blockfrost_api()
         return {
             'success': True,
-            'data': api.address(address)
+            'data': cached_lookup('address', address, lambda: api.address(address))
         }
-    except ApiError as e:
+    except BLOCKFROST_ERRORS as e:
         return {
             'success': False,
             'error': str(e)
@@ -41,12 +237,12 @@ def get_asset_info(policy_id, asset_name):
     try:
         api = get_blockfrost_api()
         asset_id = f"{policy_id}{asset_name}"
-        asset = api.asset(asset_id)
+        asset = cached_lookup('asset', asset_id, lambda: api.asset(asset_id))
         return {
             'success': True,
             'data': asset
         }
-    except ApiError as e:
+    except BLOCKFROST_ERRORS as e:
         return {
             'success': False,
             'error': str(e)
@@ -57,35 +253,34 @@ def get_asset_history(policy_id, asset_name):
     try:
         api = get_blockfrost_api()
         asset_id = f"{policy_id}{asset_name}"
-        history = api.asset_history(asset_id)
+        history = cached_lookup('asset_history', asset_id, lambda: api.asset_history(asset_id))
         return {
             'success': True,
             'data': history
         }
-    except ApiError as e:
+    except BLOCKFROST_ERRORS as e:
         return {
             'success': False,
             'error': str(e)
         }
 
-def verify_wallet_has_asset(wallet_address, policy_id, asset_name):
+def verify_wallet_has_asset(wallet_address, policy_id, asset_name, attempts=3, retry_delay=10):
     """Verify if a wallet holds a specific asset"""
-    import time
-    for attempt in range(3):
+    from .chain_index import lookup_indexed_holding
+
+    indexed = lookup_indexed_holding(wallet_address, policy_id, asset_name)
+    if indexed is not None:
+        return indexed
+
+    for attempt in range(attempts):
         try:
-            api = get_blockfrost_api()
             asset_id = f"{policy_id}{asset_name}"
-            addresses = api.asset_addresses(asset_id)
-            print(f"DEBUG (Attempt {attempt+1}): Found {len(addresses) if isinstance(addresses, list) else 1} holders for {asset_id}")
-            
-            if not isinstance(addresses, list):
-                if hasattr(addresses, 'address'):
-                    addresses = [addresses]
-                else:
-                    addresses = []
+            # Always ask the chain here; a cached holder list may predate the transfer being verified
+            addresses = fetch_asset_addresses(policy_id, asset_name, use_cache=False)
+            logger.debug('Attempt %d: found %d holders for %s', attempt + 1, len(addresses), asset_id)
             
             for addr in addresses:
-                print(f"DEBUG: Holder: {addr.address}")
+                logger.debug('Holder: %s', addr.address)
                 if addr.address == wallet_address:
                     return {
                         'success': True,
@@ -93,13 +288,13 @@ def verify_wallet_has_asset(wallet_address, policy_id, asset_name):
                         'quantity': getattr(addr, 'quantity', '1')
                     }
             
-            if attempt < 2:
-                print("DEBUG: Asset not yet found in recipient wallet. Retrying in 10s...")
-                time.sleep(10)
+            if attempt < attempts - 1:
+                logger.debug('Asset not yet found in recipient wallet, retrying in %ss', retry_delay)
+                time.sleep(retry_delay)
                 
-        except ApiError as e:
-            if attempt < 2:
-                time.sleep(10)
+        except BLOCKFROST_ERRORS as e:
+            if attempt < attempts - 1:
+                time.sleep(retry_delay)
                 continue
             return {
                 'success': False,
@@ -109,4 +304,45 @@ def verify_wallet_has_asset(wallet_address, policy_id, asset_name):
     return {
         'success': True,
         'has_asset': False
-    }
\ No newline at end of file
+    }
+
+def _stake_address(address):
+    info = get_address_info(address)
+    return info['data'].stake_address if info['success'] else None
+
+def verify_stake_has_asset(wallet_address, policy_id, asset_name):
+    """Verify if any address sharing the wallet's stake key holds a specific asset"""
+    try:
+        target_stake = _stake_address(wallet_address)
+        if not target_stake:
+            return {'success': True, 'has_asset': False}
+
+        holders = fetch_asset_addresses(policy_id, asset_name)
+
+        # Address -> stake mappings never change, so answer from the cache before fanning out
+        unresolved = []
+        for holder_item in holders:
+            cached = peek_cached('address', holder_item.address)
+            if cached is None:
+                unresolved.append(holder_item)
+            elif cached.stake_address == target_stake:
+                return {'success': True, 'has_asset': True, 'quantity': holder_item.quantity}
+
+        if not unresolved:
+            return {'success': True, 'has_asset': False}
+
+        futures = {get_lookup_executor().submit(_stake_address, holder_item.address): holder_item for holder_item in unresolved}
+        try:
+            for future in as_completed(futures):
+                if future.result() == target_stake:
+                    return {'success': True, 'has_asset': True, 'quantity': futures[future].quantity}
+        finally:
+            for future in futures:
+                future.cancel()
+
+        return {'success': True, 'has_asset': False}
+    except BLOCKFROST_ERRORS as e:
+        return {
+            'success': False,
+            'error': str(e)
+        }
@@ -0,0 +1,142 @@
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction as db_transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .blockfrost_utils import BLOCKFROST_ERRORS, fetch_asset_addresses, get_blockfrost_api, get_transaction_utxos
+from .models import Batch, AssetHolding, AssetIndexState
+
+# How many pages of asset transactions to walk back before giving up and re-bootstrapping
+MAX_CATCH_UP_PAGES = 10
+
+
+def lookup_indexed_holding(wallet_address, policy_id, asset_name):
+    """Answer a holder check from the local index, or None when the index cannot answer.
+
+    Only positive answers are served from the index: a transfer being verified is
+    usually newer than the last sync, so a miss is always re-checked on-chain.
+    """
+    cutoff = timezone.now() - timedelta(seconds=settings.CHAIN_INDEX_MAX_AGE)
+    holding = AssetHolding.objects.filter(
+        batch__index_state__asset_id=f"{policy_id}{asset_name}",
+        batch__index_state__synced_at__gte=cutoff,
+        address=wallet_address,
+        quantity__gt=0
+    ).values_list('quantity', flat=True).first()
+    if holding is None:
+        return None
+    return {
+        'success': True,
+        'has_asset': True,
+        'quantity': str(holding)
+    }
+
+
+def _asset_quantity(amounts, asset_id):
+    return sum(int(amount.quantity) for amount in amounts if amount.unit == asset_id)
+
+
+def _apply_transaction(balances, utxos, asset_id):
+    """Move the asset balances along one transaction's consumed inputs and produced outputs"""
+    for tx_input in utxos.inputs:
+        if getattr(tx_input, 'collateral', False) or getattr(tx_input, 'reference', False):
+            continue
+        balances[tx_input.address] -= _asset_quantity(tx_input.amount, asset_id)
+    for tx_output in utxos.outputs:
+        if getattr(tx_output, 'collateral', False):
+            continue
+        balances[tx_output.address] += _asset_quantity(tx_output.amount, asset_id)
+
+
+def _new_transactions(asset_id, last_tx_hash):
+    """Return asset transaction hashes newer than last_tx_hash (oldest first), or None if it is out of reach"""
+    api = get_blockfrost_api()
+    newer = []
+    for page in range(1, MAX_CATCH_UP_PAGES + 1):
+        txs = api.asset_transactions(asset_id, order='desc', page=page)
+        for tx in txs:
+            if tx.tx_hash == last_tx_hash:
+                return list(reversed(newer))
+            newer.append(tx.tx_hash)
+        if len(txs) < 100:
+            break
+    return None
+
+
+def _bootstrap(batch, asset_id):
+    """Rebuild a batch's holdings from the current holder list"""
+    holders = fetch_asset_addresses(batch.policy_id, batch.asset_name, use_cache=False)
+    latest = get_blockfrost_api().asset_transactions(asset_id, order='desc', count=1)
+    balances = {holder.address: int(holder.quantity) for holder in holders}
+    return balances, latest[0].tx_hash if latest else None
+
+
+def sync_batch(batch):
+    """Bring the AssetHolding rows for one batch up to date with the chain"""
+    asset_id = f"{batch.policy_id}{batch.asset_name}"
+    state, created = AssetIndexState.objects.get_or_create(batch=batch)
+
+    try:
+        # Chain identifiers can be corrected after minting; start over if they changed
+        newer = None
+        if state.last_tx_hash and state.asset_id == asset_id:
+            newer = _new_transactions(asset_id, state.last_tx_hash)
+        if newer is None:
+            balances, last_tx_hash = _bootstrap(batch, asset_id)
+            replace = True
+        else:
+            balances = defaultdict(int, AssetHolding.objects.filter(batch=batch).values_list('address', 'quantity'))
+            last_tx_hash = state.last_tx_hash
+            for tx_hash in newer:
+                result = get_transaction_utxos(tx_hash)
+                if not result['success']:
+                    raise RuntimeError(result['error'])
+                _apply_transaction(balances, result['data'], asset_id)
+                last_tx_hash = tx_hash
+            replace = False
+    except (RuntimeError, *BLOCKFROST_ERRORS) as e:
+        state.last_error = str(e)
+        state.save(update_fields=['last_error'])
+        return False
+
+    with db_transaction.atomic():
+        holdings = AssetHolding.objects.filter(batch=batch)
+        if replace:
+            holdings.delete()
+        else:
+            holdings.filter(address__in=[address for address, quantity in balances.items() if quantity <= 0]).delete()
+        for address, quantity in balances.items():
+            if quantity > 0:
+                AssetHolding.objects.update_or_create(batch=batch, address=address, defaults={'quantity': quantity})
+        state.asset_id = asset_id
+        state.last_tx_hash = last_tx_hash
+        state.synced_at = timezone.now()
+        state.last_error = None
+        state.save()
+    return True
+
+
+def indexed_batches():
+    """Batches with chain identifiers, least recently synced first"""
+    return Batch.objects.filter(
+        policy_id__isnull=False,
+        asset_name__isnull=False
+    ).exclude(policy_id='').exclude(asset_name='').order_by(F('index_state__synced_at').asc(nulls_first=True))
+
+
+def sync_index(limit=None):
+    """Run one sync pass over the tracked batches; returns (synced, failed)"""
+    batches = indexed_batches()
+    if limit:
+        batches = batches[:limit]
+
+    synced = failed = 0
+    for batch in batches:
+        if sync_batch(batch):
+            synced += 1
+        else:
+            failed += 1
+    return synced, failed
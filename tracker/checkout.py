@@ -0,0 +1,91 @@
+import uuid
+
+from django.db import transaction
+from django.db.models import Case, F, Q, Value, When
+
+from .ledger import record_transactions
+from .models import Cart, PharmacyInventory, Order, OrderItem, Transaction
+
+
+class CheckoutError(Exception):
+    """Raised when a cart cannot be turned into an order; the message is user-facing"""
+
+
+def _stock_updates(items):
+    """Build the single UPDATE that takes every cart line out of stock"""
+    quantity_sold = Case(
+        *[When(pk=item.inventory_item_id, then=Value(item.quantity)) for item in items],
+        default=Value(0)
+    )
+    sells_out = Case(
+        *[When(pk=item.inventory_item_id, quantity_available__lte=item.quantity, then=Value(False)) for item in items],
+        default=F('in_stock')
+    )
+    # Re-checking stock in the WHERE clause guards databases without row locks (SQLite)
+    enough_stock = Q()
+    for item in items:
+        enough_stock |= Q(pk=item.inventory_item_id, in_stock=True, quantity_available__gte=item.quantity)
+    return enough_stock, {'quantity_available': F('quantity_available') - quantity_sold, 'in_stock': sells_out}
+
+
+def place_order(user_id, pharmacy):
+    """Turn a user's cart into an order in one transaction.
+
+    The cart and every inventory row it references are locked, stock is
+    decremented with one UPDATE, and the OrderItems and SOLD transactions are
+    bulk inserted, so concurrent checkouts can never oversell.
+    """
+    with transaction.atomic():
+        cart = Cart.objects.select_for_update().get(user_id=user_id)
+        items = list(cart.items.filter(quantity__gt=0))
+        if not items:
+            raise CheckoutError('Cart is empty')
+
+        # Lock in primary key order so overlapping carts cannot deadlock
+        inventory = {
+            row.pk: row for row in PharmacyInventory.objects.select_for_update(of=('self',)).select_related('batch').filter(
+                pk__in=[item.inventory_item_id for item in items]
+            ).order_by('pk')
+        }
+        for item in items:
+            if not inventory[item.inventory_item_id].in_stock:
+                raise CheckoutError(f"{inventory[item.inventory_item_id].batch.medicine_name} is no longer available")
+            if item.quantity > inventory[item.inventory_item_id].quantity_available:
+                raise CheckoutError(f"Not enough stock for {inventory[item.inventory_item_id].batch.medicine_name}")
+
+        enough_stock, updates = _stock_updates(items)
+        if PharmacyInventory.objects.filter(enough_stock).update(**updates) != len(items):
+            raise CheckoutError('Not enough stock')
+
+        order_items = [
+            OrderItem(
+                inventory_item_id=item.inventory_item_id,
+                quantity=item.quantity,
+                price_per_unit=inventory[item.inventory_item_id].price_per_unit,
+                subtotal=item.quantity * inventory[item.inventory_item_id].price_per_unit
+            )
+            for item in items
+        ]
+        order = Order.objects.create(
+            user_id=user_id,
+            pharmacy=pharmacy,
+            total_amount=sum(order_item.subtotal for order_item in order_items)
+        )
+        for order_item in order_items:
+            order_item.order = order
+        OrderItem.objects.bulk_create(order_items)
+
+        # Record SOLD transactions for journey history
+        record_transactions([
+            Transaction(
+                batch_id=inventory[item.inventory_item_id].batch_id,
+                transaction_type='SOLD',
+                from_wallet=pharmacy.wallet_address,
+                to_wallet=f"Patient-{user_id}",
+                tx_hash=f"SALE-{uuid.uuid4().hex[:16]}"
+            )
+            for item in items
+        ])
+
+        cart.items.all().delete()
+    return order
@@ -0,0 +1,64 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Exists, F, OuterRef, Window
+from django.db.models.functions import RowNumber
+
+from .models import PharmacyInventory, Transaction
+from .serializers import PharmacyInventorySerializer
+
+# Assembled /api/pharmacy/dashboard/ responses, cached per pharmacy wallet.
+# tracker.ledger, the inventory writers and the signals in tracker.signals drop
+# an entry whenever its transactions or stock change; PHARMACY_DASHBOARD_CACHE_TTL
+# bounds how long edits to batch details can show stale values.
+
+def dashboard_cache_key(wallet_address):
+    return f"pharmacy-dashboard:{wallet_address}"
+
+def incoming_transfers(wallet_address, pharmacy_id=None):
+    """Latest TRANSFER to the wallet per batch, for batches not yet in the pharmacy's inventory"""
+    # One ranked pass over the wallet's transfers; a correlated "latest per batch"
+    # subquery would rescan them for every row
+    incoming = Transaction.objects.filter(to_wallet=wallet_address, transaction_type='TRANSFER').annotate(
+        batch_rank=Window(RowNumber(), partition_by=F('batch_id'), order_by=[F('timestamp').desc(), F('id').desc()])
+    ).filter(batch_rank=1)
+    if pharmacy_id:
+        incoming = incoming.exclude(Exists(PharmacyInventory.objects.filter(pharmacy_id=pharmacy_id, batch=OuterRef('batch'))))
+    return [
+        {
+            'id': str(batch_pk),
+            'batch_id': batch_id,
+            'medicine_name': medicine_name,
+            'composition': composition,
+            'expiry_date': expiry_date,
+            'from_wallet': from_wallet,
+            'timestamp': timestamp
+        }
+        for batch_pk, batch_id, medicine_name, composition, expiry_date, from_wallet, timestamp in incoming.order_by('-timestamp').values_list(
+            'batch_id', 'batch__batch_id', 'batch__medicine_name', 'batch__composition', 'batch__expiry_date', 'from_wallet', 'timestamp'
+        )
+    ]
+
+def build_pharmacy_dashboard(wallet_address, pharmacy_id=None):
+    """Return the pharmacy's inventory and pending incoming transfers"""
+    inventory_data = []
+    if pharmacy_id:
+        inventory = PharmacyInventorySerializer.setup_eager_loading(PharmacyInventory.objects.filter(pharmacy_id=pharmacy_id))
+        # A plain list, so the cached value does not drag the serializer along
+        inventory_data = list(PharmacyInventorySerializer(inventory, many=True).data)
+    incoming = incoming_transfers(wallet_address, pharmacy_id)
+    return {
+        'total_inventory': len(inventory_data),
+        'pending_transfers': len(incoming),
+        'inventory': inventory_data,
+        'incoming': incoming
+    }
+
+def get_pharmacy_dashboard(wallet_address, pharmacy_id=None):
+    dashboard = cache.get(dashboard_cache_key(wallet_address))
+    if dashboard is None:
+        dashboard = build_pharmacy_dashboard(wallet_address, pharmacy_id)
+        cache.set(dashboard_cache_key(wallet_address), dashboard, settings.PHARMACY_DASHBOARD_CACHE_TTL)
+    return dashboard
+
+def invalidate_pharmacy_dashboards(wallet_addresses):
+    cache.delete_many([dashboard_cache_key(wallet) for wallet in set(wallet_addresses) if wallet])
@@ -0,0 +1,114 @@
+import csv
+import json
+import uuid
+from datetime import datetime, time
+from itertools import groupby
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .models import Transaction
+
+# Columns of a trace export, in order; values come straight from values_list()
+# so rows are never materialized as model instances.
+EXPORT_COLUMNS = [
+    ('batch_id', 'batch__batch_id'),
+    ('medicine_name', 'batch__medicine_name'),
+    ('manufacturer', 'batch__manufacturer__name'),
+    ('transaction_type', 'transaction_type'),
+    ('from_wallet', 'from_wallet'),
+    ('to_wallet', 'to_wallet'),
+    ('tx_hash', 'tx_hash'),
+    ('timestamp', 'timestamp'),
+]
+EXPORT_FORMATS = ('csv', 'ndjson')
+EXPORT_CHUNK_SIZE = 2000
+
+
+def parse_export_bound(value, end=False):
+    """Parse an ISO date or datetime filter; a bare end date covers the whole day"""
+    if not value:
+        return None
+    parsed = parse_datetime(value)
+    if parsed is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError(f"Invalid date: {value}")
+        parsed = datetime.combine(day, time.max if end else time.min)
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def export_queryset(manufacturer_id=None, batch_id=None, start=None, end=None, journeys=False):
+    """Transactions matching the export filters, ordered by time (or by batch for journeys)"""
+    transactions = Transaction.objects.all()
+    if manufacturer_id:
+        # Validate up front: a bad value would otherwise only fail mid-stream
+        transactions = transactions.filter(batch__manufacturer_id=uuid.UUID(str(manufacturer_id)))
+    if batch_id:
+        transactions = transactions.filter(batch__batch_id=batch_id)
+    if start:
+        transactions = transactions.filter(timestamp__gte=start)
+    if end:
+        transactions = transactions.filter(timestamp__lte=end)
+    ordering = ('batch_id', 'timestamp', 'id') if journeys else ('timestamp', 'id')
+    return transactions.order_by(*ordering).values_list(*[lookup for _, lookup in EXPORT_COLUMNS])
+
+
+def export_rows(queryset, chunk_size=EXPORT_CHUNK_SIZE):
+    names = [name for name, _ in EXPORT_COLUMNS]
+    for values in queryset.iterator(chunk_size=chunk_size):
+        yield dict(zip(names, values))
+
+
+class _Echo:
+    """File-like object whose write() hands the formatted line back to csv.writer's caller"""
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow([name for name, _ in EXPORT_COLUMNS])
+    for row in rows:
+        yield writer.writerow([
+            row[name].isoformat() if isinstance(row[name], datetime) else row[name]
+            for name, _ in EXPORT_COLUMNS
+        ])
+
+
+def ndjson_lines(rows, journeys=False):
+    if not journeys:
+        for row in rows:
+            yield json.dumps(row, cls=DjangoJSONEncoder) + '\n'
+        return
+
+    # Rows arrive ordered by batch, so only one batch's journey is held at a time
+    for batch_id, batch_rows in groupby(rows, key=lambda row: row['batch_id']):
+        batch_rows = list(batch_rows)
+        yield json.dumps({
+            'batch_id': batch_id,
+            'medicine_name': batch_rows[0]['medicine_name'],
+            'manufacturer': batch_rows[0]['manufacturer'],
+            'journey': [
+                {
+                    'type': row['transaction_type'],
+                    'from': row['from_wallet'],
+                    'to': row['to_wallet'],
+                    'timestamp': row['timestamp'],
+                    'tx_hash': row['tx_hash']
+                }
+                for row in batch_rows
+            ]
+        }, cls=DjangoJSONEncoder) + '\n'
+
+
+def export_lines(export_format, queryset, journeys=False, chunk_size=EXPORT_CHUNK_SIZE):
+    """Stream an export as text lines in constant memory"""
+    rows = export_rows(queryset, chunk_size)
+    if export_format == 'csv':
+        return csv_lines(rows)
+    return ndjson_lines(rows, journeys)
@@ -0,0 +1,322 @@
+import csv
+import json
+import uuid
+from decimal import Decimal, InvalidOperation
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .dashboard import invalidate_pharmacy_dashboards
+from .ledger import rebuild_batch_status, record_transactions
+from .models import Manufacturer, Pharmacy, Batch, Transaction, PharmacyInventory
+from .search import sync_search_entries
+from .wallets import sync_wallet_entries
+
+# Columns each import kind expects; optional ones may be blank or absent
+IMPORT_COLUMNS = {
+    'batches': {
+        'required': ('batch_id', 'medicine_name', 'composition', 'manufacturer_wallet', 'manufactured_date', 'expiry_date', 'quantity'),
+        'optional': ('policy_id', 'asset_name', 'qr_code', 'mint_tx_hash', 'minted_at'),
+    },
+    'transactions': {
+        'required': ('batch_id', 'transaction_type', 'to_wallet', 'tx_hash', 'timestamp'),
+        'optional': ('from_wallet',),
+    },
+    'inventory': {
+        'required': ('batch_id', 'pharmacy_wallet', 'quantity_available', 'price_per_unit'),
+        'optional': ('pharmacy_name',),
+    },
+}
+# Model field each free-text column is stored in, for max_length checks
+TEXT_COLUMNS = {
+    'batches': {
+        'batch_id': (Batch, 'batch_id'),
+        'medicine_name': (Batch, 'medicine_name'),
+        'policy_id': (Batch, 'policy_id'),
+        'asset_name': (Batch, 'asset_name'),
+        'qr_code': (Batch, 'qr_code'),
+        'mint_tx_hash': (Transaction, 'tx_hash'),
+    },
+    'transactions': {
+        'from_wallet': (Transaction, 'from_wallet'),
+        'to_wallet': (Transaction, 'to_wallet'),
+        'tx_hash': (Transaction, 'tx_hash'),
+    },
+    'inventory': {
+        'pharmacy_wallet': (Pharmacy, 'wallet_address'),
+        'pharmacy_name': (Pharmacy, 'name'),
+    },
+}
+TRANSACTION_TYPES = {value for value, _ in Transaction.TRANSACTION_TYPES}
+
+
+class RowError(ValueError):
+    """A row that cannot be imported; the rest of its chunk still goes in"""
+
+
+def read_records(path, file_format):
+    """Yield the rows of a CSV or NDJSON file as dicts, one at a time"""
+    with open(path, newline='', encoding='utf-8') as handle:
+        if file_format == 'csv':
+            yield from csv.DictReader(handle)
+            return
+        for line_number, line in enumerate(handle, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError as e:
+                yield RowError(f"Invalid JSON on line {line_number}: {e}")
+
+
+class WalletMap:
+    """In-memory wallet -> pk maps so rows never look entities up one by one"""
+
+    def __init__(self):
+        self.manufacturers = dict(Manufacturer.objects.values_list('wallet_address', 'pk'))
+        self.pharmacies = dict(Pharmacy.objects.values_list('wallet_address', 'pk'))
+
+    def manufacturer(self, wallet_address):
+        try:
+            return self.manufacturers[wallet_address]
+        except KeyError:
+            raise RowError(f"Unknown manufacturer wallet {wallet_address}")
+
+    def ensure_pharmacies(self, rows):
+        """Create the pharmacies a chunk refers to that do not exist yet"""
+        missing = {}
+        for row in rows:
+            wallet_address = row['pharmacy_wallet']
+            if wallet_address not in self.pharmacies and wallet_address not in missing:
+                missing[wallet_address] = Pharmacy(
+                    wallet_address=wallet_address,
+                    name=row.get('pharmacy_name') or f"Pharmacy ({wallet_address[:8]}...)"
+                )
+        created = Pharmacy.objects.bulk_create(missing.values())
+        # bulk_create sends no post_save, so mirror the new wallets explicitly
+        sync_wallet_entries(created)
+        for pharmacy in created:
+            self.pharmacies[pharmacy.wallet_address] = pharmacy.pk
+
+
+def _clean(row, kind):
+    if isinstance(row, Exception):
+        raise RowError(str(row))
+    if not isinstance(row, dict):
+        raise RowError('Row must be an object')
+    columns = IMPORT_COLUMNS[kind]
+    missing = [column for column in columns['required'] if row.get(column) in (None, '')]
+    if missing:
+        raise RowError(f"Missing fields: {', '.join(missing)}")
+    row = {column: None if row.get(column) == '' else row.get(column) for column in columns['required'] + columns['optional']}
+    for column, (model, field) in TEXT_COLUMNS[kind].items():
+        max_length = model._meta.get_field(field).max_length
+        if row[column] is not None and len(str(row[column])) > max_length:
+            raise RowError(f"{column} is longer than {max_length} characters")
+    return row
+
+
+def _date(value, field):
+    try:
+        parsed = parse_date(str(value))
+    except ValueError:
+        # Well formed but impossible, e.g. 2024-02-30
+        raise RowError(f"{field} is not a valid date")
+    if parsed is None:
+        raise RowError(f"{field} must be a YYYY-MM-DD date")
+    return parsed
+
+
+def _datetime(value, field):
+    try:
+        parsed = parse_datetime(str(value))
+    except ValueError:
+        raise RowError(f"{field} is not a valid datetime")
+    if parsed is None:
+        raise RowError(f"{field} must be an ISO datetime")
+    return timezone.make_aware(parsed) if timezone.is_naive(parsed) else parsed
+
+
+def _number(value, field, kind=int):
+    try:
+        return kind(str(value))
+    except (TypeError, ValueError, InvalidOperation):
+        raise RowError(f"{field} must be a number")
+
+
+def _price(value, field):
+    price = _number(value, field, Decimal)
+    try:
+        PharmacyInventory._meta.get_field('price_per_unit').run_validators(price)
+    except ValidationError as e:
+        raise RowError(f"{field}: {' '.join(e.messages)}")
+    return price
+
+
+def _batch_ids(rows):
+    return dict(Batch.objects.filter(batch_id__in={row['batch_id'] for row in rows}).values_list('batch_id', 'pk'))
+
+
+def import_batches(chunk, wallets):
+    errors = []
+    rows = []
+    for number, raw in chunk:
+        try:
+            row = _clean(raw, 'batches')
+            rows.append((number, row, wallets.manufacturer(row['manufacturer_wallet'])))
+        except RowError as e:
+            errors.append((number, str(e)))
+
+    existing = _batch_ids([row for _, row, _ in rows])
+    # QR codes are unique too; check them here so one clash cannot abort the whole chunk
+    qr_codes = set(Batch.objects.filter(qr_code__in={row['qr_code'] for _, row, _ in rows if row['qr_code']}).values_list('qr_code', flat=True))
+    batches = []
+    mints = []
+    for number, row, manufacturer_id in rows:
+        try:
+            if row['batch_id'] in existing:
+                raise RowError(f"Batch {row['batch_id']} already exists")
+            if row['qr_code'] in qr_codes:
+                raise RowError(f"QR code {row['qr_code']} is already in use")
+            batch = Batch(
+                batch_id=row['batch_id'],
+                medicine_name=row['medicine_name'],
+                composition=row['composition'],
+                manufacturer_id=manufacturer_id,
+                manufactured_date=_date(row['manufactured_date'], 'manufactured_date'),
+                expiry_date=_date(row['expiry_date'], 'expiry_date'),
+                quantity=_number(row['quantity'], 'quantity'),
+                policy_id=row['policy_id'],
+                asset_name=row['asset_name'],
+                nft_minted=bool(row['mint_tx_hash']),
+                qr_code=row['qr_code'] or str(uuid.uuid4())
+            )
+            if row['mint_tx_hash']:
+                mints.append(Transaction(
+                    batch=batch,
+                    transaction_type='MINT',
+                    to_wallet=row['manufacturer_wallet'],
+                    tx_hash=row['mint_tx_hash'],
+                    timestamp=_datetime(row['minted_at'], 'minted_at') if row['minted_at'] else timezone.now()
+                ))
+        except RowError as e:
+            errors.append((number, str(e)))
+            continue
+        existing[row['batch_id']] = batch.pk
+        qr_codes.add(batch.qr_code)
+        batches.append(batch)
+
+    Batch.objects.bulk_create(batches)
+    record_transactions(mints)
+    return len(batches), errors
+
+
+def import_transactions(chunk, wallets):
+    errors = []
+    rows = []
+    for number, raw in chunk:
+        try:
+            row = _clean(raw, 'transactions')
+            if row['transaction_type'] not in TRANSACTION_TYPES:
+                raise RowError(f"Unknown transaction_type {row['transaction_type']}")
+            row['timestamp'] = _datetime(row['timestamp'], 'timestamp')
+            rows.append((number, row))
+        except RowError as e:
+            errors.append((number, str(e)))
+
+    batch_ids = _batch_ids([row for _, row in rows])
+    recorded = set(Transaction.objects.filter(
+        batch__in=batch_ids.values(),
+        tx_hash__in={row['tx_hash'] for _, row in rows}
+    ).values_list('tx_hash', 'batch_id'))
+
+    transactions = []
+    for number, row in rows:
+        batch_pk = batch_ids.get(row['batch_id'])
+        if batch_pk is None:
+            errors.append((number, f"Unknown batch {row['batch_id']}"))
+        elif (row['tx_hash'], batch_pk) in recorded:
+            errors.append((number, f"Transaction {row['tx_hash']} already recorded for {row['batch_id']}"))
+        else:
+            recorded.add((row['tx_hash'], batch_pk))
+            transactions.append(Transaction(
+                batch_id=batch_pk,
+                transaction_type=row['transaction_type'],
+                from_wallet=row['from_wallet'],
+                to_wallet=row['to_wallet'],
+                tx_hash=row['tx_hash'],
+                timestamp=row['timestamp']
+            ))
+
+    record_transactions(transactions)
+    # Legacy files are not guaranteed to be chronological, so refold from history
+    rebuild_batch_status(Batch.objects.filter(pk__in={tx.batch_id for tx in transactions}))
+    return len(transactions), errors
+
+
+def import_inventory(chunk, wallets):
+    errors = []
+    rows = []
+    for number, raw in chunk:
+        try:
+            row = _clean(raw, 'inventory')
+            row['quantity_available'] = _number(row['quantity_available'], 'quantity_available')
+            row['price_per_unit'] = _price(row['price_per_unit'], 'price_per_unit')
+            rows.append((number, row))
+        except RowError as e:
+            errors.append((number, str(e)))
+
+    batches = {
+        batch_id: (pk, expiry_date)
+        for batch_id, pk, expiry_date in Batch.objects.filter(
+            batch_id__in={row['batch_id'] for _, row in rows}
+        ).values_list('batch_id', 'pk', 'expiry_date')
+    }
+    wallets.ensure_pharmacies([row for _, row in rows])
+    today = timezone.localdate()
+    inventory = {}
+    for number, row in rows:
+        if row['batch_id'] not in batches:
+            errors.append((number, f"Unknown batch {row['batch_id']}"))
+            continue
+        batch_pk, expiry_date = batches[row['batch_id']]
+        # A later row for the same stock line wins, as with update_or_create
+        pharmacy_pk = wallets.pharmacies[row['pharmacy_wallet']]
+        inventory[pharmacy_pk, batch_pk] = PharmacyInventory(
+            pharmacy_id=pharmacy_pk,
+            batch_id=batch_pk,
+            quantity_available=row['quantity_available'],
+            price_per_unit=row['price_per_unit'],
+            # Same rule as record_receipt: expired stock is imported but never listed
+            in_stock=row['quantity_available'] > 0 and expiry_date > today
+        )
+
+    PharmacyInventory.objects.bulk_create(
+        inventory.values(),
+        update_conflicts=True,
+        unique_fields=['pharmacy', 'batch'],
+        update_fields=['quantity_available', 'price_per_unit', 'in_stock']
+    )
+    sync_search_entries(PharmacyInventory.objects.filter(
+        pharmacy_id__in={pharmacy_pk for pharmacy_pk, _ in inventory},
+        batch_id__in={batch_pk for _, batch_pk in inventory}
+    ))
+    invalidate_pharmacy_dashboards(row['pharmacy_wallet'] for _, row in rows)
+    return len(inventory), errors
+
+
+IMPORTERS = {
+    'batches': import_batches,
+    'transactions': import_transactions,
+    'inventory': import_inventory,
+}
+
+
+def import_chunk(kind, chunk, wallets):
+    """Import one chunk of (row_number, row) pairs atomically; returns (imported, [(row_number, error)])"""
+    with transaction.atomic():
+        imported, errors = IMPORTERS[kind](chunk, wallets)
+    return imported, sorted(errors)
@@ -0,0 +1,51 @@
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import Transaction
+from .wallets import resolve_wallets
+
+# Assembled chain-of-custody timelines, cached per batch pk in the shared default
+# cache. tracker.ledger drops an entry whenever any process writes transactions
+# for the batch; JOURNEY_CACHE_TTL bounds how long a renamed
+# manufacturer/distributor/pharmacy can show its old name.
+
+def journey_cache_key(batch_pk):
+    return f"journey:{batch_pk}"
+
+def build_journey(batch):
+    """Return the batch's timeline with every wallet resolved to its entity"""
+    transactions = list(Transaction.objects.filter(batch=batch).order_by('timestamp').values_list(
+        'transaction_type', 'from_wallet', 'to_wallet', 'timestamp', 'tx_hash'
+    ))
+    entities = resolve_wallets({wallet for tx in transactions for wallet in tx[1:3]})
+
+    journey = []
+    for tx_type, from_wallet, to_wallet, timestamp, tx_hash in transactions:
+        sender = entities.get(from_wallet, {})
+        receiver = entities.get(to_wallet, {})
+        journey.append({
+            'type': tx_type,
+            'from': from_wallet,
+            'from_name': sender.get('name'),
+            'from_role': sender.get('role'),
+            'to': to_wallet,
+            'to_name': receiver.get('name'),
+            'to_role': receiver.get('role'),
+            'timestamp': timestamp,
+            'tx_hash': tx_hash
+        })
+    return {
+        'batch_id': batch.batch_id,
+        'medicine_name': batch.medicine_name,
+        'journey': journey
+    }
+
+def get_journey(batch):
+    journey = cache.get(journey_cache_key(batch.pk))
+    if journey is None:
+        journey = build_journey(batch)
+        cache.set(journey_cache_key(batch.pk), journey, settings.JOURNEY_CACHE_TTL)
+    return journey
+
+def invalidate_journeys(batch_pks):
+    cache.delete_many([journey_cache_key(batch_pk) for batch_pk in batch_pks])
@@ -0,0 +1,86 @@
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import OuterRef, Subquery
+
+from .dashboard import invalidate_pharmacy_dashboards
+from .journey import invalidate_journeys
+from .models import Batch, Transaction
+
+# Lifecycle status a batch moves to after each transaction type. SOLD is a
+# partial sale from pharmacy stock, so it leaves status and holder untouched.
+STATUS_AFTER_TRANSACTION = {
+    'MINT': Batch.STATUS_MINTED,
+    'TRANSFER': Batch.STATUS_IN_TRANSIT,
+    'RECEIVED': Batch.STATUS_DELIVERED,
+}
+
+
+def fold_transactions(transactions, status=None, holder=None):
+    """Return (status, holder, last_tx_at) after replaying transactions in timestamp order"""
+    last_tx_at = None
+    for tx in sorted(transactions, key=lambda tx: tx.timestamp):
+        if tx.transaction_type in STATUS_AFTER_TRANSACTION:
+            status = STATUS_AFTER_TRANSACTION[tx.transaction_type]
+            holder = tx.to_wallet
+        last_tx_at = tx.timestamp
+    return status, holder, last_tx_at
+
+
+def apply_transactions(transactions):
+    """Fold newly written transactions into the denormalized Batch lifecycle columns"""
+    by_batch = defaultdict(list)
+    for tx in transactions:
+        by_batch[tx.batch_id].append(tx)
+
+    # Batches that end in the same state share one UPDATE (e.g. a bulk mint or
+    # transfer); last_tx_at differs per row so it is read back from the history
+    updates = defaultdict(list)
+    for batch_id, batch_transactions in by_batch.items():
+        new_status, holder, last_tx_at = fold_transactions(batch_transactions)
+        updates[new_status, holder].append(batch_id)
+
+    latest = Transaction.objects.filter(batch=OuterRef('pk')).order_by('-timestamp').values('timestamp')[:1]
+    for (new_status, holder), batch_ids in updates.items():
+        fields = {'last_tx_at': Subquery(latest)}
+        if new_status:
+            fields.update(status=new_status, current_holder_wallet=holder)
+        Batch.objects.filter(pk__in=batch_ids).update(**fields)
+    invalidate_journeys(by_batch)
+    invalidate_pharmacy_dashboards(wallet for tx in transactions for wallet in (tx.from_wallet, tx.to_wallet))
+
+
+def record_transactions(transactions, batch_size=None):
+    """Insert transactions in bulk and keep their batches' lifecycle columns in sync"""
+    # Rows and lifecycle columns commit (or roll back) together
+    with transaction.atomic():
+        created = Transaction.objects.bulk_create(transactions, batch_size=batch_size)
+        apply_transactions(created)
+    return created
+
+
+def rebuild_batch_status(batches=None, chunk_size=1000):
+    """Recompute the lifecycle columns of batches from their full transaction history"""
+    batches = (batches if batches is not None else Batch.objects.all()).order_by('pk')
+    rebuilt = 0
+    chunk = []
+    for batch in batches.only('pk', 'nft_minted').iterator(chunk_size=chunk_size):
+        chunk.append(batch)
+        if len(chunk) == chunk_size:
+            rebuilt += _rebuild_chunk(chunk)
+            chunk = []
+    if chunk:
+        rebuilt += _rebuild_chunk(chunk)
+    return rebuilt
+
+
+def _rebuild_chunk(batches):
+    history = defaultdict(list)
+    for tx in Transaction.objects.filter(batch__in=batches).only('batch_id', 'transaction_type', 'to_wallet', 'timestamp'):
+        history[tx.batch_id].append(tx)
+
+    for batch in batches:
+        default_status = Batch.STATUS_MINTED if batch.nft_minted else Batch.STATUS_PENDING
+        batch.status, batch.current_holder_wallet, batch.last_tx_at = fold_transactions(history[batch.pk], status=default_status)
+    Batch.objects.bulk_update(batches, ['status', 'current_holder_wallet', 'last_tx_at'])
+    return len(batches)
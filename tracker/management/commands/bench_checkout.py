@@ -0,0 +1,85 @@
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError, connection, connections
+from django.db.models import Sum
+
+from tracker.checkout import CheckoutError, place_order
+from tracker.management.commands.benchmark_queries import BENCH_PREFIX
+from tracker.models import Manufacturer, Pharmacy, Batch, PharmacyInventory, Cart, CartItem, OrderItem
+
+
+class Command(BaseCommand):
+    help = 'Run concurrent checkouts against shared inventory and report throughput and oversell'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=200, help='Carts to check out')
+        parser.add_argument('--workers', type=int, default=8, help='Concurrent checkout threads')
+        parser.add_argument('--products', type=int, default=5, help='Inventory rows shared by all carts')
+        parser.add_argument('--stock', type=int, default=300, help='Starting stock per inventory row')
+        parser.add_argument('--quantity', type=int, default=2, help='Units of every product per cart')
+
+    def handle(self, *args, **options):
+        if connection.vendor == 'sqlite':
+            self.stdout.write(self.style.WARNING('SQLite serializes writers; run against PostgreSQL for meaningful throughput'))
+
+        inventory, users = self.seed(options)
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['workers']) as executor:
+            outcomes = list(executor.map(lambda user: self.checkout(user, inventory[0].pharmacy), users))
+        elapsed = time.perf_counter() - started
+
+        placed = outcomes.count('placed')
+        self.stdout.write(f"{placed} orders placed, {outcomes.count('sold out')} sold out, {outcomes.count('error')} errors")
+        self.stdout.write(f"{elapsed:.2f}s elapsed, {placed / elapsed:.1f} orders/s")
+
+        for row in PharmacyInventory.objects.filter(pk__in=[row.pk for row in inventory]):
+            sold = OrderItem.objects.filter(inventory_item=row).aggregate(total=Sum('quantity'))['total'] or 0
+            consistent = row.quantity_available >= 0 and sold + row.quantity_available == options['stock']
+            style = self.style.SUCCESS if consistent else self.style.ERROR
+            self.stdout.write(style(f"{row.batch.batch_id}: sold {sold}, remaining {row.quantity_available}, in_stock={row.in_stock}"))
+
+    def checkout(self, user, pharmacy):
+        try:
+            place_order(user.pk, pharmacy)
+            return 'placed'
+        except CheckoutError:
+            return 'sold out'
+        except DatabaseError:
+            return 'error'
+        finally:
+            connections.close_all()
+
+    def seed(self, options):
+        run = uuid.uuid4().hex[:6]
+        manufacturer = Manufacturer.objects.create(name=f"{BENCH_PREFIX}manufacturer-{run}", wallet_address=f"{BENCH_PREFIX}manufacturer-{run}")
+        pharmacy = Pharmacy.objects.create(name=f"{BENCH_PREFIX}pharmacy-{run}", wallet_address=f"{BENCH_PREFIX}pharmacy-{run}")
+        batches = Batch.objects.bulk_create([
+            Batch(
+                batch_id=f"{BENCH_PREFIX}{run}-{i}",
+                medicine_name=f"Medicine {i}",
+                composition='Synthetic checkout batch',
+                manufacturer=manufacturer,
+                manufactured_date='2024-01-01',
+                expiry_date='2030-01-01',
+                quantity=options['stock'],
+                qr_code=f"{BENCH_PREFIX}{run}-{i}"
+            )
+            for i in range(options['products'])
+        ])
+        inventory = PharmacyInventory.objects.bulk_create([
+            PharmacyInventory(pharmacy=pharmacy, batch=batch, quantity_available=options['stock'], price_per_unit=Decimal('2.50'))
+            for batch in batches
+        ])
+        users = User.objects.bulk_create([User(username=f"{BENCH_PREFIX}{run}-{i}") for i in range(options['users'])])
+        users = list(User.objects.filter(username__in=[user.username for user in users]))
+        carts = Cart.objects.bulk_create([Cart(user=user) for user in users])
+        CartItem.objects.bulk_create([
+            CartItem(cart=cart, inventory_item=row, quantity=options['quantity'])
+            for cart in carts for row in inventory
+        ])
+        return inventory, users
@@ -0,0 +1,147 @@
+import statistics
+import time
+import uuid
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from tracker.models import Manufacturer, Pharmacy, Batch, Transaction, PharmacyInventory, Order
+
+BENCH_PREFIX = 'BENCH-'
+
+# Indexes added for the hot access patterns; --compare drops them inside a rolled-back transaction
+HOT_INDEXES = [
+    'tx_batch_timestamp_idx',
+    'tx_batch_type_idx',
+    'tx_to_wallet_type_idx',
+    'tx_timestamp_id_idx',
+    'inventory_stock_idx',
+    'order_user_created_idx',
+]
+
+
+class Command(BaseCommand):
+    help = 'Seed a synthetic trace dataset and report query plans and timings for the hot Transaction queries'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=0, help='Number of Transaction rows to seed before benchmarking')
+        parser.add_argument('--transactions-per-batch', type=int, default=10)
+        parser.add_argument('--repeat', type=int, default=20, help='Timed runs per query')
+        parser.add_argument('--compare', action='store_true', help='Also run every query with the hot indexes dropped')
+        parser.add_argument('--cleanup', action='store_true', help='Delete the seeded rows and exit')
+
+    def handle(self, *args, **options):
+        if options['cleanup']:
+            deleted, _ = Batch.objects.filter(batch_id__startswith=BENCH_PREFIX).delete()
+            Manufacturer.objects.filter(name__startswith=BENCH_PREFIX).delete()
+            Pharmacy.objects.filter(name__startswith=BENCH_PREFIX).delete()
+            User.objects.filter(username__startswith=BENCH_PREFIX).delete()
+            self.stdout.write(f"Deleted {deleted} benchmark rows")
+            return
+
+        if options['seed']:
+            self.seed(options['seed'], options['transactions_per_batch'])
+
+        sample = Batch.objects.filter(batch_id__startswith=BENCH_PREFIX).order_by('batch_id').first()
+        if sample is None:
+            raise CommandError('No benchmark data found; run with --seed N first')
+        user = User.objects.filter(username__startswith=BENCH_PREFIX).first()
+        wallet = Pharmacy.objects.filter(name__startswith=BENCH_PREFIX).values_list('wallet_address', flat=True).first()
+
+        queries = [
+            ('journey (batch ordered by timestamp)', lambda: Transaction.objects.filter(batch=sample).order_by('timestamp')),
+            ('batch + type', lambda: Transaction.objects.filter(batch=sample, transaction_type='RECEIVED')),
+            ('incoming transfers (to_wallet + type)', lambda: Transaction.objects.filter(to_wallet=wallet, transaction_type='TRANSFER')),
+            ('transaction list page', lambda: Transaction.objects.order_by('-timestamp', '-id')[:50]),
+            ('marketplace in-stock', lambda: PharmacyInventory.objects.filter(in_stock=True, quantity_available__gt=0)[:50]),
+            ('user orders page', lambda: Order.objects.filter(user=user).order_by('-created_at', '-id')[:50]),
+        ]
+
+        self.stdout.write(self.style.MIGRATE_HEADING('With indexes'))
+        self.run_queries(queries, options['repeat'])
+
+        if options['compare']:
+            self.stdout.write(self.style.MIGRATE_HEADING('Without indexes'))
+            # SQLite caches prepared EXPLAIN statements per connection, so start a fresh one
+            connection.close()
+            with transaction.atomic():
+                with connection.cursor() as cursor:
+                    for name in HOT_INDEXES:
+                        cursor.execute(f"DROP INDEX {connection.ops.quote_name(name)}")
+                self.run_queries(queries, options['repeat'])
+                transaction.set_rollback(True)
+
+    def run_queries(self, queries, repeat):
+        for label, build in queries:
+            timings = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                list(build())
+                timings.append((time.perf_counter() - started) * 1000)
+            self.stdout.write(self.style.SUCCESS(f"{label}: median {statistics.median(timings):.2f} ms"))
+            self.stdout.write(build().explain())
+
+    def seed(self, total, per_batch):
+        run = uuid.uuid4().hex[:6]
+        manufacturer = Manufacturer.objects.create(name=f"{BENCH_PREFIX}manufacturer-{run}", wallet_address=f"{BENCH_PREFIX}manufacturer-{run}")
+        pharmacies = Pharmacy.objects.bulk_create([
+            Pharmacy(name=f"{BENCH_PREFIX}pharmacy-{run}-{i}", wallet_address=f"{BENCH_PREFIX}pharmacy-{run}-{i}")
+            for i in range(100)
+        ])
+        user = User.objects.create(username=f"{BENCH_PREFIX}{run}")
+        now = timezone.now()
+        chunk = 10000
+        batch_count = max(total // per_batch, 1)
+        created = 0
+
+        for start in range(0, batch_count, chunk):
+            with transaction.atomic():
+                batches = Batch.objects.bulk_create([
+                    Batch(
+                        batch_id=f"{BENCH_PREFIX}{run}-{i}",
+                        medicine_name=f"Medicine {i % 500}",
+                        composition='Synthetic benchmark batch',
+                        manufacturer=manufacturer,
+                        manufactured_date=now.date(),
+                        expiry_date=(now + timedelta(days=365)).date(),
+                        quantity=100,
+                        nft_minted=True,
+                        qr_code=f"{BENCH_PREFIX}{run}-{i}"
+                    )
+                    for i in range(start, min(start + chunk, batch_count))
+                ])
+                txs = []
+                inventory = []
+                for offset, batch in enumerate(batches):
+                    pharmacy = pharmacies[(start + offset) % len(pharmacies)]
+                    for step in range(per_batch):
+                        tx_type = 'MINT' if step == 0 else 'TRANSFER' if step < per_batch - 1 else 'RECEIVED'
+                        txs.append(Transaction(
+                            batch=batch,
+                            transaction_type=tx_type,
+                            from_wallet=manufacturer.wallet_address,
+                            to_wallet=pharmacy.wallet_address,
+                            tx_hash=f"{BENCH_PREFIX}{run}-{start + offset}-{step}"
+                        ))
+                    inventory.append(PharmacyInventory(
+                        pharmacy=pharmacy,
+                        batch=batch,
+                        quantity_available=(start + offset) % 20,
+                        price_per_unit=1 + (start + offset) % 50,
+                        in_stock=(start + offset) % 20 != 0
+                    ))
+                Transaction.objects.bulk_create(txs, batch_size=5000)
+                PharmacyInventory.objects.bulk_create(inventory, batch_size=5000)
+                Order.objects.bulk_create([
+                    Order(user=user, pharmacy=pharmacies[0], total_amount=10)
+                    for _ in range(len(batches) // 10)
+                ])
+                created += len(txs)
+            self.stdout.write(f"Seeded {created}/{batch_count * per_batch} transactions")
+
+        # Refresh planner statistics so the plans reflect the seeded volume
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
@@ -0,0 +1,39 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from tracker.exports import EXPORT_CHUNK_SIZE, EXPORT_FORMATS, export_lines, export_queryset, parse_export_bound
+
+
+class Command(BaseCommand):
+    help = 'Stream a transaction trace export as CSV or NDJSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', dest='export_format', choices=EXPORT_FORMATS, default='csv')
+        parser.add_argument('--manufacturer', dest='manufacturer_id', help='Only batches of this manufacturer')
+        parser.add_argument('--batch', dest='batch_id', help='Only this batch_id')
+        parser.add_argument('--start', help='ISO date or datetime lower bound')
+        parser.add_argument('--end', help='ISO date or datetime upper bound (inclusive)')
+        parser.add_argument('--journeys', action='store_true', help='Order by batch; NDJSON emits one journey per line')
+        parser.add_argument('--output', help='File to write (default: stdout)')
+        parser.add_argument('--chunk-size', type=int, default=EXPORT_CHUNK_SIZE, help='Rows fetched per database round trip')
+
+    def handle(self, *args, **options):
+        try:
+            queryset = export_queryset(
+                manufacturer_id=options['manufacturer_id'],
+                batch_id=options['batch_id'],
+                start=parse_export_bound(options['start']),
+                end=parse_export_bound(options['end'], end=True),
+                journeys=options['journeys']
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        lines = export_lines(options['export_format'], queryset, options['journeys'], options['chunk_size'])
+        output = open(options['output'], 'w', newline='', encoding='utf-8') if options['output'] else sys.stdout
+        try:
+            output.writelines(lines)
+        finally:
+            if options['output']:
+                output.close()
@@ -0,0 +1,67 @@
+import json
+import os
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+
+from tracker.importer import IMPORTERS, WalletMap, import_chunk, read_records
+
+
+class Command(BaseCommand):
+    help = 'Stream legacy batches, transactions or inventory from a CSV/NDJSON file into the database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=sorted(IMPORTERS), help='What the file contains')
+        parser.add_argument('path', help='CSV or NDJSON file to import')
+        parser.add_argument('--format', dest='file_format', choices=['csv', 'ndjson'], help='Defaults to the file extension')
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Rows validated and inserted per transaction')
+        parser.add_argument('--checkpoint', help='Checkpoint file (default: <path>.checkpoint)')
+        parser.add_argument('--restart', action='store_true', help='Ignore an existing checkpoint and start from the first row')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if not os.path.exists(path):
+            raise CommandError(f"{path} does not exist")
+        file_format = options['file_format'] or ('csv' if path.lower().endswith('.csv') else 'ndjson')
+        checkpoint_path = options['checkpoint'] or f"{path}.checkpoint"
+
+        done = 0 if options['restart'] else self.read_checkpoint(checkpoint_path, options['kind'])
+        if done:
+            self.stdout.write(f"Resuming after row {done}")
+
+        wallets = WalletMap()
+        rows = islice(enumerate(read_records(path, file_format), start=1), done, None)
+        imported = failed = 0
+        while True:
+            chunk = list(islice(rows, options['chunk_size']))
+            if not chunk:
+                break
+            count, errors = import_chunk(options['kind'], chunk, wallets)
+            imported += count
+            failed += len(errors)
+            for number, error in errors:
+                self.stderr.write(f"Row {number}: {error}")
+
+            # Only committed chunks are checkpointed, so a rerun never imports a row twice
+            done = chunk[-1][0]
+            self.write_checkpoint(checkpoint_path, options['kind'], done)
+            self.stdout.write(f"{done} rows read, {imported} imported, {failed} rejected")
+
+        if os.path.exists(checkpoint_path):
+            os.remove(checkpoint_path)
+        self.stdout.write(self.style.SUCCESS(f"Imported {imported} {options['kind']} row(s), rejected {failed}"))
+
+    def read_checkpoint(self, checkpoint_path, kind):
+        if not os.path.exists(checkpoint_path):
+            return 0
+        with open(checkpoint_path) as handle:
+            checkpoint = json.load(handle)
+        if checkpoint.get('kind') != kind:
+            raise CommandError(f"{checkpoint_path} belongs to a {checkpoint.get('kind')} import; pass --restart to discard it")
+        return checkpoint['rows']
+
+    def write_checkpoint(self, checkpoint_path, kind, rows):
+        temporary = f"{checkpoint_path}.tmp"
+        with open(temporary, 'w') as handle:
+            json.dump({'kind': kind, 'rows': rows}, handle)
+        os.replace(temporary, checkpoint_path)
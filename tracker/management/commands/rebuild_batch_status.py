@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from tracker.ledger import rebuild_batch_status
+from tracker.models import Batch
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the denormalized Batch status/holder columns from the Transaction history'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--manufacturer', dest='manufacturer_id', help='Only rebuild batches of this manufacturer')
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Batches to rebuild per query')
+
+    def handle(self, *args, **options):
+        batches = Batch.objects.all()
+        if options['manufacturer_id']:
+            batches = batches.filter(manufacturer_id=options['manufacturer_id'])
+        rebuilt = rebuild_batch_status(batches, chunk_size=options['chunk_size'])
+        self.stdout.write(f"Rebuilt status for {rebuilt} batch(es)")
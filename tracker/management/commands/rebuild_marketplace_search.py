@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from tracker.models import PharmacyInventory
+from tracker.search import sync_search_entries
+
+
+class Command(BaseCommand):
+    help = 'Resync the marketplace search index from PharmacyInventory, batches and entity names'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pharmacy', dest='pharmacy_id', help='Only resync listings of this pharmacy')
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Listings to upsert per query')
+
+    def handle(self, *args, **options):
+        inventory = PharmacyInventory.objects.all()
+        if options['pharmacy_id']:
+            inventory = inventory.filter(pharmacy_id=options['pharmacy_id'])
+        synced = sync_search_entries(inventory, chunk_size=options['chunk_size'])
+        self.stdout.write(f"Synced {synced} listing(s)")
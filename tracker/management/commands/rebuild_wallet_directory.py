@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from tracker.wallets import rebuild_wallet_directory
+
+
+class Command(BaseCommand):
+    help = 'Resync the WalletDirectory from the manufacturer, distributor and pharmacy tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Entities to upsert per query')
+
+    def handle(self, *args, **options):
+        synced = rebuild_wallet_directory(chunk_size=options['chunk_size'])
+        self.stdout.write(f"Synced {synced} wallet(s)")
@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from tracker.verification import process_due_verifications
+
+
+class Command(BaseCommand):
+    help = 'Poll Blockfrost for pending transfer/receive verifications and finalize them'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Process due verifications once and exit')
+        parser.add_argument('--interval', type=float, default=5, help='Seconds to sleep when nothing is due')
+        parser.add_argument('--batch-size', type=int, default=50, help='Verifications to process per pass')
+
+    def handle(self, *args, **options):
+        while True:
+            processed = process_due_verifications(limit=options['batch_size'])
+            if processed:
+                self.stdout.write(f"Processed {processed} verification(s)")
+            if options['once']:
+                break
+            if processed < options['batch_size']:
+                time.sleep(options['interval'])
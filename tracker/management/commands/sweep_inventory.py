@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from tracker.sweeper import sweep_inventory
+
+
+class Command(BaseCommand):
+    help = 'Delist expired stock, recompute low-stock thresholds and raise inventory alerts'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help='Keep sweeping until interrupted')
+        parser.add_argument('--interval', type=float, default=3600, help='Seconds between passes when looping')
+
+    def handle(self, *args, **options):
+        while True:
+            started = time.monotonic()
+            counts = sweep_inventory()
+            self.stdout.write(
+                f"Delisted {counts['delisted']} expired line(s), updated {counts['thresholds']} threshold(s), "
+                f"raised {counts['expired_alerts'] + counts['low_stock_alerts']} alert(s), "
+                f"resolved {counts['resolved_alerts']} in {time.monotonic() - started:.1f}s"
+            )
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from tracker.chain_index import sync_batch, sync_index
+from tracker.models import Batch
+
+
+class Command(BaseCommand):
+    help = 'Mirror on-chain asset holders for every minted batch into the AssetHolding index'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help='Keep syncing until interrupted')
+        parser.add_argument('--interval', type=float, default=30, help='Seconds between passes when looping')
+        parser.add_argument('--limit', type=int, default=None, help='Batches to sync per pass')
+        parser.add_argument('--batch', dest='batch_id', help='Only sync this batch_id')
+
+    def handle(self, *args, **options):
+        if options['batch_id']:
+            try:
+                batch = Batch.objects.get(batch_id=options['batch_id'])
+            except Batch.DoesNotExist:
+                raise CommandError(f"Batch {options['batch_id']} not found")
+            if not sync_batch(batch):
+                raise CommandError(f"Sync failed: {batch.index_state.last_error}")
+            self.stdout.write(f"Synced {batch.batch_id}")
+            return
+
+        while True:
+            started = time.monotonic()
+            synced, failed = sync_index(limit=options['limit'])
+            self.stdout.write(f"Synced {synced} batch(es), {failed} failed in {time.monotonic() - started:.1f}s")
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,186 @@
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.utils.crypto import constant_time_compare
+
+# In-process request metrics per resolved URL name, exposed by /api/_metrics.
+# Quantiles cover the last METRICS_WINDOW requests of each endpoint; sums and
+# counts are cumulative since the worker started. Each worker process keeps
+# its own numbers.
+
+QUANTILES = (0.5, 0.9, 0.99)
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# (metric name, help text, RequestSample attribute)
+SUMMARIES = (
+    ('medisure_request_duration_seconds', 'Request latency', 'duration'),
+    ('medisure_db_queries', 'Database queries per request', 'db_queries'),
+    ('medisure_db_duration_seconds', 'Database time per request', 'db_time'),
+    ('medisure_blockfrost_calls', 'Blockfrost API calls per request', 'blockfrost_calls'),
+    ('medisure_blockfrost_duration_seconds', 'Blockfrost API time per request', 'blockfrost_time'),
+)
+
+
+class RequestSample:
+    """Counters for the request being handled; filled in by the query and Blockfrost hooks"""
+    __slots__ = ('duration', 'db_queries', 'db_time', 'blockfrost_calls', 'blockfrost_time', 'lock')
+
+    def __init__(self):
+        self.duration = 0.0
+        self.db_queries = 0
+        self.db_time = 0.0
+        self.blockfrost_calls = 0
+        self.blockfrost_time = 0.0
+        # Blockfrost lookups fanned out to the lookup executor update the same sample
+        self.lock = threading.Lock()
+
+    def add_query(self, elapsed):
+        with self.lock:
+            self.db_queries += 1
+            self.db_time += elapsed
+
+    def add_blockfrost_call(self, elapsed):
+        with self.lock:
+            self.blockfrost_calls += 1
+            self.blockfrost_time += elapsed
+
+
+class Summary:
+    """Sliding-window quantiles plus a cumulative sum and count"""
+
+    def __init__(self, window):
+        self.samples = deque(maxlen=window)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.samples.append(value)
+        self.sum += value
+        self.count += 1
+
+
+# The sample of the request running in this context; copied into sync_to_async
+# threads and into the Blockfrost lookup executor along with the context
+_current_sample = ContextVar('request_sample', default=None)
+_endpoints = {}
+_lock = threading.Lock()
+
+
+def start_request():
+    sample = RequestSample()
+    return sample, _current_sample.set(sample)
+
+
+def stop_recording(token):
+    _current_sample.reset(token)
+
+
+@contextmanager
+def recording(sample):
+    """Make sample current for the block, e.g. while a streamed body is produced"""
+    token = _current_sample.set(sample)
+    try:
+        yield sample
+    finally:
+        _current_sample.reset(token)
+
+
+def finish_request(token, endpoint, status_code, sample):
+    """Record a finished request; token is None when recording already stopped"""
+    if token is not None:
+        stop_recording(token)
+    with _lock:
+        stats = _endpoints.get(endpoint)
+        if stats is None:
+            stats = _endpoints[endpoint] = {
+                'summaries': {attribute: Summary(settings.METRICS_WINDOW) for _, _, attribute in SUMMARIES},
+                'responses': {},
+            }
+        for attribute, summary in stats['summaries'].items():
+            summary.observe(getattr(sample, attribute))
+        status_class = f"{status_code // 100}xx"
+        stats['responses'][status_class] = stats['responses'].get(status_class, 0) + 1
+
+
+def record_query(execute, sql, params, many, context):
+    """connection.execute_wrappers hook timing every query made while a request is measured"""
+    sample = _current_sample.get()
+    if sample is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        sample.add_query(time.perf_counter() - started)
+
+
+def install_query_recorder(connection):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+def record_blockfrost_call(elapsed):
+    sample = _current_sample.get()
+    if sample is not None:
+        sample.add_blockfrost_call(elapsed)
+
+
+def scrape_allowed(request):
+    """Whether the request may read /api/_metrics: a staff session or a METRICS_TOKEN bearer token"""
+    if settings.METRICS_TOKEN and constant_time_compare(
+        request.headers.get('Authorization', ''), f"Bearer {settings.METRICS_TOKEN}"
+    ):
+        return True
+    user = getattr(request, 'user', None)
+    return bool(user and user.is_staff)
+
+
+def _quantile(values, quantile):
+    return values[min(int(quantile * len(values)), len(values) - 1)]
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(**labels):
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + '}'
+
+
+def render_metrics(blockfrost_cache_stats=None):
+    """Prometheus text exposition of every endpoint's summaries and response counts"""
+    with _lock:
+        snapshot = {
+            endpoint: (
+                {attribute: (list(summary.samples), summary.sum, summary.count) for attribute, summary in stats['summaries'].items()},
+                dict(stats['responses']),
+            )
+            for endpoint, stats in _endpoints.items()
+        }
+
+    lines = []
+    for name, help_text, attribute in SUMMARIES:
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} summary"]
+        for endpoint, (summaries, _) in sorted(snapshot.items()):
+            samples, total, count = summaries[attribute]
+            samples.sort()
+            for quantile in QUANTILES if samples else ():
+                lines.append(f"{name}{_labels(endpoint=endpoint, quantile=quantile)} {_quantile(samples, quantile):.6g}")
+            lines.append(f"{name}_sum{_labels(endpoint=endpoint)} {total:.6g}")
+            lines.append(f"{name}_count{_labels(endpoint=endpoint)} {count}")
+
+    lines += ['# HELP medisure_responses_total Responses by status class', '# TYPE medisure_responses_total counter']
+    for endpoint, (_, responses) in sorted(snapshot.items()):
+        for status_class, count in sorted(responses.items()):
+            lines.append(f"medisure_responses_total{_labels(endpoint=endpoint, status=status_class)} {count}")
+
+    if blockfrost_cache_stats is not None:
+        lines += ['# HELP medisure_blockfrost_cache_events_total Blockfrost cache lookups by outcome', '# TYPE medisure_blockfrost_cache_events_total counter']
+        for kind, counters in sorted(blockfrost_cache_stats.items()):
+            for outcome, count in sorted(counters.items()):
+                lines.append(f"medisure_blockfrost_cache_events_total{_labels(kind=kind, outcome=outcome)} {count}")
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,110 @@
+import time
+from functools import partial
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from .metrics import finish_request, recording, start_request, stop_recording
+
+
+class RecordedStream:
+    """Streaming body that keeps counting into the request's sample and records it once.
+
+    Each chunk is produced with the sample current, so queries made while
+    streaming (e.g. an export) are counted. The sample is recorded when the
+    body is exhausted, fails, or is closed by the server (client disconnect).
+    """
+
+    def __init__(self, content, sample, record):
+        self.content = content
+        self.sample = sample
+        self.record = record
+        self.recorded = False
+
+    def close(self):
+        if not self.recorded:
+            self.recorded = True
+            self.record()
+
+
+class SyncRecordedStream(RecordedStream):
+
+    def __iter__(self):
+        self.chunks = iter(self.content)
+        return self
+
+    def __next__(self):
+        try:
+            with recording(self.sample):
+                return next(self.chunks)
+        except BaseException:
+            self.close()
+            raise
+
+
+class AsyncRecordedStream(RecordedStream):
+
+    def __aiter__(self):
+        self.chunks = aiter(self.content)
+        return self
+
+    async def __anext__(self):
+        try:
+            with recording(self.sample):
+                return await anext(self.chunks)
+        except BaseException:
+            self.close()
+            raise
+
+
+class RequestMetricsMiddleware:
+    """Record latency, DB and Blockfrost usage per resolved URL name (see tracker.metrics)"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        sample, token = start_request()
+        started = time.perf_counter()
+        response = None
+        try:
+            response = self.get_response(request)
+            return response
+        finally:
+            self.finish(request, token, sample, started, response)
+
+    async def __acall__(self, request):
+        sample, token = start_request()
+        started = time.perf_counter()
+        response = None
+        try:
+            response = await self.get_response(request)
+            return response
+        finally:
+            self.finish(request, token, sample, started, response)
+
+    def finish(self, request, token, sample, started, response):
+        if response is None or not response.streaming:
+            self.record(request, token, sample, started, response.status_code if response is not None else 500)
+            return
+        # The body is produced after this returns, possibly in another context,
+        # so stop here and record once the stream is done
+        stop_recording(token)
+        record = partial(self.record, request, None, sample, started, response.status_code)
+        stream = AsyncRecordedStream if response.is_async else SyncRecordedStream
+        response.streaming_content = stream(response.streaming_content, sample, record)
+
+    def record(self, request, token, sample, started, status_code):
+        sample.duration = time.perf_counter() - started
+        match = getattr(request, 'resolver_match', None)
+        finish_request(token, match.view_name if match else 'unresolved', status_code, sample)
@@ -0,0 +1,38 @@
+# Generated by Django 6.0 on 2026-10-18 09:47
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0008_chainverification'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AssetIndexState',
+            fields=[
+                ('batch', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='index_state', serialize=False, to='tracker.batch')),
+                ('asset_id', models.CharField(blank=True, max_length=255, null=True)),
+                ('last_tx_hash', models.CharField(blank=True, max_length=255, null=True)),
+                ('synced_at', models.DateTimeField(blank=True, null=True)),
+                ('last_error', models.TextField(blank=True, null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='AssetHolding',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('address', models.CharField(max_length=255)),
+                ('quantity', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('batch', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='holdings', to='tracker.batch')),
+            ],
+            options={
+                'unique_together': {('batch', 'address')},
+            },
+        ),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 6.0 on 2026-10-18 10:21
+
+from django.db import migrations, models
+
+STATUS_AFTER_TRANSACTION = {
+    'MINT': 'Minted',
+    'TRANSFER': 'In Transit',
+    'RECEIVED': 'Delivered',
+}
+
+
+def backfill_batch_status(apps, schema_editor):
+    Batch = apps.get_model('tracker', 'Batch')
+    Transaction = apps.get_model('tracker', 'Transaction')
+
+    batches = {batch.pk: batch for batch in Batch.objects.only('pk', 'nft_minted')}
+    for batch in batches.values():
+        batch.status = 'Minted' if batch.nft_minted else 'Pending'
+    for tx in Transaction.objects.order_by('timestamp').only('batch_id', 'transaction_type', 'to_wallet', 'timestamp'):
+        batch = batches[tx.batch_id]
+        if tx.transaction_type in STATUS_AFTER_TRANSACTION:
+            batch.status = STATUS_AFTER_TRANSACTION[tx.transaction_type]
+            batch.current_holder_wallet = tx.to_wallet
+        batch.last_tx_at = tx.timestamp
+    Batch.objects.bulk_update(batches.values(), ['status', 'current_holder_wallet', 'last_tx_at'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0009_assetholding_assetindexstate'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='batch',
+            name='current_holder_wallet',
+            field=models.CharField(blank=True, max_length=255, null=True),
+        ),
+        migrations.AddField(
+            model_name='batch',
+            name='last_tx_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='batch',
+            name='status',
+            field=models.CharField(choices=[('Pending', 'Pending'), ('Minted', 'Minted'), ('In Transit', 'In Transit'), ('Delivered', 'Delivered')], default='Pending', max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='batch',
+            index=models.Index(fields=['manufacturer', 'status'], name='tracker_bat_manufac_efa7e2_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='batch',
+            index=models.Index(fields=['current_holder_wallet', 'status'], name='tracker_bat_current_2df5e5_idx'),
+        ),
+        migrations.RunPython(backfill_batch_status, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 6.0 on 2026-10-18 11:04
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0010_batch_lifecycle_status'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['user', 'created_at'], name='order_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pharmacyinventory',
+            index=models.Index(fields=['in_stock', 'quantity_available'], name='inventory_stock_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['batch', 'timestamp'], name='tx_batch_timestamp_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['batch', 'transaction_type'], include=('to_wallet', 'timestamp'), name='tx_batch_type_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['to_wallet', 'transaction_type', 'timestamp'], include=('batch', 'from_wallet'), name='tx_to_wallet_type_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['timestamp', 'id'], name='tx_timestamp_id_idx'),
+        ),
+    ]
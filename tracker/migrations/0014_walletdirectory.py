@@ -0,0 +1,36 @@
+# Generated by Django 6.0 on 2026-10-18 14:02
+
+from django.db import migrations, models
+
+
+def backfill_wallet_directory(apps, schema_editor):
+    WalletDirectory = apps.get_model('tracker', 'WalletDirectory')
+    entries = []
+    for role, model_name in (('manufacturer', 'Manufacturer'), ('distributor', 'Distributor'), ('pharmacy', 'Pharmacy')):
+        for entity in apps.get_model('tracker', model_name).objects.only('id', 'name', 'wallet_address'):
+            entries.append(WalletDirectory(wallet_address=entity.wallet_address, role=role, entity_id=entity.pk, name=entity.name))
+    WalletDirectory.objects.bulk_create(entries, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0013_transaction_timestamp_default'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WalletDirectory',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('wallet_address', models.CharField(db_index=True, max_length=255)),
+                ('role', models.CharField(choices=[('manufacturer', 'Manufacturer'), ('distributor', 'Distributor'), ('pharmacy', 'Pharmacy')], max_length=20)),
+                ('entity_id', models.UUIDField()),
+                ('name', models.CharField(max_length=255)),
+            ],
+            options={
+                'unique_together': {('role', 'entity_id')},
+            },
+        ),
+        migrations.RunPython(backfill_wallet_directory, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,117 @@
+# Generated by Django 6.0 on 2026-10-18 15:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+SQLITE_FTS = [
+    """CREATE VIRTUAL TABLE tracker_inventorysearch_fts USING fts5(
+        medicine_name, composition, pharmacy_name, manufacturer_name,
+        content='tracker_inventorysearch', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )""",
+    """CREATE TRIGGER tracker_inventorysearch_fts_insert AFTER INSERT ON tracker_inventorysearch BEGIN
+        INSERT INTO tracker_inventorysearch_fts(rowid, medicine_name, composition, pharmacy_name, manufacturer_name)
+        VALUES (new.id, new.medicine_name, new.composition, new.pharmacy_name, new.manufacturer_name);
+    END""",
+    """CREATE TRIGGER tracker_inventorysearch_fts_delete AFTER DELETE ON tracker_inventorysearch BEGIN
+        INSERT INTO tracker_inventorysearch_fts(tracker_inventorysearch_fts, rowid, medicine_name, composition, pharmacy_name, manufacturer_name)
+        VALUES ('delete', old.id, old.medicine_name, old.composition, old.pharmacy_name, old.manufacturer_name);
+    END""",
+    """CREATE TRIGGER tracker_inventorysearch_fts_update
+        AFTER UPDATE OF medicine_name, composition, pharmacy_name, manufacturer_name ON tracker_inventorysearch BEGIN
+        INSERT INTO tracker_inventorysearch_fts(tracker_inventorysearch_fts, rowid, medicine_name, composition, pharmacy_name, manufacturer_name)
+        VALUES ('delete', old.id, old.medicine_name, old.composition, old.pharmacy_name, old.manufacturer_name);
+        INSERT INTO tracker_inventorysearch_fts(rowid, medicine_name, composition, pharmacy_name, manufacturer_name)
+        VALUES (new.id, new.medicine_name, new.composition, new.pharmacy_name, new.manufacturer_name);
+    END""",
+]
+SQLITE_FTS_DROP = [
+    'DROP TRIGGER IF EXISTS tracker_inventorysearch_fts_update',
+    'DROP TRIGGER IF EXISTS tracker_inventorysearch_fts_delete',
+    'DROP TRIGGER IF EXISTS tracker_inventorysearch_fts_insert',
+    'DROP TABLE IF EXISTS tracker_inventorysearch_fts',
+]
+POSTGRES_FTS = [
+    """ALTER TABLE tracker_inventorysearch ADD COLUMN search_vector tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('simple', medicine_name), 'A') ||
+        setweight(to_tsvector('simple', composition), 'B') ||
+        to_tsvector('simple', pharmacy_name || ' ' || manufacturer_name)
+    ) STORED""",
+    'CREATE INDEX tracker_inventorysearch_vector_idx ON tracker_inventorysearch USING GIN (search_vector)',
+]
+POSTGRES_FTS_DROP = [
+    'DROP INDEX IF EXISTS tracker_inventorysearch_vector_idx',
+    'ALTER TABLE tracker_inventorysearch DROP COLUMN IF EXISTS search_vector',
+]
+
+
+def _execute(schema_editor, statements):
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+def create_fulltext_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        _execute(schema_editor, SQLITE_FTS)
+    elif vendor == 'postgresql':
+        _execute(schema_editor, POSTGRES_FTS)
+
+
+def drop_fulltext_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        _execute(schema_editor, SQLITE_FTS_DROP)
+    elif vendor == 'postgresql':
+        _execute(schema_editor, POSTGRES_FTS_DROP)
+
+
+def backfill_inventory_search(apps, schema_editor):
+    PharmacyInventory = apps.get_model('tracker', 'PharmacyInventory')
+    InventorySearch = apps.get_model('tracker', 'InventorySearch')
+    rows = PharmacyInventory.objects.values_list(
+        'pk', 'pharmacy_id', 'batch__manufacturer_id', 'batch__medicine_name', 'batch__composition',
+        'pharmacy__name', 'batch__manufacturer__name', 'price_per_unit', 'batch__expiry_date'
+    )
+    entries = []
+    for (inventory_id, pharmacy_id, manufacturer_id, medicine_name, composition,
+            pharmacy_name, manufacturer_name, price_per_unit, expiry_date) in rows.iterator(chunk_size=1000):
+        entries.append(InventorySearch(
+            inventory_id=inventory_id, pharmacy_id=pharmacy_id, manufacturer_id=manufacturer_id,
+            medicine_name=medicine_name, composition=composition, pharmacy_name=pharmacy_name,
+            manufacturer_name=manufacturer_name, price_per_unit=price_per_unit, expiry_date=expiry_date
+        ))
+        if len(entries) == 1000:
+            InventorySearch.objects.bulk_create(entries)
+            entries = []
+    InventorySearch.objects.bulk_create(entries)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0014_walletdirectory'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InventorySearch',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('medicine_name', models.CharField(max_length=255)),
+                ('composition', models.TextField()),
+                ('pharmacy_name', models.CharField(max_length=255)),
+                ('manufacturer_name', models.CharField(max_length=255)),
+                ('price_per_unit', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('expiry_date', models.DateField()),
+                ('inventory', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='search_entry', to='tracker.pharmacyinventory')),
+                ('manufacturer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='tracker.manufacturer')),
+                ('pharmacy', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='tracker.pharmacy')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['price_per_unit', 'id'], name='search_price_idx'), models.Index(fields=['expiry_date', 'id'], name='search_expiry_idx'), models.Index(fields=['pharmacy', 'price_per_unit'], name='search_pharmacy_price_idx'), models.Index(fields=['manufacturer', 'price_per_unit'], name='search_manufacturer_price_idx')],
+            },
+        ),
+        migrations.RunPython(create_fulltext_index, drop_fulltext_index),
+        migrations.RunPython(backfill_inventory_search, migrations.RunPython.noop),
+    ]
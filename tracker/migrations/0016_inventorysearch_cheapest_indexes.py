@@ -0,0 +1,22 @@
+# Generated by Django 6.0 on 2026-10-18 16:05
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0015_inventorysearch'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='inventorysearch',
+            index=models.Index(django.db.models.functions.text.Lower('medicine_name'), models.F('price_per_unit'), models.F('expiry_date'), name='search_medicine_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='inventorysearch',
+            index=models.Index(django.db.models.functions.text.Lower('composition'), models.F('price_per_unit'), models.F('expiry_date'), name='search_composition_price_idx'),
+        ),
+    ]
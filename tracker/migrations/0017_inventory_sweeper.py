@@ -0,0 +1,37 @@
+# Generated by Django 6.0 on 2026-10-18 17:20
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tracker', '0016_inventorysearch_cheapest_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pharmacy',
+            name='low_stock_threshold',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='InventoryAlert',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('kind', models.CharField(choices=[('EXPIRED', 'Expired and delisted'), ('LOW_STOCK', 'Low stock')], max_length=10)),
+                ('quantity_available', models.IntegerField()),
+                ('threshold', models.IntegerField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('resolved_at', models.DateTimeField(blank=True, null=True)),
+                ('inventory', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='alerts', to='tracker.pharmacyinventory')),
+                ('pharmacy', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='alerts', to='tracker.pharmacy')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['pharmacy', 'resolved_at', 'created_at'], name='alert_pharmacy_open_idx')],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('resolved_at__isnull', True)), fields=('inventory', 'kind'), name='inventory_alert_open_unique')],
+            },
+        ),
+    ]
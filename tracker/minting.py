@@ -0,0 +1,130 @@
+import uuid
+from itertools import islice
+
+from django.db import DatabaseError, transaction
+from django.utils.dateparse import parse_date
+
+from .ledger import record_transactions
+from .models import Batch, Transaction
+
+MINT_REQUIRED_FIELDS = ('batch_id', 'medicine_name', 'composition', 'manufactured_date', 'expiry_date', 'quantity', 'tx_hash')
+
+
+def _max_length(model, field):
+    return model._meta.get_field(field).max_length
+
+
+def clean_mint_item(item):
+    """Validate one bulk mint entry and return it with typed values; raises ValueError"""
+    if isinstance(item, Exception):
+        raise ValueError(str(item))
+    if not isinstance(item, dict):
+        raise ValueError('Each batch must be a JSON object')
+
+    missing = [field for field in MINT_REQUIRED_FIELDS if item.get(field) in (None, '')]
+    if missing:
+        raise ValueError(f"Missing fields: {', '.join(missing)}")
+
+    cleaned = {field: item[field] for field in MINT_REQUIRED_FIELDS}
+    for field in ('batch_id', 'medicine_name', 'policy_id', 'asset_name'):
+        value = item.get(field)
+        if value is not None and len(str(value)) > _max_length(Batch, field):
+            raise ValueError(f"{field} is too long")
+    if len(str(item['tx_hash'])) > _max_length(Transaction, 'tx_hash'):
+        raise ValueError('tx_hash is too long')
+
+    for field in ('manufactured_date', 'expiry_date'):
+        cleaned[field] = parse_date(str(item[field]))
+        if cleaned[field] is None:
+            raise ValueError(f"{field} must be a YYYY-MM-DD date")
+    try:
+        cleaned['quantity'] = int(item['quantity'])
+    except (TypeError, ValueError):
+        raise ValueError('quantity must be an integer')
+
+    cleaned['policy_id'] = item.get('policy_id')
+    cleaned['asset_name'] = item.get('asset_name')
+    cleaned['manufacturer_wallet'] = item.get('manufacturer_wallet')
+    return cleaned
+
+
+def _mint_chunk(manufacturer, default_wallet, chunk, seen_batch_ids):
+    results = []
+    valid = []
+    for index, item in chunk:
+        try:
+            cleaned = clean_mint_item(item)
+            if cleaned['batch_id'] in seen_batch_ids:
+                raise ValueError('Duplicate batch_id in request')
+        except ValueError as e:
+            results.append({'index': index, 'batch_id': item.get('batch_id') if isinstance(item, dict) else None, 'success': False, 'error': str(e)})
+            continue
+        seen_batch_ids.add(cleaned['batch_id'])
+        valid.append((index, cleaned))
+
+    existing_batch_ids = set(Batch.objects.filter(batch_id__in=[cleaned['batch_id'] for _, cleaned in valid]).values_list('batch_id', flat=True))
+
+    batches = []
+    transactions = []
+    minted = []
+    for index, cleaned in valid:
+        if cleaned['batch_id'] in existing_batch_ids:
+            results.append({'index': index, 'batch_id': cleaned['batch_id'], 'success': False, 'error': 'batch_id already exists'})
+            continue
+        batch = Batch(
+            batch_id=cleaned['batch_id'],
+            medicine_name=cleaned['medicine_name'],
+            composition=cleaned['composition'],
+            manufacturer=manufacturer,
+            manufactured_date=cleaned['manufactured_date'],
+            expiry_date=cleaned['expiry_date'],
+            quantity=cleaned['quantity'],
+            policy_id=cleaned['policy_id'],
+            asset_name=cleaned['asset_name'],
+            nft_minted=True,
+            qr_code=str(uuid.uuid4())
+        )
+        batches.append(batch)
+        transactions.append(Transaction(
+            batch=batch,
+            transaction_type='MINT',
+            to_wallet=cleaned['manufacturer_wallet'] or default_wallet,
+            tx_hash=cleaned['tx_hash']
+        ))
+        minted.append(index)
+
+    if batches:
+        try:
+            with transaction.atomic():
+                Batch.objects.bulk_create(batches)
+                record_transactions(transactions)
+        except DatabaseError as e:
+            # A concurrent mint claimed one of the keys; the whole chunk is rolled back
+            results.extend(
+                {'index': index, 'batch_id': batch.batch_id, 'success': False, 'error': str(e)}
+                for index, batch in zip(minted, batches)
+            )
+        else:
+            results.extend(
+                {'index': index, 'batch_id': batch.batch_id, 'success': True, 'id': str(batch.id), 'qr_code': batch.qr_code}
+                for index, batch in zip(minted, batches)
+            )
+    return sorted(results, key=lambda result: result['index'])
+
+
+def bulk_mint(manufacturer, items, default_wallet=None, chunk_size=1000):
+    """Validate and insert minted batches with their MINT transactions, chunk by chunk.
+
+    items may be any iterable (e.g. a streamed NDJSON body). Returns one result
+    per item in input order.
+    """
+    default_wallet = default_wallet or manufacturer.wallet_address
+    seen_batch_ids = set()
+    results = []
+    numbered = enumerate(items)
+    while True:
+        chunk = list(islice(numbered, chunk_size))
+        if not chunk:
+            break
+        results.extend(_mint_chunk(manufacturer, default_wallet, chunk, seen_batch_ids))
+    return results
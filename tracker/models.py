@@ -1,4 +1,8 @@
+from decimal import Decimal
 from django.db import models
+from django.db.models import F, Sum, Value
+from django.db.models.functions import Coalesce, Lower
+from django.utils import timezone
 import uuid
 
 class Manufacturer(models.Model):
@@ -26,12 +30,47 @@ class Pharmacy(models.Model):
     name = models.CharField(max_length=255)
     wallet_address = models.CharField(max_length=255, unique=True)
     verified = models.BooleanField(default=False)
+    # Recomputed from the pharmacy's own stock levels by the inventory sweeper
+    low_stock_threshold = models.IntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     
     def __str__(self):
         return self.name
 
+class WalletDirectory(models.Model):
+    """Wallet -> entity index mirrored from Manufacturer, Distributor and Pharmacy (see tracker.wallets)"""
+    ROLE_MANUFACTURER = 'manufacturer'
+    ROLE_DISTRIBUTOR = 'distributor'
+    ROLE_PHARMACY = 'pharmacy'
+    ROLES = [
+        (ROLE_MANUFACTURER, 'Manufacturer'),
+        (ROLE_DISTRIBUTOR, 'Distributor'),
+        (ROLE_PHARMACY, 'Pharmacy'),
+    ]
+    
+    wallet_address = models.CharField(max_length=255, db_index=True)
+    role = models.CharField(max_length=20, choices=ROLES)
+    entity_id = models.UUIDField()
+    name = models.CharField(max_length=255)
+    
+    class Meta:
+        unique_together = ['role', 'entity_id']
+    
+    def __str__(self):
+        return f"{self.wallet_address} - {self.role} {self.name}"
+
 class Batch(models.Model):
+    STATUS_PENDING = 'Pending'
+    STATUS_MINTED = 'Minted'
+    STATUS_IN_TRANSIT = 'In Transit'
+    STATUS_DELIVERED = 'Delivered'
+    STATUSES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_MINTED, 'Minted'),
+        (STATUS_IN_TRANSIT, 'In Transit'),
+        (STATUS_DELIVERED, 'Delivered'),
+    ]
+    
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     batch_id = models.CharField(max_length=100, unique=True)
     medicine_name = models.CharField(max_length=255)
@@ -49,9 +88,20 @@ class Batch(models.Model):
 
     qr_code = models.CharField(max_length=255, unique=True, blank=True, null=True)
     
+    # Lifecycle state denormalized from the Transaction history (see tracker.ledger)
+    status = models.CharField(max_length=20, choices=STATUSES, default=STATUS_PENDING)
+    current_holder_wallet = models.CharField(max_length=255, blank=True, null=True)
+    last_tx_at = models.DateTimeField(blank=True, null=True)
+    
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    class Meta:
+        indexes = [
+            models.Index(fields=['manufacturer', 'status']),
+            models.Index(fields=['current_holder_wallet', 'status']),
+        ]
+    
     def __str__(self):
         return f"{self.medicine_name} - {self.batch_id}"
 
@@ -68,8 +118,24 @@ class Transaction(models.Model):
     transaction_type = models.CharField(max_length=10, choices=TRANSACTION_TYPES)
     from_wallet = models.CharField(max_length=255, blank=True, null=True)
     to_wallet = models.CharField(max_length=255)
-    tx_hash = models.CharField(max_length=255, unique=True)
-    timestamp = models.DateTimeField(auto_now_add=True)
+    tx_hash = models.CharField(max_length=255, db_index=True)
+    # Not auto_now_add so imported history keeps its original timestamps
+    timestamp = models.DateTimeField(default=timezone.now, editable=False)
+    
+    class Meta:
+        constraints = [
+            # One on-chain transaction can move many batches (bulk transfer)
+            models.UniqueConstraint(fields=['tx_hash', 'batch'], name='tx_hash_batch_unique'),
+        ]
+        indexes = [
+            # Journey timeline and per-batch type checks (ledger, receive, dashboards)
+            models.Index(fields=['batch', 'timestamp'], name='tx_batch_timestamp_idx'),
+            models.Index(fields=['batch', 'transaction_type'], include=['to_wallet', 'timestamp'], name='tx_batch_type_idx'),
+            # Incoming transfers for a pharmacy wallet
+            models.Index(fields=['to_wallet', 'transaction_type', 'timestamp'], include=['batch', 'from_wallet'], name='tx_to_wallet_type_idx'),
+            # Keyset pagination of the transaction list
+            models.Index(fields=['timestamp', 'id'], name='tx_timestamp_id_idx'),
+        ]
     
     def __str__(self):
         return f"{self.transaction_type} - {self.batch.batch_id}"
@@ -90,26 +156,170 @@ class PharmacyInventory(models.Model):
     
     class Meta:
         unique_together = ['pharmacy', 'batch']
+        indexes = [
+            models.Index(fields=['in_stock', 'quantity_available'], name='inventory_stock_idx'),
+        ]
     
     def __str__(self):
         return f"{self.pharmacy.name} - {self.batch.medicine_name}"
 
+class InventoryAlert(models.Model):
+    KIND_EXPIRED = 'EXPIRED'
+    KIND_LOW_STOCK = 'LOW_STOCK'
+    KINDS = [
+        (KIND_EXPIRED, 'Expired and delisted'),
+        (KIND_LOW_STOCK, 'Low stock'),
+    ]
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    pharmacy = models.ForeignKey(Pharmacy, on_delete=models.CASCADE, related_name='alerts')
+    inventory = models.ForeignKey(PharmacyInventory, on_delete=models.CASCADE, related_name='alerts')
+    kind = models.CharField(max_length=10, choices=KINDS)
+    quantity_available = models.IntegerField()
+    threshold = models.IntegerField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    resolved_at = models.DateTimeField(blank=True, null=True)
+    
+    class Meta:
+        constraints = [
+            # At most one open alert per stock line and kind, so sweeps can re-run freely
+            models.UniqueConstraint(fields=['inventory', 'kind'], condition=models.Q(resolved_at__isnull=True), name='inventory_alert_open_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['pharmacy', 'resolved_at', 'created_at'], name='alert_pharmacy_open_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.kind} - {self.inventory_id}"
+
+class InventorySearch(models.Model):
+    """Denormalized marketplace listing backing full-text search and facets (see tracker.search)"""
+    # Integer key so the SQLite FTS5 table can use it as its content rowid
+    id = models.BigAutoField(primary_key=True)
+    inventory = models.OneToOneField(PharmacyInventory, on_delete=models.CASCADE, related_name='search_entry')
+    pharmacy = models.ForeignKey(Pharmacy, on_delete=models.CASCADE, related_name='+')
+    manufacturer = models.ForeignKey(Manufacturer, on_delete=models.CASCADE, related_name='+')
+    medicine_name = models.CharField(max_length=255)
+    composition = models.TextField()
+    pharmacy_name = models.CharField(max_length=255)
+    manufacturer_name = models.CharField(max_length=255)
+    price_per_unit = models.DecimalField(max_digits=10, decimal_places=2)
+    expiry_date = models.DateField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['price_per_unit', 'id'], name='search_price_idx'),
+            models.Index(fields=['expiry_date', 'id'], name='search_expiry_idx'),
+            models.Index(fields=['pharmacy', 'price_per_unit'], name='search_pharmacy_price_idx'),
+            models.Index(fields=['manufacturer', 'price_per_unit'], name='search_manufacturer_price_idx'),
+            # Cheapest-listing lookups: equality on the lowered name, then walk prices in order
+            models.Index(Lower('medicine_name'), 'price_per_unit', 'expiry_date', name='search_medicine_price_idx'),
+            models.Index(Lower('composition'), 'price_per_unit', 'expiry_date', name='search_composition_price_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.pharmacy_name} - {self.medicine_name}"
+
+class AssetHolding(models.Model):
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    batch = models.ForeignKey(Batch, on_delete=models.CASCADE, related_name='holdings')
+    address = models.CharField(max_length=255)
+    quantity = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        unique_together = ['batch', 'address']
+    
+    def __str__(self):
+        return f"{self.batch.batch_id} @ {self.address} ({self.quantity})"
+
+class AssetIndexState(models.Model):
+    batch = models.OneToOneField(Batch, on_delete=models.CASCADE, primary_key=True, related_name='index_state')
+    asset_id = models.CharField(max_length=255, blank=True, null=True)
+    last_tx_hash = models.CharField(max_length=255, blank=True, null=True)
+    synced_at = models.DateTimeField(blank=True, null=True)
+    last_error = models.TextField(blank=True, null=True)
+    
+    def __str__(self):
+        return f"Index state - {self.batch.batch_id}"
+
+class ChainVerification(models.Model):
+    KIND_TRANSFER = 'TRANSFER'
+    KIND_RECEIVE = 'RECEIVE'
+    KINDS = [
+        (KIND_TRANSFER, 'Transfer'),
+        (KIND_RECEIVE, 'Receive'),
+    ]
+    STATUS_PENDING = 'pending'
+    STATUS_VERIFIED = 'verified'
+    STATUS_FAILED = 'failed'
+    STATUSES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_VERIFIED, 'Verified'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    kind = models.CharField(max_length=10, choices=KINDS)
+    batch = models.ForeignKey(Batch, on_delete=models.CASCADE, related_name='verifications')
+    wallet_address = models.CharField(max_length=255)
+    payload = models.JSONField(default=dict)
+    status = models.CharField(max_length=10, choices=STATUSES, default=STATUS_PENDING)
+    attempts = models.IntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True, null=True)
+    transaction = models.ForeignKey(Transaction, on_delete=models.SET_NULL, blank=True, null=True)
+    inventory = models.ForeignKey(PharmacyInventory, on_delete=models.SET_NULL, blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        indexes = [models.Index(fields=['status', 'next_attempt_at'])]
+    
+    def __str__(self):
+        return f"{self.kind} verification - {self.batch.batch_id} ({self.status})"
+
+def cart_totals(prefix=''):
+    """Aggregate expressions for a cart's price and item count (prefix 'items__' when annotating carts)"""
+    return {
+        'items_total_price': Coalesce(
+            Sum(F(f"{prefix}quantity") * F(f"{prefix}inventory_item__price_per_unit")),
+            Value(Decimal('0')),
+            output_field=models.DecimalField(max_digits=10, decimal_places=2)
+        ),
+        'items_total_quantity': Coalesce(Sum(f"{prefix}quantity"), 0),
+    }
+
+class CartQuerySet(models.QuerySet):
+    def with_totals(self):
+        """Compute total_price and total_items in the same query as the carts"""
+        return self.annotate(**cart_totals('items__'))
+
 class Cart(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='cart')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = CartQuerySet.as_manager()
+    
     def __str__(self):
         return f"Cart - {self.user.username}"
     
+    def _totals(self):
+        if not hasattr(self, 'items_total_price'):
+            totals = self.items.aggregate(**cart_totals())
+            self.items_total_price = totals['items_total_price']
+            self.items_total_quantity = totals['items_total_quantity']
+        return self.items_total_price, self.items_total_quantity
+    
     @property
     def total_price(self):
-        return sum(item.subtotal for item in self.items.all())
+        return self._totals()[0]
     
     @property
     def total_items(self):
-        return sum(item.quantity for item in self.items.all())
+        return self._totals()[1]
 
 class CartItem(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
@@ -145,6 +355,11 @@ class Order(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'created_at'], name='order_user_created_idx'),
+        ]
+
     def __str__(self):
         return f"Order {self.id} - {self.user.username}"
 
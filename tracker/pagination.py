@@ -0,0 +1,138 @@
+import base64
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from uuid import UUID
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """Cursor pagination that seeks past the last (timestamp, id) key instead of using OFFSET.
+
+    Views choose the key with a `keyset_ordering` attribute (all fields in the same
+    direction, the last one unique), so every page costs an index range scan of
+    page_size rows.
+    """
+    page_size = api_settings.PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+    cursor_query_param = 'cursor'
+    ordering = ('-created_at', '-id')
+    invalid_cursor_message = 'Invalid cursor'
+
+    def get_ordering(self, view):
+        return getattr(view, 'keyset_ordering', self.ordering)
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except (TypeError, ValueError):
+            return self.page_size
+        return min(max(page_size, 1), self.max_page_size)
+
+    def paginate_queryset(self, queryset, request, view=None, ordering=None):
+        self.request = request
+        self.ordering = ordering or self.get_ordering(view)
+        self.page_size = self.get_page_size(request)
+
+        queryset = queryset.order_by(*self.ordering)
+        cursor = self.decode_cursor(request, queryset.model)
+        if cursor is not None:
+            queryset = queryset.filter(self.seek_filter(cursor))
+
+        rows = list(queryset[:self.page_size + 1])
+        self.has_next = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        self.next_cursor = self.encode_cursor(rows[-1]) if self.has_next else None
+        return rows
+
+    def seek_filter(self, cursor):
+        """Rows strictly after the cursor key: a < x OR (a = x AND b < y) ... (> when ascending)"""
+        fields = [field.lstrip('-') for field in self.ordering]
+        condition = Q()
+        for position, field in enumerate(fields):
+            lookup = 'lt' if self.ordering[position].startswith('-') else 'gt'
+            step = Q(**{f"{field}__{lookup}": cursor[position]})
+            for previous, value in zip(fields[:position], cursor):
+                step &= Q(**{previous: value})
+            condition |= step
+        return condition
+
+    def _key_value(self, row, field):
+        if isinstance(row, dict):
+            return row[field]
+        value = row
+        for part in field.split('__'):
+            value = getattr(value, part)
+        return value
+
+    def encode_cursor(self, row):
+        key = []
+        for field in self.ordering:
+            value = self._key_value(row, field.lstrip('-'))
+            if isinstance(value, (UUID, Decimal)):
+                value = str(value)
+            elif isinstance(value, (datetime, date)):
+                value = value.isoformat()
+            key.append(value)
+        return base64.urlsafe_b64encode(json.dumps(key).encode()).decode()
+
+    def _key_field(self, model, field):
+        """The model field behind an ordering key, following relations; None for annotations"""
+        parts = field.split('__')
+        try:
+            for part in parts[:-1]:
+                model = model._meta.get_field(part).related_model
+            return model._meta.get_field(parts[-1])
+        except (FieldDoesNotExist, AttributeError):
+            return None
+
+    def decode_cursor(self, request, model):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            cursor = json.loads(base64.urlsafe_b64decode(encoded.encode()))
+            if not isinstance(cursor, list) or len(cursor) != len(self.ordering):
+                raise ValueError
+            # Cursors come back from clients, so each key is coerced like a form value
+            key = []
+            for field, value in zip(self.ordering, cursor):
+                model_field = self._key_field(model, field.lstrip('-'))
+                if model_field is not None:
+                    value = model_field.to_python(value)
+                if value is None:
+                    raise ValueError
+                key.append(value)
+        except (TypeError, ValueError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+        return key
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.next_cursor)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'results': data
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
@@ -0,0 +1,232 @@
+import re
+import uuid
+from datetime import timedelta
+from decimal import Decimal, InvalidOperation
+
+from django.db import connection
+from django.db.models import Count, F, Min, Max, Q, Window
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Lower, RowNumber
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from .models import Pharmacy, InventorySearch
+
+# Full-text index over InventorySearch (created by migration 0015): an external
+# content FTS5 table kept in sync by triggers on SQLite, a generated tsvector
+# column with a GIN index on PostgreSQL. Other backends fall back to icontains.
+FTS_TABLE = 'tracker_inventorysearch_fts'
+SEARCH_FIELDS = ('medicine_name', 'composition', 'pharmacy_name', 'manufacturer_name')
+SEARCH_SORTS = {
+    'price': ('price_per_unit', 'id'),
+    '-price': ('-price_per_unit', '-id'),
+    'expiry': ('expiry_date', 'id'),
+    '-expiry': ('-expiry_date', '-id'),
+}
+# Facet buckets: price ranges as [low, high) and expiry windows in days from today
+PRICE_RANGES = [(None, Decimal('10')), (Decimal('10'), Decimal('50')), (Decimal('50'), Decimal('100')), (Decimal('100'), None)]
+EXPIRY_WINDOWS = [30, 90, 180, 365]
+FACET_LIMIT = 20
+CHEAPEST_LIMIT = 10
+CHEAPEST_MAX_LIMIT = 100
+SYNC_CHUNK_SIZE = 1000
+
+# values_list() lookups for one search row, in InventorySearch field order
+_ENTRY_LOOKUPS = (
+    ('inventory_id', 'pk'),
+    ('pharmacy_id', 'pharmacy_id'),
+    ('manufacturer_id', 'batch__manufacturer_id'),
+    ('medicine_name', 'batch__medicine_name'),
+    ('composition', 'batch__composition'),
+    ('pharmacy_name', 'pharmacy__name'),
+    ('manufacturer_name', 'batch__manufacturer__name'),
+    ('price_per_unit', 'price_per_unit'),
+    ('expiry_date', 'batch__expiry_date'),
+)
+
+
+def sync_search_entries(inventory, chunk_size=SYNC_CHUNK_SIZE):
+    """Upsert the search rows for a PharmacyInventory queryset; returns how many were written"""
+    fields = [field for field, _ in _ENTRY_LOOKUPS]
+    rows = inventory.values_list(*[lookup for _, lookup in _ENTRY_LOOKUPS])
+    total = 0
+    chunk = []
+    for row in rows.iterator(chunk_size=chunk_size):
+        chunk.append(InventorySearch(**dict(zip(fields, row))))
+        if len(chunk) == chunk_size:
+            total += _upsert(chunk)
+            chunk = []
+    return total + _upsert(chunk)
+
+
+def _upsert(entries):
+    InventorySearch.objects.bulk_create(
+        entries,
+        update_conflicts=True,
+        unique_fields=['inventory'],
+        update_fields=[field for field, _ in _ENTRY_LOOKUPS[1:]]
+    )
+    return len(entries)
+
+
+def rename_search_entity(instance):
+    """Carry a pharmacy or manufacturer rename into its listings with one UPDATE"""
+    field = 'pharmacy' if isinstance(instance, Pharmacy) else 'manufacturer'
+    InventorySearch.objects.filter(**{field: instance}).exclude(**{f"{field}_name": instance.name}).update(
+        **{f"{field}_name": instance.name}
+    )
+
+
+def _search_words(text):
+    return re.findall(r'\w+', (text or '').lower())
+
+
+def match_filter(text):
+    """Q matching listings that contain every word of `text` as a prefix, or None for an empty query"""
+    words = _search_words(text)
+    if not words:
+        return None
+    if connection.vendor == 'sqlite':
+        query = ' '.join(f'"{word}"*' for word in words)
+        return Q(id__in=RawSQL(f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s", [query]))
+    if connection.vendor == 'postgresql':
+        query = ' & '.join(f"{word}:*" for word in words)
+        return Q(id__in=RawSQL(
+            f"SELECT id FROM {InventorySearch._meta.db_table} WHERE search_vector @@ to_tsquery('simple', %s)", [query]
+        ))
+    condition = Q()
+    for word in words:
+        condition &= Q(*[Q(**{f"{field}__icontains": word}) for field in SEARCH_FIELDS], _connector=Q.OR)
+    return condition
+
+
+def _uuids(values, name):
+    try:
+        return [uuid.UUID(value) for value in values]
+    except ValueError:
+        raise ValueError(f"{name} must be a UUID")
+
+
+def _price(value, name):
+    if not value:
+        return None
+    try:
+        return Decimal(value)
+    except InvalidOperation:
+        raise ValueError(f"{name} must be a number")
+
+
+def _day(value, name):
+    if not value:
+        return None
+    day = parse_date(value)
+    if day is None:
+        raise ValueError(f"{name} must be a YYYY-MM-DD date")
+    return day
+
+
+def search_listings(params):
+    """In-stock listings matching the query params; returns (entries, facet_base, ordering)
+
+    `facet_base` has the text query applied but not the facet filters, so facet counts
+    show what each choice would return.
+    """
+    sort = params.get('sort', 'price')
+    if sort not in SEARCH_SORTS:
+        raise ValueError(f"sort must be one of {', '.join(SEARCH_SORTS)}")
+
+    entries = InventorySearch.objects.filter(inventory__in_stock=True, inventory__quantity_available__gt=0)
+    text = match_filter(params.get('q'))
+    if text is not None:
+        entries = entries.filter(text)
+    facet_base = entries
+
+    pharmacies = _uuids(params.getlist('pharmacy'), 'pharmacy')
+    if pharmacies:
+        entries = entries.filter(pharmacy_id__in=pharmacies)
+    manufacturers = _uuids(params.getlist('manufacturer'), 'manufacturer')
+    if manufacturers:
+        entries = entries.filter(manufacturer_id__in=manufacturers)
+    min_price = _price(params.get('min_price'), 'min_price')
+    if min_price is not None:
+        entries = entries.filter(price_per_unit__gte=min_price)
+    max_price = _price(params.get('max_price'), 'max_price')
+    if max_price is not None:
+        entries = entries.filter(price_per_unit__lt=max_price)
+    expires_after = _day(params.get('expires_after'), 'expires_after')
+    if expires_after:
+        entries = entries.filter(expiry_date__gte=expires_after)
+    expires_before = _day(params.get('expires_before'), 'expires_before')
+    if expires_before:
+        entries = entries.filter(expiry_date__lt=expires_before)
+    return entries, facet_base, SEARCH_SORTS[sort]
+
+
+def search_facets(entries):
+    """Counts per pharmacy, manufacturer, price range and expiry window"""
+    today = timezone.localdate()
+    buckets = {}
+    for low, high in PRICE_RANGES:
+        condition = Q()
+        if low is not None:
+            condition &= Q(price_per_unit__gte=low)
+        if high is not None:
+            condition &= Q(price_per_unit__lt=high)
+        buckets[f"price_{low}_{high}"] = Count('id', filter=condition)
+    for days in EXPIRY_WINDOWS:
+        buckets[f"expiry_{days}"] = Count('id', filter=Q(expiry_date__lt=today + timedelta(days=days)))
+    counts = entries.aggregate(total=Count('id'), min_price=Min('price_per_unit'), max_price=Max('price_per_unit'), **buckets)
+
+    def top(field, name_field):
+        return [
+            {'id': row[field], 'name': row[name_field], 'count': row['count']}
+            for row in entries.values(field, name_field).annotate(count=Count('id')).order_by('-count', name_field)[:FACET_LIMIT]
+        ]
+
+    return {
+        'total': counts['total'],
+        'pharmacies': top('pharmacy_id', 'pharmacy_name'),
+        'manufacturers': top('manufacturer_id', 'manufacturer_name'),
+        'price': {
+            'min': counts['min_price'],
+            'max': counts['max_price'],
+            'ranges': [
+                {'min': low, 'max': high, 'count': counts[f"price_{low}_{high}"]}
+                for low, high in PRICE_RANGES
+            ],
+        },
+        'expiry': [
+            {'within_days': days, 'before': today + timedelta(days=days), 'count': counts[f"expiry_{days}"]}
+            for days in EXPIRY_WINDOWS
+        ],
+    }
+
+
+def cheapest_listings(medicine=None, composition=None, limit=CHEAPEST_LIMIT, per_pharmacy=False, pharmacies=None):
+    """Top `limit` cheapest in-stock, unexpired listings of a medicine name or composition
+
+    Both are matched exactly (case-insensitively) so the lookup is a range scan of the
+    search_medicine_price_idx / search_composition_price_idx indexes in price order.
+    With `per_pharmacy` only each pharmacy's cheapest listing is considered.
+    """
+    if bool(medicine) == bool(composition):
+        raise ValueError('Provide either medicine or composition')
+    try:
+        limit = min(max(int(limit), 1), CHEAPEST_MAX_LIMIT)
+    except (TypeError, ValueError):
+        raise ValueError('limit must be a number')
+
+    field, value = ('medicine_name', medicine) if medicine else ('composition', composition)
+    entries = InventorySearch.objects.alias(match_key=Lower(field)).filter(
+        match_key=value.strip().lower(),
+        expiry_date__gt=timezone.localdate(),
+        inventory__in_stock=True,
+        inventory__quantity_available__gt=0
+    )
+    if pharmacies:
+        entries = entries.filter(pharmacy_id__in=_uuids(pharmacies, 'pharmacy'))
+    if per_pharmacy:
+        entries = entries.annotate(pharmacy_rank=Window(
+            RowNumber(), partition_by=F('pharmacy_id'), order_by=[F('price_per_unit').asc(), F('id').asc()]
+        )).filter(pharmacy_rank=1)
+    return entries.order_by('price_per_unit', 'id')[:limit]
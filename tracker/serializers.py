@@ -1,5 +1,6 @@
+from django.db.models import Prefetch
 from rest_framework import serializers
-from .models import Manufacturer, Distributor, Pharmacy, Batch, Transaction, PharmacyInventory, Cart, CartItem, Order, OrderItem
+from .models import Manufacturer, Distributor, Pharmacy, Batch, Transaction, PharmacyInventory, Cart, CartItem, Order, OrderItem, ChainVerification
 
 class ManufacturerSerializer(serializers.ModelSerializer):
     class Meta:
@@ -15,6 +16,7 @@ class PharmacySerializer(serializers.ModelSerializer):
     class Meta:
         model = Pharmacy
         fields = '__all__'
+        read_only_fields = ['low_stock_threshold']
 
 class BatchSerializer(serializers.ModelSerializer):
     manufacturer_name = serializers.CharField(source='manufacturer.name', read_only=True)
@@ -22,6 +24,11 @@ class BatchSerializer(serializers.ModelSerializer):
     class Meta:
         model = Batch
         fields = '__all__'
+        read_only_fields = ['status', 'current_holder_wallet', 'last_tx_at']
+    
+    @staticmethod
+    def setup_eager_loading(queryset):
+        return queryset.select_related('manufacturer')
 
 class TransactionSerializer(serializers.ModelSerializer):
     batch_id = serializers.CharField(source='batch.batch_id', read_only=True)
@@ -29,6 +36,10 @@ class TransactionSerializer(serializers.ModelSerializer):
     class Meta:
         model = Transaction
         fields = '__all__'
+    
+    @staticmethod
+    def setup_eager_loading(queryset):
+        return queryset.select_related('batch')
 
 class PharmacyInventorySerializer(serializers.ModelSerializer):
     pharmacy_name = serializers.CharField(source='pharmacy.name', read_only=True)
@@ -40,6 +51,10 @@ class PharmacyInventorySerializer(serializers.ModelSerializer):
     class Meta:
         model = PharmacyInventory
         fields = '__all__'
+    
+    @staticmethod
+    def setup_eager_loading(queryset):
+        return queryset.select_related('pharmacy', 'batch__manufacturer')
 
 class CartItemSerializer(serializers.ModelSerializer):
     medicine_name = serializers.CharField(source='inventory_item.batch.medicine_name', read_only=True)
@@ -51,6 +66,10 @@ class CartItemSerializer(serializers.ModelSerializer):
     class Meta:
         model = CartItem
         fields = '__all__'
+    
+    @staticmethod
+    def setup_eager_loading(queryset):
+        return queryset.select_related('inventory_item__batch', 'inventory_item__pharmacy')
 
 class CartSerializer(serializers.ModelSerializer):
     items = CartItemSerializer(many=True, read_only=True)
@@ -60,6 +79,12 @@ class CartSerializer(serializers.ModelSerializer):
     class Meta:
         model = Cart
         fields = '__all__'
+    
+    @staticmethod
+    def setup_eager_loading(queryset):
+        return queryset.with_totals().prefetch_related(
+            Prefetch('items', queryset=CartItemSerializer.setup_eager_loading(CartItem.objects.all()))
+        )
 
 class OrderItemSerializer(serializers.ModelSerializer):
     medicine_name = serializers.CharField(source='inventory_item.batch.medicine_name', read_only=True)
@@ -67,6 +92,10 @@ class OrderItemSerializer(serializers.ModelSerializer):
     class Meta:
         model = OrderItem
         fields = '__all__'
+    
+    @staticmethod
+    def setup_eager_loading(queryset):
+        return queryset.select_related('inventory_item__batch')
 
 class OrderSerializer(serializers.ModelSerializer):
     items = OrderItemSerializer(many=True, read_only=True)
@@ -74,4 +103,22 @@ class OrderSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = Order
-        fields = '__all__'
\ No newline at end of file
+        fields = '__all__'
+    
+    @staticmethod
+    def setup_eager_loading(queryset):
+        return queryset.select_related('pharmacy').prefetch_related(
+            Prefetch('items', queryset=OrderItemSerializer.setup_eager_loading(OrderItem.objects.all()))
+        )
+
+class ChainVerificationSerializer(serializers.ModelSerializer):
+    batch_id = serializers.CharField(source='batch.batch_id', read_only=True)
+    tx_hash = serializers.CharField(source='transaction.tx_hash', read_only=True, default=None)
+    
+    class Meta:
+        model = ChainVerification
+        fields = ['id', 'kind', 'batch_id', 'wallet_address', 'status', 'attempts', 'next_attempt_at', 'last_error', 'tx_hash', 'inventory', 'created_at', 'updated_at']
+    
+    @staticmethod
+    def setup_eager_loading(queryset):
+        return queryset.select_related('batch', 'transaction')
\ No newline at end of file
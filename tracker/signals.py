@@ -0,0 +1,99 @@
+from django.db.backends.signals import connection_created
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from .dashboard import invalidate_pharmacy_dashboards
+from .journey import invalidate_journeys
+from .metrics import install_query_recorder
+from .models import Manufacturer, Distributor, Pharmacy, Batch, Transaction, PharmacyInventory
+from .search import rename_search_entity, sync_search_entries
+from .verify_cache import invalidate_verification
+from .wallets import remove_wallet_entry, sync_wallet_entries
+
+
+@receiver(pre_save, sender=Batch)
+def remember_batch_qr_code(sender, instance, update_fields=None, **kwargs):
+    """Keep the stored QR code so a changed code also drops the old cache entry"""
+    instance._stored_qr_code = None
+    if instance.pk and (update_fields is None or 'qr_code' in update_fields):
+        instance._stored_qr_code = Batch.objects.filter(pk=instance.pk).values_list('qr_code', flat=True).first()
+
+
+@receiver(post_save, sender=Batch)
+@receiver(post_delete, sender=Batch)
+def invalidate_batch_verification(sender, instance, **kwargs):
+    invalidate_verification(instance.qr_code, getattr(instance, '_stored_qr_code', None))
+    invalidate_journeys([instance.pk])
+
+
+# Inserts go through tracker.ledger (bulk_create sends no signals); these catch
+# edits and deletes made through the CRUD API or the admin.
+@receiver(post_save, sender=Transaction)
+@receiver(post_delete, sender=Transaction)
+def invalidate_transaction_journey(sender, instance, **kwargs):
+    invalidate_journeys([instance.batch_id])
+    invalidate_pharmacy_dashboards([instance.from_wallet, instance.to_wallet])
+
+
+@receiver(post_save, sender=Manufacturer)
+def invalidate_manufacturer_verifications(sender, instance, created, **kwargs):
+    if not created:
+        invalidate_verification(*instance.batch_set.values_list('qr_code', flat=True))
+
+
+@receiver(post_save, sender=Manufacturer)
+@receiver(post_save, sender=Distributor)
+@receiver(post_save, sender=Pharmacy)
+def sync_wallet_directory(sender, instance, **kwargs):
+    sync_wallet_entries([instance])
+
+
+@receiver(post_delete, sender=Manufacturer)
+@receiver(post_delete, sender=Distributor)
+@receiver(post_delete, sender=Pharmacy)
+def remove_from_wallet_directory(sender, instance, **kwargs):
+    remove_wallet_entry(instance)
+
+
+# Marketplace search rows; bulk writes (importer) sync them explicitly
+@receiver(post_save, sender=PharmacyInventory)
+def sync_inventory_search(sender, instance, **kwargs):
+    sync_search_entries(PharmacyInventory.objects.filter(pk=instance.pk))
+
+
+@receiver(post_save, sender=Batch)
+def sync_batch_search(sender, instance, created, **kwargs):
+    if not created:
+        sync_search_entries(PharmacyInventory.objects.filter(batch=instance))
+
+
+@receiver(post_save, sender=Manufacturer)
+@receiver(post_save, sender=Pharmacy)
+def rename_search_listings(sender, instance, created, **kwargs):
+    if not created:
+        rename_search_entity(instance)
+
+
+# Pharmacy dashboards; tracker.ledger (including checkout), the importer and
+# the sweeper invalidate their bulk writes directly
+@receiver(post_save, sender=PharmacyInventory)
+@receiver(post_delete, sender=PharmacyInventory)
+def invalidate_inventory_dashboard(sender, instance, **kwargs):
+    invalidate_pharmacy_dashboards(Pharmacy.objects.filter(pk=instance.pharmacy_id).values_list('wallet_address', flat=True))
+
+
+@receiver(post_save, sender=Pharmacy)
+def invalidate_pharmacy_dashboard(sender, instance, **kwargs):
+    invalidate_pharmacy_dashboards([instance.wallet_address])
+
+
+@receiver(post_save, sender=Batch)
+def invalidate_batch_dashboards(sender, instance, created, **kwargs):
+    if not created:
+        wallets = list(PharmacyInventory.objects.filter(batch=instance).values_list('pharmacy__wallet_address', flat=True))
+        invalidate_pharmacy_dashboards(wallets + list(instance.transactions.values_list('to_wallet', flat=True)))
+
+
+@receiver(connection_created)
+def record_connection_queries(sender, connection, **kwargs):
+    install_query_recorder(connection)
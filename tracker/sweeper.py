@@ -0,0 +1,91 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Avg, Exists, F, IntegerField, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Cast, Coalesce, Greatest
+from django.utils import timezone
+
+from .dashboard import invalidate_pharmacy_dashboards
+from .models import Pharmacy, PharmacyInventory, InventoryAlert
+
+# Every step is a handful of set-based statements, whatever the number of stock
+# lines: expired stock is delisted here so marketplace queries only need in_stock.
+
+
+def _without_open_alert(inventory, kind):
+    return inventory.filter(~Exists(InventoryAlert.objects.filter(
+        inventory=OuterRef('pk'), kind=kind, resolved_at__isnull=True
+    )))
+
+
+def _raise_alerts(kind, rows):
+    """Insert one open alert per (inventory, pharmacy, quantity, threshold) row"""
+    alerts = [
+        InventoryAlert(inventory_id=inventory_id, pharmacy_id=pharmacy_id, kind=kind, quantity_available=quantity, threshold=threshold)
+        for inventory_id, pharmacy_id, quantity, threshold in rows
+    ]
+    # The partial unique constraint drops alerts a concurrent sweep already raised,
+    # and ignore_conflicts does not say which, so count the open alerts instead
+    open_alerts = InventoryAlert.objects.filter(kind=kind, resolved_at__isnull=True)
+    before = open_alerts.count()
+    InventoryAlert.objects.bulk_create(alerts, ignore_conflicts=True)
+    return open_alerts.count() - before
+
+
+def delist_expired(today):
+    """Take expired stock off the market with one UPDATE; returns (delisted, alerts raised)"""
+    expired = PharmacyInventory.objects.filter(in_stock=True, batch__expiry_date__lte=today)
+    with transaction.atomic():
+        alerts = _raise_alerts(InventoryAlert.KIND_EXPIRED, (
+            (inventory_id, pharmacy_id, quantity, None)
+            for inventory_id, pharmacy_id, quantity in _without_open_alert(expired, InventoryAlert.KIND_EXPIRED).values_list(
+                'pk', 'pharmacy_id', 'quantity_available'
+            )
+        ))
+        wallets = list(expired.values_list('pharmacy__wallet_address', flat=True).distinct())
+        delisted = expired.update(in_stock=False)
+    invalidate_pharmacy_dashboards(wallets)
+    return delisted, alerts
+
+
+def update_low_stock_thresholds(today):
+    """Set every pharmacy's threshold from its average unexpired, in-stock line in one UPDATE"""
+    average = PharmacyInventory.objects.filter(
+        pharmacy=OuterRef('pk'), in_stock=True, batch__expiry_date__gt=today
+    ).values('pharmacy').annotate(average=Avg('quantity_available')).values('average')
+    return Pharmacy.objects.update(low_stock_threshold=Greatest(
+        Value(settings.LOW_STOCK_MIN_THRESHOLD),
+        Cast(Coalesce(Subquery(average), Value(0.0)) * Value(settings.LOW_STOCK_RATIO), IntegerField())
+    ))
+
+
+def flag_low_stock(today):
+    """Raise alerts for unexpired lines under their pharmacy's threshold and resolve recovered ones"""
+    now = timezone.now()
+    with transaction.atomic():
+        low = PharmacyInventory.objects.filter(
+            batch__expiry_date__gt=today,
+            quantity_available__lt=F('pharmacy__low_stock_threshold')
+        )
+        raised = _raise_alerts(InventoryAlert.KIND_LOW_STOCK, _without_open_alert(low, InventoryAlert.KIND_LOW_STOCK).values_list(
+            'pk', 'pharmacy_id', 'quantity_available', 'pharmacy__low_stock_threshold'
+        ))
+        # Restocked lines, and lines that expired since (they get an EXPIRED alert instead)
+        resolved = InventoryAlert.objects.filter(kind=InventoryAlert.KIND_LOW_STOCK, resolved_at__isnull=True).filter(
+            Q(inventory__quantity_available__gte=F('pharmacy__low_stock_threshold')) | Q(inventory__batch__expiry_date__lte=today)
+        ).update(resolved_at=now)
+    return raised, resolved
+
+
+def sweep_inventory(today=None):
+    """One sweeper pass; returns counts for each step"""
+    today = today or timezone.localdate()
+    delisted, expired_alerts = delist_expired(today)
+    thresholds = update_low_stock_thresholds(today)
+    low_stock_alerts, resolved = flag_low_stock(today)
+    return {
+        'delisted': delisted,
+        'expired_alerts': expired_alerts,
+        'thresholds': thresholds,
+        'low_stock_alerts': low_stock_alerts,
+        'resolved_alerts': resolved,
+    }
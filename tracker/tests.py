@@ -1,3 +1,1092 @@
-from django.test import TestCase
+import base64
+import contextvars
+import csv
+import json
+import threading
+from datetime import date, timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import DatabaseError, connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from . import checkout as checkout_module, metrics
+from .blockfrost_async import averify_wallet_has_asset, blockfrost_session, close_shared_client, get_async_blockfrost_api, open_shared_client
+from .blockfrost_utils import BlockfrostClient, get_asset_info, get_blockfrost_cache, peek_cached
+from .checkout import CheckoutError, place_order
+from .exports import EXPORT_COLUMNS, export_lines, export_queryset
+from .importer import WalletMap, import_chunk
+from .ledger import fold_transactions, record_transactions
+from .models import (
+    Manufacturer, Distributor, Pharmacy, Batch, Transaction, PharmacyInventory, Cart, CartItem, Order, OrderItem,
+    AssetHolding, AssetIndexState, ChainVerification, InventoryAlert, WalletDirectory,
+)
+from .sweeper import sweep_inventory
+from .verification import process_due_verifications
+from .wallets import lookup_wallet, resolve_wallets
+
+
+# Keep the database cache's own queries out of the budgets
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class QueryBudgetTests(TestCase):
+    """Endpoints built on nested serializers must cost O(1) queries regardless of row count"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.manufacturer = Manufacturer.objects.create(name='Acme Pharma', wallet_address='addr_manufacturer')
+        self.pharmacy = Pharmacy.objects.create(name='Corner Pharmacy', wallet_address='addr_pharmacy')
+        self.user = User.objects.create(username='patient')
+        self.cart = Cart.objects.create(user=self.user)
+        self.order = Order.objects.create(user=self.user, pharmacy=self.pharmacy, total_amount=Decimal('0'))
+        self.rows = 0
+
+    def add_rows(self, count):
+        for _ in range(count):
+            self.rows += 1
+            batch = Batch.objects.create(
+                batch_id=f"BATCH-{self.rows}",
+                medicine_name=f"Medicine {self.rows}",
+                composition='Paracetamol 500mg',
+                manufacturer=self.manufacturer,
+                manufactured_date='2024-01-01',
+                expiry_date='2030-01-01',
+                quantity=100,
+                qr_code=f"qr-{self.rows}"
+            )
+            Transaction.objects.create(batch=batch, transaction_type='MINT', to_wallet='addr_manufacturer', tx_hash=f"tx-{self.rows}")
+            inventory = PharmacyInventory.objects.create(
+                pharmacy=self.pharmacy,
+                batch=batch,
+                quantity_available=10,
+                price_per_unit=Decimal('2.50')
+            )
+            CartItem.objects.create(cart=self.cart, inventory_item=inventory, quantity=1)
+            OrderItem.objects.create(order=self.order, inventory_item=inventory, quantity=1, price_per_unit=Decimal('2.50'), subtotal=Decimal('2.50'))
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, response.data)
+        return len(context.captured_queries)
+
+    def assertConstantQueries(self, url, budget):
+        self.add_rows(1)
+        few = self.count_queries(url)
+        self.add_rows(9)
+        many = self.count_queries(url)
+        self.assertEqual(few, many, f"{url} query count grows with rows")
+        self.assertLessEqual(many, budget, f"{url} ran {many} queries")
+
+    def test_inventory_list(self):
+        self.assertConstantQueries('/api/inventory/', 1)
+
+    def test_batch_list(self):
+        self.assertConstantQueries('/api/batches/', 1)
+
+    def test_transaction_list(self):
+        self.assertConstantQueries('/api/transactions/', 1)
+
+    def test_pharmacy_inventory(self):
+        self.assertConstantQueries(f"/api/pharmacy/{self.pharmacy.id}/inventory/", 1)
+
+    def test_marketplace(self):
+        self.assertConstantQueries('/api/marketplace/', 1)
+
+    def test_pharmacy_dashboard(self):
+        self.assertConstantQueries('/api/pharmacy/dashboard/?wallet_address=addr_pharmacy', 4)
+
+    def test_cart(self):
+        self.assertConstantQueries(f"/api/cart/?user_id={self.user.id}", 2)
+
+    def test_order(self):
+        self.assertConstantQueries(f"/api/orders/{self.order.id}/", 2)
+
+    def test_user_orders(self):
+        self.assertConstantQueries(f"/api/orders/?user_id={self.user.id}", 2)
+
+
+class ImportTraceTests(TestCase):
+    """Bad rows are reported by row number while the rest of the chunk is imported"""
+
+    def setUp(self):
+        self.manufacturer = Manufacturer.objects.create(name='Acme Pharma', wallet_address='addr_manufacturer')
+        Batch.objects.create(
+            batch_id='EXISTING', medicine_name='Old', composition='Paracetamol 500mg', manufacturer=self.manufacturer,
+            manufactured_date='2020-01-01', expiry_date='2021-01-01', quantity=10, qr_code='qr-taken'
+        )
+
+    def batch_row(self, batch_id, **overrides):
+        row = {
+            'batch_id': batch_id,
+            'medicine_name': 'Paracetamol',
+            'composition': 'Paracetamol 500mg',
+            'manufacturer_wallet': 'addr_manufacturer',
+            'manufactured_date': '2024-01-01',
+            'expiry_date': '2030-01-01',
+            'quantity': '100',
+            'qr_code': f"qr-{batch_id}",
+        }
+        row.update(overrides)
+        return row
+
+    def test_batch_errors_are_reported_per_row(self):
+        chunk = list(enumerate([
+            self.batch_row('GOOD-1'),
+            self.batch_row('BAD-DATE', expiry_date='2024-02-30'),
+            self.batch_row('BAD-TIME', mint_tx_hash='tx-1', minted_at='2024-01-01T25:00:00'),
+            self.batch_row('QR-IN-DB', qr_code='qr-taken'),
+            self.batch_row('GOOD-2', qr_code='qr-shared'),
+            self.batch_row('QR-IN-CHUNK', qr_code='qr-shared'),
+            self.batch_row('X' * 101),
+            self.batch_row('GOOD-1'),
+        ], start=1))
+        imported, errors = import_chunk('batches', chunk, WalletMap())
+
+        self.assertEqual(imported, 2)
+        self.assertEqual([number for number, _ in errors], [2, 3, 4, 6, 7, 8])
+        self.assertIn('expiry_date', dict(errors)[2])
+        self.assertIn('minted_at', dict(errors)[3])
+        self.assertIn('qr-taken', dict(errors)[4])
+        self.assertIn('qr-shared', dict(errors)[6])
+        self.assertIn('longer than 100', dict(errors)[7])
+        self.assertIn('already exists', dict(errors)[8])
+        self.assertEqual(set(Batch.objects.exclude(batch_id='EXISTING').values_list('batch_id', flat=True)), {'GOOD-1', 'GOOD-2'})
+
+    def test_inventory_for_expired_batches_is_not_listed(self):
+        Batch.objects.create(
+            batch_id='FRESH', medicine_name='New', composition='Paracetamol 500mg', manufacturer=self.manufacturer,
+            manufactured_date='2024-01-01', expiry_date='2099-01-01', quantity=10
+        )
+        chunk = list(enumerate([
+            {'batch_id': 'EXISTING', 'pharmacy_wallet': 'addr_pharmacy', 'quantity_available': '5', 'price_per_unit': '2.50'},
+            {'batch_id': 'FRESH', 'pharmacy_wallet': 'addr_pharmacy', 'quantity_available': '5', 'price_per_unit': '2.50'},
+            {'batch_id': 'FRESH', 'pharmacy_wallet': 'addr_other', 'quantity_available': '0', 'price_per_unit': '2.50'},
+            {'batch_id': 'FRESH', 'pharmacy_wallet': 'addr_third', 'quantity_available': '5', 'price_per_unit': '1e12'},
+        ], start=1))
+        imported, errors = import_chunk('inventory', chunk, WalletMap())
+
+        self.assertEqual(imported, 3)
+        self.assertEqual([number for number, _ in errors], [4])
+        listed = dict(PharmacyInventory.objects.values_list('batch__batch_id', 'pharmacy__wallet_address').filter(in_stock=True))
+        self.assertEqual(listed, {'FRESH': 'addr_pharmacy'})
+
+
+class BulkMintTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.manufacturer = Manufacturer.objects.create(name='Acme Pharma', wallet_address='addr_manufacturer')
+
+    def mint(self, *batches):
+        return self.client.post('/api/mint/bulk/', {'manufacturer_id': str(self.manufacturer.id), 'batches': list(batches)}, format='json')
+
+    def item(self, batch_id, tx_hash, **overrides):
+        item = {
+            'batch_id': batch_id,
+            'medicine_name': 'Paracetamol',
+            'composition': 'Paracetamol 500mg',
+            'manufactured_date': '2024-01-01',
+            'expiry_date': '2030-01-01',
+            'quantity': 100,
+            'tx_hash': tx_hash,
+        }
+        item.update(overrides)
+        return item
+
+    def test_one_mint_tx_covers_a_production_run(self):
+        response = self.mint(self.item('RUN-1', 'TXSAME'), self.item('RUN-2', 'TXSAME'), self.item('RUN-3', 'TXSAME'))
+
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual((response.data['created'], response.data['failed']), (3, 0))
+        self.assertEqual(Transaction.objects.filter(tx_hash='TXSAME', transaction_type='MINT').count(), 3)
+        self.assertEqual(set(Batch.objects.values_list('status', flat=True)), {Batch.STATUS_MINTED})
+
+    def test_invalid_and_duplicate_items_are_rejected_individually(self):
+        self.mint(self.item('RUN-1', 'TX1'))
+        response = self.mint(
+            self.item('RUN-1', 'TX2'),
+            self.item('RUN-2', 'TX2'),
+            self.item('RUN-2', 'TX3'),
+            self.item('RUN-3', 'TX2', expiry_date='soon'),
+        )
+
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual([result['success'] for result in response.data['results']], [False, True, False, False])
+        self.assertIn('already exists', response.data['results'][0]['error'])
+        self.assertIn('Duplicate batch_id', response.data['results'][2]['error'])
+        self.assertIn('expiry_date', response.data['results'][3]['error'])
+
+
+class AsyncHolderIndexTests(TestCase):
+
+    def setUp(self):
+        manufacturer = Manufacturer.objects.create(name='Acme Pharma', wallet_address='addr_manufacturer')
+        batch = Batch.objects.create(
+            batch_id='INDEXED', medicine_name='Paracetamol', composition='Paracetamol 500mg', manufacturer=manufacturer,
+            manufactured_date='2024-01-01', expiry_date='2030-01-01', quantity=100, policy_id='policy', asset_name='asset'
+        )
+        AssetIndexState.objects.create(batch=batch, asset_id='policyasset', synced_at=timezone.now())
+        AssetHolding.objects.create(batch=batch, address='addr_holder', quantity=1)
+
+    async def test_indexed_holder_skips_blockfrost(self):
+        with mock.patch('tracker.blockfrost_async.afetch_asset_addresses') as fetch:
+            result = await averify_wallet_has_asset('addr_holder', 'policy', 'asset')
+        self.assertEqual(result, {'success': True, 'has_asset': True, 'quantity': '1'})
+        fetch.assert_not_called()
+
+
+class AsyncBlockfrostSessionTests(TestCase):
+
+    async def test_session_closes_its_client(self):
+        async with blockfrost_session():
+            client = get_async_blockfrost_api()
+            self.assertFalse(client.client.is_closed)
+        self.assertTrue(client.client.is_closed)
+
+    async def test_lookups_outside_a_session_are_rejected(self):
+        with self.assertRaises(RuntimeError):
+            get_async_blockfrost_api()
+
+    async def test_server_loop_shares_one_client_until_shutdown(self):
+        await open_shared_client()
+        async with blockfrost_session():
+            first = get_async_blockfrost_api()
+        async with blockfrost_session():
+            self.assertIs(get_async_blockfrost_api(), first)
+        self.assertFalse(first.client.is_closed)
+
+        await close_shared_client()
+        self.assertTrue(first.client.is_closed)
+
+
+class ChainVerifierTests(TestCase):
+
+    def setUp(self):
+        manufacturer = Manufacturer.objects.create(name='Acme Pharma', wallet_address='addr_manufacturer')
+        self.batch = Batch.objects.create(
+            batch_id='DEFERRED', medicine_name='Paracetamol', composition='Paracetamol 500mg', manufacturer=manufacturer,
+            manufactured_date='2024-01-01', expiry_date='2030-01-01', quantity=100, policy_id='policy', asset_name='asset'
+        )
+        self.verification = ChainVerification.objects.create(
+            kind=ChainVerification.KIND_TRANSFER,
+            batch=self.batch,
+            wallet_address='addr_distributor',
+            payload={'from_wallet': 'addr_manufacturer', 'tx_hash': 'tx-deferred'}
+        )
+
+    def holder_found(self):
+        return mock.patch('tracker.verification.check_transfer_holder', return_value={'success': True, 'has_asset': True})
+
+    def test_finalize_error_schedules_a_retry(self):
+        with self.holder_found(), mock.patch('tracker.ledger.apply_transactions', side_effect=DatabaseError('disk I/O error')), \
+                self.assertLogs('tracker.verification', 'ERROR'):
+            self.assertEqual(process_due_verifications(), 1)
+
+        self.verification.refresh_from_db()
+        self.assertEqual(self.verification.status, ChainVerification.STATUS_PENDING)
+        self.assertEqual(self.verification.attempts, 1)
+        self.assertEqual(self.verification.last_error, 'disk I/O error')
+        self.assertIsNone(self.verification.transaction_id)
+        self.assertGreater(self.verification.next_attempt_at, timezone.now())
+        self.assertFalse(Transaction.objects.filter(tx_hash='tx-deferred').exists())
+
+        ChainVerification.objects.update(next_attempt_at=timezone.now())
+        with self.holder_found():
+            process_due_verifications()
+        self.verification.refresh_from_db()
+        self.assertEqual(self.verification.status, ChainVerification.STATUS_VERIFIED)
+        self.assertEqual(self.verification.transaction.tx_hash, 'tx-deferred')
+
+    def test_failed_attempts_run_out(self):
+        ChainVerification.objects.update(attempts=settings.CHAIN_VERIFICATION_MAX_ATTEMPTS - 1)
+        with self.holder_found(), mock.patch('tracker.ledger.apply_transactions', side_effect=DatabaseError('disk I/O error')), \
+                self.assertLogs('tracker.verification', 'ERROR'):
+            process_due_verifications()
+        self.verification.refresh_from_db()
+        self.assertEqual(self.verification.status, ChainVerification.STATUS_FAILED)
+
+    def test_errors_never_reach_the_loop(self):
+        with self.holder_found(), mock.patch('tracker.verification.finalize_verification', side_effect=DatabaseError), \
+                mock.patch('tracker.verification.fail_attempt', side_effect=DatabaseError('database is locked')), \
+                self.assertLogs('tracker.verification', 'ERROR') as logs:
+            self.assertEqual(process_due_verifications(), 0)
+        self.assertIn('Could not record verification', logs.output[-1])
+
+
+class CheckoutTests(TestCase):
+
+    def setUp(self):
+        manufacturer = Manufacturer.objects.create(name='Acme Pharma', wallet_address='addr_manufacturer')
+        self.pharmacy = Pharmacy.objects.create(name='Corner Pharmacy', wallet_address='addr_pharmacy')
+        self.inventory = []
+        for number in range(2):
+            batch = Batch.objects.create(
+                batch_id=f"SHELF-{number}", medicine_name=f"Medicine {number}", composition='Paracetamol 500mg',
+                manufacturer=manufacturer, manufactured_date='2024-01-01', expiry_date='2030-01-01', quantity=100
+            )
+            self.inventory.append(PharmacyInventory.objects.create(
+                pharmacy=self.pharmacy, batch=batch, quantity_available=2, price_per_unit=Decimal('2.50')
+            ))
+
+    def cart_for(self, username, quantities):
+        user = User.objects.create(username=username)
+        cart = Cart.objects.create(user=user)
+        for inventory, quantity in zip(self.inventory, quantities):
+            CartItem.objects.create(cart=cart, inventory_item=inventory, quantity=quantity)
+        return user
+
+    def stock(self):
+        return [row.quantity_available for row in PharmacyInventory.objects.filter(pk__in=[row.pk for row in self.inventory]).order_by('batch__batch_id')]
+
+    def test_competing_orders_for_the_last_units(self):
+        first = self.cart_for('first', [2])
+        second = self.cart_for('second', [2])
+
+        order = place_order(first.pk, self.pharmacy)
+        with self.assertRaisesMessage(CheckoutError, 'no longer available'):
+            place_order(second.pk, self.pharmacy)
+
+        self.assertEqual(order.total_amount, Decimal('5.00'))
+        self.assertEqual(self.stock(), [0, 2])
+        self.assertFalse(PharmacyInventory.objects.get(pk=self.inventory[0].pk).in_stock)
+        self.assertEqual(Order.objects.count(), 1)
+        self.assertEqual(CartItem.objects.filter(cart__user=second).count(), 1)
+
+    def test_stock_taken_after_the_check_rolls_everything_back(self):
+        user = self.cart_for('patient', [1, 2])
+        original = checkout_module._stock_updates
+
+        def competing_checkout(items):
+            # Stands in for another checkout taking stock between our check and our UPDATE
+            PharmacyInventory.objects.filter(pk=self.inventory[1].pk).update(quantity_available=1)
+            return original(items)
+
+        with mock.patch.object(checkout_module, '_stock_updates', competing_checkout):
+            with self.assertRaisesMessage(CheckoutError, 'Not enough stock'):
+                place_order(user.pk, self.pharmacy)
+
+        # The first line's decrement is undone along with everything else
+        self.assertEqual(self.stock(), [2, 2])
+        self.assertFalse(Order.objects.exists())
+        self.assertFalse(OrderItem.objects.exists())
+        self.assertFalse(Transaction.objects.filter(transaction_type='SOLD').exists())
+        self.assertEqual(CartItem.objects.filter(cart__user=user).count(), 2)
+
+
+class BulkTransferTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        manufacturer = Manufacturer.objects.create(name='Acme Pharma', wallet_address='addr_manufacturer')
+        for batch_id, asset_name in (('OFF-CHAIN', None), ('ON-CHAIN', 'delivered'), ('NOT-SENT', 'missing')):
+            batch = Batch.objects.create(
+                batch_id=batch_id, medicine_name='Paracetamol', composition='Paracetamol 500mg', manufacturer=manufacturer,
+                manufactured_date='2024-01-01', expiry_date='2030-01-01', quantity=100,
+                policy_id='policy' if asset_name else None, asset_name=asset_name
+            )
+            Transaction.objects.create(batch=batch, transaction_type='MINT', to_wallet='addr_manufacturer', tx_hash=f"mint-{batch_id}")
+        self.delivered = mock.patch(
+            'tracker.verification.assets_delivered', return_value={'success': True, 'assets': {'policydelivered': 1}}
+        )
+
+    def transfer(self, *batch_ids):
+        return self.client.post('/api/transfer/bulk/', {
+            'batch_ids': list(batch_ids), 'from_wallet': 'addr_manufacturer', 'to_wallet': 'addr_distributor', 'tx_hash': 'TXBULK'
+        }, format='json')
+
+    def test_batches_are_checked_against_one_transaction(self):
+        with self.delivered as delivered:
+            response = self.transfer('OFF-CHAIN', 'ON-CHAIN', 'NOT-SENT', 'UNKNOWN')
+            again = self.transfer('ON-CHAIN')
+
+        self.assertEqual(delivered.call_count, 2)
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual([result['success'] for result in response.data['results']], [True, True, False, False])
+        self.assertEqual(again.data['results'][0]['error'], 'Transfer already recorded')
+        self.assertEqual(
+            dict(Batch.objects.filter(current_holder_wallet='addr_distributor').values_list('batch_id', 'status')),
+            {'OFF-CHAIN': Batch.STATUS_IN_TRANSIT, 'ON-CHAIN': Batch.STATUS_IN_TRANSIT}
+        )
+
+    def test_ledger_and_batch_status_commit_together(self):
+        before = dict(Batch.objects.values_list('batch_id', 'status'))
+        with self.delivered, mock.patch('tracker.ledger.apply_transactions', side_effect=DatabaseError('disk I/O error')):
+            response = self.transfer('OFF-CHAIN', 'ON-CHAIN')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Transaction.objects.filter(tx_hash='TXBULK').exists())
+        self.assertEqual(dict(Batch.objects.values_list('batch_id', 'status')), before)
+
+
+class LedgerTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        manufacturer = Manufacturer.objects.create(name='Acme Pharma', wallet_address='addr_manufacturer')
+        self.batch, self.other = [
+            Batch.objects.create(
+                batch_id=batch_id, medicine_name='Paracetamol', composition='Paracetamol 500mg', manufacturer=manufacturer,
+                manufactured_date='2024-01-01', expiry_date='2030-01-01', quantity=100
+            )
+            for batch_id in ('LEDGER-1', 'LEDGER-2')
+        ]
+        self.start = timezone.now()
+
+    def history(self, batch):
+        """MINT -> TRANSFER -> RECEIVED -> SOLD, a minute apart"""
+        steps = (
+            ('MINT', None, 'addr_manufacturer'),
+            ('TRANSFER', 'addr_manufacturer', 'addr_distributor'),
+            ('RECEIVED', 'addr_distributor', 'addr_pharmacy'),
+            ('SOLD', 'addr_pharmacy', 'addr_patient'),
+        )
+        return [
+            Transaction(
+                batch=batch, transaction_type=transaction_type, from_wallet=from_wallet, to_wallet=to_wallet,
+                tx_hash=f"{batch.batch_id}-{transaction_type}", timestamp=self.start + timedelta(minutes=minute)
+            )
+            for minute, (transaction_type, from_wallet, to_wallet) in enumerate(steps)
+        ]
+
+    def lifecycle(self):
+        return {
+            batch.batch_id: (batch.status, batch.current_holder_wallet, batch.last_tx_at)
+            for batch in Batch.objects.all()
+        }
+
+    def test_each_transaction_moves_the_lifecycle_on(self):
+        history = self.history(self.batch)
+        expected = [
+            (Batch.STATUS_MINTED, 'addr_manufacturer'),
+            (Batch.STATUS_IN_TRANSIT, 'addr_distributor'),
+            (Batch.STATUS_DELIVERED, 'addr_pharmacy'),
+            # A sale leaves status and holder alone
+            (Batch.STATUS_DELIVERED, 'addr_pharmacy'),
+        ]
+        for tx, (status, holder) in zip(history, expected):
+            record_transactions([tx])
+            self.batch.refresh_from_db()
+            self.assertEqual((self.batch.status, self.batch.current_holder_wallet, self.batch.last_tx_at), (status, holder, tx.timestamp))
+
+        # Folding sorts by timestamp, whatever order the rows arrive in
+        self.assertEqual(
+            fold_transactions(reversed(history)),
+            (Batch.STATUS_DELIVERED, 'addr_pharmacy', history[-1].timestamp)
+        )
+
+    def test_rebuild_matches_the_incremental_path(self):
+        record_transactions(self.history(self.batch))
+        record_transactions(self.history(self.other)[:2])
+        incremental = self.lifecycle()
+
+        Batch.objects.update(status=Batch.STATUS_PENDING, current_holder_wallet=None, last_tx_at=None)
+        call_command('rebuild_batch_status', stdout=StringIO())
+
+        self.assertEqual(self.lifecycle(), incremental)
+
+    def test_api_edits_and_deletes_refold_the_history(self):
+        record_transactions(self.history(self.batch)[:3])
+        received = Transaction.objects.get(batch=self.batch, transaction_type='RECEIVED')
+
+        response = self.client.patch(f"/api/transactions/{received.id}/", {'batch': str(self.other.pk)}, format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        lifecycle = self.lifecycle()
+        self.assertEqual(lifecycle['LEDGER-1'][:2], (Batch.STATUS_IN_TRANSIT, 'addr_distributor'))
+        self.assertEqual(lifecycle['LEDGER-2'][:2], (Batch.STATUS_DELIVERED, 'addr_pharmacy'))
+
+        transfer = Transaction.objects.get(batch=self.batch, transaction_type='TRANSFER')
+        self.assertEqual(self.client.delete(f"/api/transactions/{transfer.id}/").status_code, 204)
+        self.assertEqual(self.lifecycle()['LEDGER-1'][:2], (Batch.STATUS_MINTED, 'addr_manufacturer'))
+
+
+class MarketplaceFixture:
+    """Two pharmacies stocking paracetamol and ibuprofen at different prices"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.manufacturer = Manufacturer.objects.create(name='Acme Pharma', wallet_address='addr_manufacturer')
+        self.corner = Pharmacy.objects.create(name='Corner Pharmacy', wallet_address='addr_corner')
+        self.mall = Pharmacy.objects.create(name='Mall Chemist', wallet_address='addr_mall')
+        self.rows = 0
+        self.listings = {
+            'corner-para': self.listing(self.corner, 'Paracetamol', 'Paracetamol 500mg', '4.00'),
+            'corner-para-cheap': self.listing(self.corner, 'Paracetamol', 'Paracetamol 500mg', '3.00'),
+            'mall-para': self.listing(self.mall, 'Paracetamol', 'Paracetamol 500mg', '3.50'),
+            'mall-ibu': self.listing(self.mall, 'Ibuprofen', 'Ibuprofen 200mg', '60.00'),
+            'mall-para-sold-out': self.listing(self.mall, 'Paracetamol', 'Paracetamol 500mg', '1.00', quantity=0),
+            'corner-para-delisted': self.listing(self.corner, 'Paracetamol', 'Paracetamol 500mg', '0.50', in_stock=False),
+            'mall-para-expired': self.listing(self.mall, 'Paracetamol', 'Paracetamol 500mg', '0.75', expiry_date='2020-01-01'),
+        }
+
+    def listing(self, pharmacy, medicine_name, composition, price, quantity=10, in_stock=True, expiry_date='2099-01-01'):
+        self.rows += 1
+        batch = Batch.objects.create(
+            batch_id=f"LISTED-{self.rows}", medicine_name=medicine_name, composition=composition, manufacturer=self.manufacturer,
+            manufactured_date='2024-01-01', expiry_date=expiry_date, quantity=100
+        )
+        return PharmacyInventory.objects.create(
+            pharmacy=pharmacy, batch=batch, quantity_available=quantity, price_per_unit=Decimal(price), in_stock=in_stock
+        )
+
+    def names(self, response):
+        self.assertEqual(response.status_code, 200, response.data)
+        by_id = {str(inventory.id): name for name, inventory in self.listings.items()}
+        return [by_id[str(drug['id'])] for drug in response.data['drugs']]
+
+
+class MarketplaceSearchTests(MarketplaceFixture, TestCase):
+
+    def test_every_word_matches_as_a_prefix(self):
+        response = self.client.get('/api/marketplace/search/', {'q': 'para 500'})
+        self.assertEqual(self.names(response), ['mall-para-expired', 'corner-para-cheap', 'mall-para', 'corner-para'])
+
+        response = self.client.get('/api/marketplace/search/', {'q': 'mall ibu'})
+        self.assertEqual(self.names(response), ['mall-ibu'])
+
+    def test_filters_and_sort(self):
+        response = self.client.get('/api/marketplace/search/', {
+            'q': 'paracetamol', 'pharmacy': str(self.corner.id), 'sort': '-price'
+        })
+        self.assertEqual(self.names(response), ['corner-para', 'corner-para-cheap'])
+
+        response = self.client.get('/api/marketplace/search/', {'min_price': '3.50', 'max_price': '50'})
+        self.assertEqual(self.names(response), ['mall-para', 'corner-para'])
+
+        response = self.client.get('/api/marketplace/search/', {'expires_after': '2030-01-01', 'sort': 'expiry'})
+        self.assertEqual(len(self.names(response)), 4)
+
+    def test_keyset_pages_cover_every_match_once(self):
+        seen = []
+        response = self.client.get('/api/marketplace/search/', {'q': 'paracetamol', 'page_size': 1})
+        while True:
+            seen += self.names(response)
+            if not response.data['next']:
+                break
+            response = self.client.get(response.data['next'])
+        self.assertEqual(seen, ['mall-para-expired', 'corner-para-cheap', 'mall-para', 'corner-para'])
+
+    def test_facets_ignore_the_facet_filters(self):
+        response = self.client.get('/api/marketplace/search/', {'q': 'paracetamol', 'pharmacy': str(self.mall.id), 'facets': 'true'})
+        facets = response.data['facets']
+
+        self.assertEqual(facets['total'], 4)
+        self.assertEqual([(row['name'], row['count']) for row in facets['pharmacies']], [('Corner Pharmacy', 2), ('Mall Chemist', 2)])
+        self.assertEqual([bucket['count'] for bucket in facets['price']['ranges']], [4, 0, 0, 0])
+        self.assertEqual(facets['expiry'][0]['count'], 1)
+
+    def test_renames_reach_the_index(self):
+        self.corner.name = 'Riverside Pharmacy'
+        self.corner.save()
+        response = self.client.get('/api/marketplace/search/', {'q': 'riverside'})
+        self.assertEqual(sorted(self.names(response)), ['corner-para', 'corner-para-cheap'])
+
+    def test_invalid_parameters(self):
+        for params in ({'sort': 'name'}, {'min_price': 'cheap'}, {'pharmacy': 'corner'}, {'expires_before': 'soon'}):
+            response = self.client.get('/api/marketplace/search/', params)
+            self.assertEqual(response.status_code, 400, params)
+
+
+class CartTests(MarketplaceFixture, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create(username='patient')
+        for name, quantity in (('corner-para', 2), ('mall-ibu', 1)):
+            response = self.client.post('/api/cart/add/', {
+                'user_id': self.user.id, 'inventory_id': str(self.listings[name].id), 'quantity': quantity
+            }, format='json')
+            self.assertEqual(response.status_code, 201, response.data)
+
+    def cart(self):
+        response = self.client.get('/api/cart/', {'user_id': self.user.id})
+        self.assertEqual(response.status_code, 200, response.data)
+        return response.data['cart']
+
+    def test_totals_match_the_item_subtotals(self):
+        cart = self.cart()
+        self.assertEqual(Decimal(cart['total_price']), sum(Decimal(item['subtotal']) for item in cart['items']))
+        self.assertEqual(Decimal(cart['total_price']), Decimal('68.00'))
+        self.assertEqual(cart['total_items'], sum(item['quantity'] for item in cart['items']))
+        self.assertEqual(cart['total_items'], 3)
+
+    def test_updates_are_checked_like_additions(self):
+        item = CartItem.objects.get(cart__user=self.user, inventory_item=self.listings['corner-para'])
+        self.assertEqual(self.client.put(f"/api/cart/update/{item.id}/", {'quantity': 11}, format='json').data['error'], 'Not enough stock')
+
+        PharmacyInventory.objects.filter(pk=self.listings['corner-para'].pk).update(in_stock=False)
+        response = self.client.put(f"/api/cart/update/{item.id}/", {'quantity': 1}, format='json')
+        self.assertEqual((response.status_code, response.data['error']), (400, 'Item is no longer available'))
+        self.assertEqual(self.cart()['total_items'], 3)
+
+
+class CheapestListingTests(MarketplaceFixture, TestCase):
+
+    def test_cheapest_unexpired_in_stock_listings_first(self):
+        response = self.client.get('/api/marketplace/cheapest/', {'medicine': ' PARACETAMOL '})
+        self.assertEqual(self.names(response), ['corner-para-cheap', 'mall-para', 'corner-para'])
+
+        response = self.client.get('/api/marketplace/cheapest/', {'composition': 'paracetamol 500mg', 'limit': 1})
+        self.assertEqual(self.names(response), ['corner-para-cheap'])
+
+    def test_one_listing_per_pharmacy(self):
+        response = self.client.get('/api/marketplace/cheapest/', {'medicine': 'paracetamol', 'per_pharmacy': 'true'})
+        self.assertEqual(self.names(response), ['corner-para-cheap', 'mall-para'])
+
+        response = self.client.get('/api/marketplace/cheapest/', {'medicine': 'paracetamol', 'pharmacy': str(self.mall.id)})
+        self.assertEqual(self.names(response), ['mall-para'])
+
+    def test_exactly_one_of_medicine_or_composition(self):
+        for params in ({}, {'medicine': 'paracetamol', 'composition': 'Paracetamol 500mg'}, {'medicine': 'paracetamol', 'limit': 'all'}):
+            response = self.client.get('/api/marketplace/cheapest/', params)
+            self.assertEqual(response.status_code, 400, params)
+
+
+@override_settings(LOW_STOCK_RATIO=0.2, LOW_STOCK_MIN_THRESHOLD=5)
+class InventorySweeperTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        manufacturer = Manufacturer.objects.create(name='Acme Pharma', wallet_address='addr_manufacturer')
+        self.pharmacy = Pharmacy.objects.create(name='Corner Pharmacy', wallet_address='addr_pharmacy')
+        self.lines = {}
+        for name, quantity, expiry_date in (('full', 100, '2030-01-01'), ('half', 100, '2030-01-01'), ('low', 4, '2030-01-01'), ('expired', 50, '2024-06-01')):
+            batch = Batch.objects.create(
+                batch_id=name.upper(), medicine_name=name, composition='Paracetamol 500mg', manufacturer=manufacturer,
+                manufactured_date='2024-01-01', expiry_date=expiry_date, quantity=100
+            )
+            self.lines[name] = PharmacyInventory.objects.create(
+                pharmacy=self.pharmacy, batch=batch, quantity_available=quantity, price_per_unit=Decimal('2.50')
+            )
+        self.today = date(2025, 1, 1)
+
+    def open_alerts(self):
+        return sorted(InventoryAlert.objects.filter(resolved_at__isnull=True).values_list('inventory__batch__medicine_name', 'kind'))
+
+    def test_sweep_delists_expired_stock_and_flags_low_lines(self):
+        counts = sweep_inventory(self.today)
+
+        self.assertEqual((counts['delisted'], counts['expired_alerts'], counts['low_stock_alerts']), (1, 1, 1))
+        self.assertFalse(PharmacyInventory.objects.get(pk=self.lines['expired'].pk).in_stock)
+        # 20% of the average unexpired line, (100 + 100 + 4) / 3
+        self.assertEqual(Pharmacy.objects.get(pk=self.pharmacy.pk).low_stock_threshold, 13)
+        self.assertEqual(self.open_alerts(), [('expired', InventoryAlert.KIND_EXPIRED), ('low', InventoryAlert.KIND_LOW_STOCK)])
+
+        response = self.client.get('/api/pharmacy/alerts/', {'wallet_address': 'addr_pharmacy'})
+        self.assertEqual(sorted(alert['medicine_name'] for alert in response.data['alerts']), ['expired', 'low'])
+
+    def test_repeated_sweeps_do_not_duplicate_alerts_and_restocks_resolve(self):
+        sweep_inventory(self.today)
+        counts = sweep_inventory(self.today)
+        self.assertEqual((counts['delisted'], counts['expired_alerts'], counts['low_stock_alerts']), (0, 0, 0))
+
+        PharmacyInventory.objects.filter(pk=self.lines['low'].pk).update(quantity_available=60)
+        counts = sweep_inventory(self.today)
+        self.assertEqual(counts['resolved_alerts'], 1)
+        self.assertEqual(self.open_alerts(), [('expired', InventoryAlert.KIND_EXPIRED)])
+
+    def test_alerts_lost_to_a_concurrent_sweep_are_not_counted(self):
+        sweep_inventory(self.today)
+        PharmacyInventory.objects.filter(pk=self.lines['expired'].pk).update(in_stock=True)
+        # As if another sweep raised the alerts between the check and the insert
+        with mock.patch('tracker.sweeper._without_open_alert', lambda inventory, kind: inventory):
+            counts = sweep_inventory(self.today)
+
+        self.assertEqual((counts['delisted'], counts['expired_alerts'], counts['low_stock_alerts']), (1, 0, 0))
+        self.assertEqual(InventoryAlert.objects.count(), 2)
+
+    def test_threshold_never_drops_below_the_floor(self):
+        PharmacyInventory.objects.update(quantity_available=10)
+        sweep_inventory(self.today)
+        self.assertEqual(Pharmacy.objects.get(pk=self.pharmacy.pk).low_stock_threshold, 5)
+
+
+class PharmacyDashboardTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.manufacturer = Manufacturer.objects.create(name='Acme Pharma', wallet_address='addr_manufacturer')
+        self.pharmacy = Pharmacy.objects.create(name='Corner Pharmacy', wallet_address='addr_pharmacy')
+        self.batches = {}
+        for batch_id in ('RESENT', 'STOCKED', 'ELSEWHERE'):
+            self.batches[batch_id] = Batch.objects.create(
+                batch_id=batch_id, medicine_name='Paracetamol', composition='Paracetamol 500mg', manufacturer=self.manufacturer,
+                manufactured_date='2024-01-01', expiry_date='2030-01-01', quantity=100
+            )
+        now = timezone.now()
+        self.transfer('RESENT', 'addr_distributor_a', 'addr_pharmacy', now - timedelta(days=2))
+        self.transfer('RESENT', 'addr_distributor_b', 'addr_pharmacy', now - timedelta(days=1))
+        self.transfer('STOCKED', 'addr_distributor_a', 'addr_pharmacy', now - timedelta(days=3))
+        self.transfer('ELSEWHERE', 'addr_distributor_a', 'addr_other_pharmacy', now)
+        PharmacyInventory.objects.create(pharmacy=self.pharmacy, batch=self.batches['STOCKED'], quantity_available=10, price_per_unit=Decimal('2.50'))
+
+    def transfer(self, batch_id, from_wallet, to_wallet, timestamp):
+        record_transactions([Transaction(
+            batch=self.batches[batch_id], transaction_type='TRANSFER', from_wallet=from_wallet, to_wallet=to_wallet,
+            tx_hash=f"{batch_id}-{from_wallet}", timestamp=timestamp
+        )])
+
+    def dashboard(self):
+        response = self.client.get('/api/pharmacy/dashboard/', {'wallet_address': 'addr_pharmacy'})
+        self.assertEqual(response.status_code, 200, response.data)
+        return response.data
+
+    def test_latest_transfer_per_batch_not_yet_in_inventory(self):
+        dashboard = self.dashboard()
+
+        self.assertEqual((dashboard['total_inventory'], dashboard['pending_transfers']), (1, 1))
+        self.assertEqual([(row['batch_id'], row['from_wallet']) for row in dashboard['incoming']], [('RESENT', 'addr_distributor_b')])
+
+    def test_writes_invalidate_the_cached_dashboard(self):
+        self.dashboard()
+        self.transfer('ELSEWHERE', 'addr_other_pharmacy', 'addr_pharmacy', timezone.now())
+        self.assertEqual([row['batch_id'] for row in self.dashboard()['incoming']], ['ELSEWHERE', 'RESENT'])
+
+        PharmacyInventory.objects.create(pharmacy=self.pharmacy, batch=self.batches['RESENT'], quantity_available=5, price_per_unit=Decimal('2.50'))
+        dashboard = self.dashboard()
+        self.assertEqual(dashboard['total_inventory'], 2)
+        self.assertEqual([row['batch_id'] for row in dashboard['incoming']], ['ELSEWHERE'])
+
+
+@override_settings(METRICS_TOKEN='scrape-secret')
+class MetricsTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def scrape(self, **headers):
+        return self.client.get('/api/_metrics', **headers)
+
+    def test_endpoint_requires_the_token_or_a_staff_session(self):
+        self.assertEqual(self.scrape().status_code, 403)
+        self.assertEqual(self.scrape(HTTP_AUTHORIZATION='Bearer wrong').status_code, 403)
+        self.client.force_login(User.objects.create(username='patient'))
+        self.assertEqual(self.scrape().status_code, 403)
+
+        self.client.force_login(User.objects.create(username='operator', is_staff=True))
+        self.assertEqual(self.scrape().status_code, 200)
+        self.client.logout()
+        response = self.scrape(HTTP_AUTHORIZATION='Bearer scrape-secret')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], metrics.PROMETHEUS_CONTENT_TYPE)
+
+    def test_requests_are_rendered_per_endpoint(self):
+        self.client.get('/api/pharmacy/alerts/')
+        self.client.get('/api/marketplace/search/', {'q': 'paracetamol'})
+        body = self.scrape(HTTP_AUTHORIZATION='Bearer scrape-secret').content.decode()
+
+        self.assertIn('# TYPE medisure_request_duration_seconds summary', body)
+        self.assertIn('medisure_request_duration_seconds{endpoint="marketplace-search",quantile="0.99"}', body)
+        self.assertRegex(body, r'medisure_db_queries_count\{endpoint="marketplace-search"\} [1-9]')
+        self.assertRegex(body, r'medisure_responses_total\{endpoint="pharmacy-alerts",status="4xx"\} [1-9]')
+
+    def test_streamed_responses_are_recorded_once_the_body_is_sent(self):
+        manufacturer = Manufacturer.objects.create(name='Acme Pharma', wallet_address='addr_manufacturer')
+        batch = Batch.objects.create(
+            batch_id='STREAMED', medicine_name='Paracetamol', composition='Paracetamol 500mg', manufacturer=manufacturer,
+            manufactured_date='2024-01-01', expiry_date='2030-01-01', quantity=100
+        )
+        Transaction.objects.create(batch=batch, transaction_type='MINT', to_wallet='addr_manufacturer', tx_hash='tx-streamed')
+
+        with mock.patch('tracker.middleware.finish_request', wraps=metrics.finish_request) as finished:
+            response = self.client.get('/api/export/transactions/')
+            self.assertFalse(finished.called)
+            body = b''.join(response.streaming_content)
+
+        self.assertIn(b'tx-streamed', body)
+        finished.assert_called_once()
+        token, endpoint, status_code, sample = finished.call_args.args
+        self.assertEqual((endpoint, status_code), ('export-transactions', 200))
+        # The export query runs while streaming and still counts
+        self.assertGreaterEqual(sample.db_queries, 1)
+
+    def test_closing_an_unread_stream_still_records_it(self):
+        with mock.patch('tracker.middleware.finish_request', wraps=metrics.finish_request) as finished:
+            self.client.get('/api/export/transactions/').close()
+        finished.assert_called_once()
+
+    def test_labels_are_escaped(self):
+        sample, token = metrics.start_request()
+        metrics.finish_request(token, 'odd"name\\', 200, sample)
+        self.assertIn('endpoint="odd\\"name\\\\"', metrics.render_metrics())
+
+    def test_concurrent_blockfrost_calls_are_all_counted(self):
+        sample, token = metrics.start_request()
+        try:
+            context = contextvars.copy_context()
+            threads = [
+                threading.Thread(target=context.copy().run, args=(lambda: [metrics.record_blockfrost_call(0.001) for _ in range(2000)],))
+                for _ in range(8)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            metrics.finish_request(token, 'concurrency-test', 200, sample)
+        self.assertEqual(sample.blockfrost_calls, 16000)
+
+
+class KeysetPaginationTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        manufacturer = Manufacturer.objects.create(name='Acme Pharma', wallet_address='addr_manufacturer')
+        batch = Batch.objects.create(
+            batch_id='PAGED', medicine_name='Paracetamol', composition='Paracetamol 500mg', manufacturer=manufacturer,
+            manufactured_date='2024-01-01', expiry_date='2030-01-01', quantity=100
+        )
+        now = timezone.now()
+        # Two rows share a timestamp so the id tie-breaker is exercised
+        for number, timestamp in enumerate([now, now, now - timedelta(hours=1), now - timedelta(hours=2), now - timedelta(hours=3)]):
+            Transaction.objects.create(batch=batch, transaction_type='TRANSFER', to_wallet='addr_pharmacy', tx_hash=f"tx-{number}", timestamp=timestamp)
+
+    def cursor(self, key):
+        return base64.urlsafe_b64encode(json.dumps(key).encode()).decode()
+
+    def test_pages_cover_every_row_once_in_order(self):
+        seen = []
+        response = self.client.get('/api/transactions/', {'page_size': 2})
+        while True:
+            self.assertEqual(response.status_code, 200)
+            seen += [row['tx_hash'] for row in response.data['results']]
+            if not response.data['next']:
+                break
+            response = self.client.get(response.data['next'])
+        expected = list(Transaction.objects.order_by('-timestamp', '-id').values_list('tx_hash', flat=True))
+        self.assertEqual(seen, expected)
+
+    def test_malformed_cursors_are_rejected(self):
+        for cursor in (
+            'not base64!', self.cursor({'a': 1}), self.cursor(['x']), self.cursor(['x', 'notanint']),
+            self.cursor(['2024-01-01', 'abc']), self.cursor([1, 2]), self.cursor([None, None]),
+        ):
+            response = self.client.get('/api/transactions/', {'cursor': cursor})
+            self.assertEqual(response.status_code, 404, cursor)
+            self.assertEqual(response.data['detail'], 'Invalid cursor')
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class VerifyCacheTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.manufacturer = Manufacturer.objects.create(name='Acme Pharma', wallet_address='addr_manufacturer')
+        # No chain identifiers, so no Blockfrost lookup is made
+        self.batch = Batch.objects.create(
+            batch_id='VERIFY', medicine_name='Paracetamol', composition='Paracetamol 500mg', manufacturer=self.manufacturer,
+            manufactured_date='2024-01-01', expiry_date='2030-01-01', quantity=100, qr_code='qr-verify'
+        )
+
+    def verify(self, **headers):
+        return self.client.get('/api/verify/qr-verify/', **headers)
+
+    def test_matching_etag_gets_304(self):
+        response = self.verify()
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('public', response['Cache-Control'])
+        self.assertIn(f"max-age={settings.QR_VERIFY_MAX_AGE}", response['Cache-Control'])
+
+        with self.assertNumQueries(0):
+            not_modified = self.verify(HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(not_modified['ETag'], response['ETag'])
+        self.assertEqual(self.verify(HTTP_IF_NONE_MATCH='"stale"').status_code, 200)
+
+    def test_batch_and_manufacturer_edits_change_the_etag(self):
+        etag = self.verify()['ETag']
+
+        # Lifecycle writes do not touch the patient-facing payload, so the entry stays
+        Transaction.objects.create(batch=self.batch, transaction_type='MINT', to_wallet='addr_manufacturer', tx_hash='tx-verify')
+        self.assertEqual(self.verify()['ETag'], etag)
+
+        self.batch.medicine_name = 'Paracetamol Forte'
+        self.batch.save()
+        response = self.verify()
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.data['medicine_name'], 'Paracetamol Forte')
+
+        self.manufacturer.name = 'Acme Generics'
+        self.manufacturer.save()
+        self.assertEqual(self.verify().data['manufacturer'], 'Acme Generics')
+
+
+class BlockfrostCacheTests(TestCase):
+
+    def setUp(self):
+        self.cache = get_blockfrost_cache()
+        self.cache.clear()
+        self.api = BlockfrostClient(project_id='test', base_url='https://blockfrost.test')
+        self.api.session.get = mock.Mock()
+        patcher = mock.patch('tracker.blockfrost_utils.get_blockfrost_api', return_value=self.api)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def respond(self, status_code, body):
+        response = mock.Mock(status_code=status_code)
+        response.json.return_value = body
+        self.api.session.get.return_value = response
+
+    def test_second_lookup_within_the_ttl_makes_no_http_call(self):
+        self.respond(200, {'asset': 'policyasset', 'quantity': '1'})
+
+        first = get_asset_info('policy', 'asset')
+        second = get_asset_info('policy', 'asset')
+
+        self.assertTrue(first['success'])
+        self.assertEqual(second['data'].quantity, '1')
+        self.assertEqual(self.api.session.get.call_count, 1)
+        self.assertEqual(peek_cached('asset', 'policyasset').quantity, '1')
+
+    def test_not_found_is_cached_for_the_negative_ttl(self):
+        self.respond(404, {'status_code': 404, 'error': 'Not Found', 'message': 'The requested component has not been found.'})
+
+        with mock.patch.object(self.cache, 'set', wraps=self.cache.set) as stored:
+            first = get_asset_info('policy', 'missing')
+        second = get_asset_info('policy', 'missing')
+
+        self.assertEqual((first['success'], second['success']), (False, False))
+        self.assertEqual(self.api.session.get.call_count, 1)
+        cache_key, cached, ttl = stored.call_args.args
+        self.assertEqual((cache_key, cached[0], ttl), ('blockfrost:asset:policymissing', False, settings.BLOCKFROST_NEGATIVE_CACHE_TTL))
+        # A remembered 404 is never handed out as data
+        self.assertIsNone(peek_cached('asset', 'policymissing'))
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class JourneyTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        manufacturer = Manufacturer.objects.create(name='Acme Pharma', wallet_address='addr_manufacturer')
+        Distributor.objects.create(name='Rapid Logistics', wallet_address='addr_distributor')
+        self.batch = Batch.objects.create(
+            batch_id='JOURNEY', medicine_name='Paracetamol', composition='Paracetamol 500mg', manufacturer=manufacturer,
+            manufactured_date='2024-01-01', expiry_date='2030-01-01', quantity=100
+        )
+        record_transactions([
+            Transaction(batch=self.batch, transaction_type='MINT', to_wallet='addr_manufacturer', tx_hash='tx-mint'),
+            Transaction(
+                batch=self.batch, transaction_type='TRANSFER', from_wallet='addr_manufacturer', to_wallet='addr_unknown',
+                tx_hash='tx-transfer', timestamp=timezone.now() + timedelta(minutes=1)
+            ),
+        ])
+
+    def steps(self):
+        response = self.client.get('/api/journey/JOURNEY/')
+        self.assertEqual(response.status_code, 200, response.data)
+        return [(step['type'], step['from_name'], step['from_role'], step['to_name'], step['to_role']) for step in response.data['journey']]
+
+    def test_wallets_resolve_to_their_entities(self):
+        self.assertEqual(self.steps(), [
+            ('MINT', None, None, 'Acme Pharma', 'manufacturer'),
+            ('TRANSFER', 'Acme Pharma', 'manufacturer', None, None),
+        ])
+
+    def test_transaction_writes_invalidate_the_cached_timeline(self):
+        self.steps()
+        with self.assertNumQueries(1):
+            self.steps()
+
+        # An edit through the ORM (CRUD API, admin) goes through the post_save signal
+        transfer = Transaction.objects.get(tx_hash='tx-transfer')
+        transfer.to_wallet = 'addr_distributor'
+        transfer.save()
+        self.assertEqual(self.steps()[1], ('TRANSFER', 'Acme Pharma', 'manufacturer', 'Rapid Logistics', 'distributor'))
+
+        # New history goes through tracker.ledger
+        record_transactions([Transaction(
+            batch=self.batch, transaction_type='RECEIVED', from_wallet='addr_distributor', to_wallet='addr_distributor',
+            tx_hash='tx-received', timestamp=timezone.now() + timedelta(minutes=2)
+        )])
+        self.assertEqual(len(self.steps()), 3)
+
+
+class WalletDirectoryTests(TestCase):
+
+    def setUp(self):
+        self.manufacturer = Manufacturer.objects.create(name='Acme Pharma', wallet_address='addr_manufacturer')
+        self.pharmacy = Pharmacy.objects.create(name='Corner Pharmacy', wallet_address='addr_corner')
+
+    def test_renames_and_new_wallets_reach_the_directory(self):
+        self.manufacturer.name = 'Acme Generics'
+        self.manufacturer.save()
+        self.pharmacy.wallet_address = 'addr_corner_v2'
+        self.pharmacy.save()
+
+        self.assertEqual(lookup_wallet('addr_manufacturer')['name'], 'Acme Generics')
+        self.assertIsNone(lookup_wallet('addr_corner'))
+        self.assertEqual(lookup_wallet('addr_corner_v2'), {
+            'role': WalletDirectory.ROLE_PHARMACY, 'entity_id': self.pharmacy.pk, 'name': 'Corner Pharmacy'
+        })
+        self.assertEqual(WalletDirectory.objects.count(), 2)
+
+    def test_deleted_entities_leave_the_directory(self):
+        self.pharmacy.delete()
+        self.manufacturer.delete()
+
+        self.assertEqual(resolve_wallets(['addr_manufacturer', 'addr_corner']), {})
+        self.assertFalse(WalletDirectory.objects.exists())
+
+
+class TransactionExportTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        manufacturer = Manufacturer.objects.create(name='Acme Pharma', wallet_address='addr_manufacturer')
+        batches = {
+            batch_id: Batch.objects.create(
+                batch_id=batch_id, medicine_name='Paracetamol', composition='Paracetamol 500mg', manufacturer=manufacturer,
+                manufactured_date='2024-01-01', expiry_date='2030-01-01', quantity=100
+            )
+            for batch_id in ('EXPORT-A', 'EXPORT-B')
+        }
+        # The two histories interleave in time
+        start = timezone.now()
+        steps = [('EXPORT-A', 'MINT'), ('EXPORT-B', 'MINT'), ('EXPORT-A', 'TRANSFER'), ('EXPORT-B', 'TRANSFER'), ('EXPORT-A', 'RECEIVED')]
+        record_transactions([
+            Transaction(
+                batch=batches[batch_id], transaction_type=transaction_type, to_wallet='addr_holder',
+                tx_hash=f"{batch_id}-{transaction_type}", timestamp=start + timedelta(minutes=minute)
+            )
+            for minute, (batch_id, transaction_type) in enumerate(steps)
+        ])
+        self.tx_hashes = [f"{batch_id}-{transaction_type}" for batch_id, transaction_type in steps]
+
+    def export(self, **params):
+        response = self.client.get('/api/export/transactions/', params)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode()
+
+    def test_csv_streams_a_header_and_rows_in_time_order(self):
+        lines = list(csv.reader(StringIO(self.export(export_format='csv'))))
+
+        self.assertEqual(lines[0], [name for name, _ in EXPORT_COLUMNS])
+        self.assertEqual([line[lines[0].index('tx_hash')] for line in lines[1:]], self.tx_hashes)
+        self.assertEqual(lines[1][:4], ['EXPORT-A', 'Paracetamol', 'Acme Pharma', 'MINT'])
+
+    def test_ndjson_streams_one_object_per_transaction(self):
+        rows = [json.loads(line) for line in self.export(export_format='ndjson').splitlines()]
+        self.assertEqual([row['tx_hash'] for row in rows], self.tx_hashes)
+
+    def test_journeys_group_by_batch_across_chunk_boundaries(self):
+        journeys = [json.loads(line) for line in self.export(export_format='ndjson', group='journey').splitlines()]
+        # Chunks of two rows split EXPORT-A's three transactions
+        chunked = [json.loads(line) for line in export_lines('ndjson', export_queryset(journeys=True), journeys=True, chunk_size=2)]
+
+        for exported in (journeys, chunked):
+            # One line per batch; lines follow the (random) batch pk order
+            self.assertEqual(
+                sorted((journey['batch_id'], [step['type'] for step in journey['journey']]) for journey in exported),
+                [('EXPORT-A', ['MINT', 'TRANSFER', 'RECEIVED']), ('EXPORT-B', ['MINT', 'TRANSFER'])]
+            )
@@ -1,6 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from . import views
+from . import views, async_views
 from .auth_views import signup, signin
 
 router = DefaultRouter()
@@ -14,14 +14,19 @@ router.register(r'inventory', views.PharmacyInventoryViewSet)
 urlpatterns = [
     path('', include(router.urls)),
     path('mint/', views.mint_batch, name='mint-batch'),
+    path('mint/bulk/', views.mint_batch_bulk, name='mint-batch-bulk'),
     path('verify/<str:qr_code>/', views.verify_medicine, name='verify-medicine'),
     path('journey/<str:batch_id>/', views.track_journey, name='track-journey'),
     path('transfer/', views.transfer_batch, name='transfer-batch'),
+    path('transfer/bulk/', views.transfer_batch_bulk, name='transfer-batch-bulk'),
     path('auth/signup/', signup, name='signup'),
     path('auth/signin/', signin, name='signin'),
     path('dashboard/', views.dashboard_stats, name='dashboard-stats'),
+    path('export/transactions/', views.export_transactions, name='export-transactions'),
     path('pharmacy/dashboard/', views.pharmacy_dashboard_stats, name='pharmacy-dashboard-stats'),
     path('pharmacy/receive/', views.receive_batch, name='pharmacy-receive-batch'),
+    path('pharmacy/alerts/', views.pharmacy_alerts, name='pharmacy-alerts'),
+    path('verifications/<str:verification_id>/', views.verification_status, name='verification-status'),
     path('pharmacy/<str:pharmacy_id>/inventory/', views.pharmacy_inventory, name='pharmacy-inventory'),
     path('cart/', views.get_cart, name='get-cart'),
     path('cart/add/', views.add_to_cart, name='add-to-cart'),
@@ -35,4 +40,10 @@ urlpatterns = [
     path('users/<int:user_id>/', views.get_user, name='get-user'),
     path('users/', views.list_users_by_role, name='list-users'),
     path('marketplace/', views.list_marketplace_drugs, name='marketplace'),
+    path('marketplace/search/', views.search_marketplace, name='marketplace-search'),
+    path('marketplace/cheapest/', views.cheapest_marketplace_listings, name='marketplace-cheapest'),
+    path('async/verify/<str:qr_code>/', async_views.verify_medicine, name='async-verify-medicine'),
+    path('async/transfer/', async_views.transfer_batch, name='async-transfer-batch'),
+    path('async/pharmacy/receive/', async_views.receive_batch, name='async-pharmacy-receive-batch'),
+    path('_metrics', views.metrics, name='metrics'),
 ]
\ No newline at end of file
@@ -0,0 +1,313 @@
+import logging
+import uuid
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction as db_transaction
+from django.db.models import F
+from django.urls import reverse
+from django.utils import timezone
+
+from .ledger import apply_transactions, record_transactions
+from .models import Batch, Transaction, Pharmacy, PharmacyInventory, ChainVerification, WalletDirectory
+from .wallets import lookup_wallet
+
+logger = logging.getLogger(__name__)
+
+
+def check_transfer_holder(wallet_address, policy_id, asset_name, attempts=3):
+    """Verify the receiving wallet (or its stake key) holds the batch asset"""
+    from .blockfrost_utils import verify_wallet_has_asset, verify_stake_has_asset
+
+    verification = verify_wallet_has_asset(wallet_address, policy_id, asset_name, attempts=attempts)
+
+    # If standard check fails, try Stake Address match (handles HD wallet internal addresses)
+    if not verification.get('has_asset'):
+        stake_verification = verify_stake_has_asset(wallet_address, policy_id, asset_name)
+        if stake_verification.get('has_asset'):
+            verification = stake_verification
+
+    return verification
+
+
+def check_receipt_holder(wallet_address, policy_id, asset_name, attempts=3):
+    """Verify the pharmacy wallet holds the batch asset"""
+    from .blockfrost_utils import verify_wallet_has_asset
+
+    return verify_wallet_has_asset(wallet_address, policy_id, asset_name, attempts=attempts)
+
+
+async def acheck_transfer_holder(wallet_address, policy_id, asset_name, attempts=3):
+    """Async check_transfer_holder for the ASGI views"""
+    from .blockfrost_async import averify_wallet_has_asset, averify_stake_has_asset
+
+    verification = await averify_wallet_has_asset(wallet_address, policy_id, asset_name, attempts=attempts)
+
+    # If standard check fails, try Stake Address match (handles HD wallet internal addresses)
+    if not verification.get('has_asset'):
+        stake_verification = await averify_stake_has_asset(wallet_address, policy_id, asset_name)
+        if stake_verification.get('has_asset'):
+            verification = stake_verification
+
+    return verification
+
+
+async def acheck_receipt_holder(wallet_address, policy_id, asset_name, attempts=3):
+    """Async check_receipt_holder for the ASGI views"""
+    from .blockfrost_async import averify_wallet_has_asset
+
+    return await averify_wallet_has_asset(wallet_address, policy_id, asset_name, attempts=attempts)
+
+
+def record_transfer(batch, from_wallet, to_wallet, tx_hash):
+    """Record a verified TRANSFER transaction"""
+    return record_transactions([Transaction(
+        batch=batch,
+        transaction_type='TRANSFER',
+        from_wallet=from_wallet,
+        to_wallet=to_wallet,
+        tx_hash=tx_hash
+    )])[0]
+
+
+def assets_delivered(tx_hash, wallet_address):
+    """Sum the assets a transaction sent to wallet_address or any address sharing its stake key.
+
+    One transaction_utxos lookup covers every batch moved by the transaction,
+    instead of polling the holder list of each asset.
+    """
+    from .blockfrost_utils import get_transaction_utxos, get_address_info
+
+    result = get_transaction_utxos(tx_hash)
+    if not result['success']:
+        return result
+
+    stakes = {}
+    def stake_of(address):
+        if address not in stakes:
+            info = get_address_info(address)
+            stakes[address] = info['data'].stake_address if info['success'] else None
+        return stakes[address]
+
+    delivered = defaultdict(int)
+    for tx_output in result['data'].outputs:
+        if getattr(tx_output, 'collateral', False):
+            continue
+        if tx_output.address != wallet_address:
+            target_stake = stake_of(wallet_address)
+            if not target_stake or stake_of(tx_output.address) != target_stake:
+                continue
+        for amount in tx_output.amount:
+            delivered[amount.unit] += int(amount.quantity)
+    return {'success': True, 'assets': delivered}
+
+
+def record_bulk_transfer(batch_ids, from_wallet, to_wallet, tx_hash):
+    """Verify and record one on-chain transfer that moved many batches; returns per-batch results"""
+    batches = {batch.batch_id: batch for batch in Batch.objects.filter(batch_id__in=batch_ids)}
+    already_recorded = set(Transaction.objects.filter(
+        tx_hash=tx_hash,
+        batch__in=batches.values()
+    ).values_list('batch__batch_id', flat=True))
+
+    delivered = None
+    if any(batch.policy_id and batch.asset_name for batch in batches.values()):
+        verification = assets_delivered(tx_hash, to_wallet)
+        if not verification['success']:
+            raise RuntimeError(verification['error'])
+        delivered = verification['assets']
+
+    results = []
+    transfers = []
+    for batch_id in dict.fromkeys(batch_ids):
+        batch = batches.get(batch_id)
+        if batch is None:
+            results.append({'batch_id': batch_id, 'success': False, 'error': 'Batch not found'})
+        elif batch_id in already_recorded:
+            results.append({'batch_id': batch_id, 'success': False, 'error': 'Transfer already recorded'})
+        elif batch.policy_id and batch.asset_name and delivered.get(f"{batch.policy_id}{batch.asset_name}", 0) <= 0:
+            results.append({'batch_id': batch_id, 'success': False, 'error': 'Asset not found in receiving wallet'})
+        else:
+            results.append({'batch_id': batch_id, 'success': True})
+            transfers.append(Transaction(
+                batch=batch,
+                transaction_type='TRANSFER',
+                from_wallet=from_wallet,
+                to_wallet=to_wallet,
+                tx_hash=tx_hash
+            ))
+
+    record_transactions(transfers)
+    return results
+
+
+def record_receipt(batch, wallet_address, price_per_unit, quantity):
+    """Add a verified batch to the pharmacy inventory and record the RECEIVED transaction"""
+    entry = lookup_wallet(wallet_address, role=WalletDirectory.ROLE_PHARMACY)
+    if entry:
+        pharmacy_id = entry['entity_id']
+    else:
+        pharmacy, created = Pharmacy.objects.get_or_create(
+            wallet_address=wallet_address,
+            defaults={'name': f"Pharmacy ({wallet_address[:8]}...)"}
+        )
+        pharmacy_id = pharmacy.pk
+
+    inventory, created = PharmacyInventory.objects.update_or_create(
+        pharmacy_id=pharmacy_id,
+        batch=batch,
+        defaults={
+            'quantity_available': quantity,
+            'price_per_unit': price_per_unit,
+            # Expired stock is received but never listed
+            'in_stock': batch.expiry_date > timezone.localdate()
+        }
+    )
+
+    received, created = Transaction.objects.get_or_create(
+        batch=batch,
+        transaction_type='RECEIVED',
+        defaults={
+            'from_wallet': 'Unknown',
+            'to_wallet': wallet_address,
+            'tx_hash': f"REC-{uuid.uuid4().hex[:16]}"
+        }
+    )
+    if created:
+        apply_transactions([received])
+
+    return inventory
+
+
+def verification_mode_deferred(data, query_params):
+    """Whether holder verification should be deferred to the background verifier"""
+    requested = data.get('defer_verification', query_params.get('defer_verification'))
+    if requested is None:
+        return settings.CHAIN_VERIFICATION_DEFERRED
+    return str(requested).lower() in ('1', 'true', 'yes')
+
+
+def verification_accepted_body(request, pending, batch):
+    """202 body pointing the client at the status of a queued verification"""
+    return {
+        'success': True,
+        'status': pending.status,
+        'message': 'On-chain verification pending',
+        'batch_id': batch.batch_id,
+        'verification_id': str(pending.id),
+        'status_url': request.build_absolute_uri(reverse('verification-status', args=[str(pending.id)]))
+    }
+
+
+def queue_verification(kind, batch, wallet_address, payload):
+    """Record a pending verification for the background verifier"""
+    return ChainVerification.objects.create(
+        kind=kind,
+        batch=batch,
+        wallet_address=wallet_address,
+        payload=payload
+    )
+
+
+def next_backoff(attempts):
+    """Seconds to wait before the next verification attempt"""
+    delay = settings.CHAIN_VERIFICATION_BACKOFF_BASE * (2 ** max(attempts - 1, 0))
+    return min(delay, settings.CHAIN_VERIFICATION_BACKOFF_MAX)
+
+
+def claim_verification(verification):
+    """Claim a due verification by bumping its attempt counter; False if another worker got it first"""
+    now = timezone.now()
+    attempts = verification.attempts + 1
+    next_attempt_at = now + timedelta(seconds=next_backoff(attempts))
+    claimed = ChainVerification.objects.filter(
+        pk=verification.pk,
+        status=ChainVerification.STATUS_PENDING,
+        attempts=verification.attempts
+    ).update(attempts=F('attempts') + 1, next_attempt_at=next_attempt_at, updated_at=now)
+    if claimed:
+        verification.attempts = attempts
+        verification.next_attempt_at = next_attempt_at
+    return bool(claimed)
+
+
+def finalize_verification(verification, result):
+    """Write the Transaction / PharmacyInventory rows for a verified request"""
+    batch = verification.batch
+    payload = verification.payload
+
+    with db_transaction.atomic():
+        if verification.kind == ChainVerification.KIND_TRANSFER:
+            verification.transaction = record_transfer(
+                batch,
+                payload['from_wallet'],
+                verification.wallet_address,
+                payload['tx_hash']
+            )
+        else:
+            verification.inventory = record_receipt(
+                batch,
+                verification.wallet_address,
+                payload['price_per_unit'],
+                int(result.get('quantity', 1))
+            )
+        verification.status = ChainVerification.STATUS_VERIFIED
+        verification.last_error = None
+        verification.save()
+
+
+def fail_attempt(verification, error):
+    """Record a failed attempt; the verification stays pending until its attempts run out.
+
+    claim_verification already pushed next_attempt_at back, so the retry is backed off.
+    """
+    # finalize_verification may have pointed these at rows its rollback discarded
+    verification.transaction = None
+    verification.inventory = None
+    verification.status = ChainVerification.STATUS_PENDING
+    verification.last_error = error
+    if verification.attempts >= settings.CHAIN_VERIFICATION_MAX_ATTEMPTS:
+        verification.status = ChainVerification.STATUS_FAILED
+    verification.save(update_fields=['status', 'last_error', 'updated_at'])
+
+
+def run_verification(verification):
+    """Run one verification attempt; returns the resulting status"""
+    if not claim_verification(verification):
+        return None
+
+    try:
+        batch = verification.batch
+        if verification.kind == ChainVerification.KIND_TRANSFER:
+            result = check_transfer_holder(verification.wallet_address, batch.policy_id, batch.asset_name, attempts=1)
+        else:
+            result = check_receipt_holder(verification.wallet_address, batch.policy_id, batch.asset_name, attempts=1)
+
+        if result.get('success') and result.get('has_asset'):
+            finalize_verification(verification, result)
+        else:
+            fail_attempt(verification, result.get('error') or 'Asset not found in receiving wallet')
+    except Exception as e:
+        logger.exception('Verification %s attempt %d failed', verification.pk, verification.attempts)
+        fail_attempt(verification, str(e))
+    return verification.status
+
+
+def process_due_verifications(limit=50):
+    """Run every pending verification whose next attempt is due"""
+    due = ChainVerification.objects.filter(
+        status=ChainVerification.STATUS_PENDING,
+        next_attempt_at__lte=timezone.now()
+    ).select_related('batch').order_by('next_attempt_at')[:limit]
+
+    processed = 0
+    for verification in due:
+        try:
+            if run_verification(verification) is not None:
+                processed += 1
+        except Exception:
+            # Recording the failure failed too (e.g. the database is locked); the
+            # claimed attempt is retried once its backoff expires
+            logger.exception('Could not record verification %s', verification.pk)
+    return processed
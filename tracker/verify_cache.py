@@ -0,0 +1,99 @@
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils.cache import get_conditional_response, patch_cache_control
+
+from .blockfrost_async import aget_asset_info
+from .blockfrost_utils import get_asset_info, to_plain_data
+from .models import Batch
+
+# Public QR verification payloads, cached per QR code. Entries are dropped by
+# the Batch/Manufacturer signals in tracker.signals when a batch's chain
+# identifiers (or any other field shown to the patient) change; lifecycle
+# updates from tracker.ledger never touch them. The default cache is shared by
+# every process, so an edit made by any worker or management command takes
+# effect everywhere rather than after QR_VERIFY_CACHE_TTL.
+
+def verify_cache_key(qr_code):
+    return f"verify:{qr_code}"
+
+def verification_payload(batch, blockchain_data):
+    """Build the patient-facing verification response for a batch"""
+    return {
+        'success': True,
+        'medicine_name': batch.medicine_name,
+        'batch_id': batch.batch_id,
+        'manufacturer': batch.manufacturer.name,
+        'manufactured_date': batch.manufactured_date.isoformat(),
+        'expiry_date': batch.expiry_date.isoformat(),
+        'composition': batch.composition,
+        'verified': batch.nft_minted,
+        'policy_id': batch.policy_id,
+        'asset_name': batch.asset_name,
+        'blockchain_proof': to_plain_data(blockchain_data)
+    }
+
+def compute_etag(payload):
+    encoded = json.dumps(payload, cls=DjangoJSONEncoder, sort_keys=True).encode()
+    return f'"{hashlib.sha256(encoded).hexdigest()[:32]}"'
+
+def build_entry(batch, asset_result):
+    """Return the (entry, ttl) to cache for a QR code lookup.
+
+    A failed Blockfrost lookup still answers, but only for the short retry
+    TTL so the proof is filled in once the chain is reachable again.
+    """
+    if batch is None:
+        return {'found': False}, settings.QR_VERIFY_RETRY_TTL
+
+    blockchain_data = asset_result['data'] if asset_result and asset_result['success'] else None
+    payload = verification_payload(batch, blockchain_data)
+    entry = {'found': True, 'payload': payload, 'etag': compute_etag(payload)}
+    degraded = asset_result is not None and not asset_result['success']
+    return entry, settings.QR_VERIFY_RETRY_TTL if degraded else settings.QR_VERIFY_CACHE_TTL
+
+def has_chain_identifiers(batch):
+    return bool(batch.policy_id and batch.asset_name)
+
+def get_verification(qr_code):
+    """Return the cached verification entry, building it on a miss"""
+    entry = cache.get(verify_cache_key(qr_code))
+    if entry is not None:
+        return entry
+
+    batch = Batch.objects.select_related('manufacturer').filter(qr_code=qr_code).first()
+    asset_result = None
+    if batch is not None and has_chain_identifiers(batch):
+        asset_result = get_asset_info(batch.policy_id, batch.asset_name)
+    entry, ttl = build_entry(batch, asset_result)
+    cache.set(verify_cache_key(qr_code), entry, ttl)
+    return entry
+
+async def aget_verification(qr_code):
+    """Async variant of get_verification for the ASGI views"""
+    entry = await cache.aget(verify_cache_key(qr_code))
+    if entry is not None:
+        return entry
+
+    batch = await Batch.objects.select_related('manufacturer').filter(qr_code=qr_code).afirst()
+    asset_result = None
+    if batch is not None and has_chain_identifiers(batch):
+        asset_result = await aget_asset_info(batch.policy_id, batch.asset_name)
+    entry, ttl = build_entry(batch, asset_result)
+    await cache.aset(verify_cache_key(qr_code), entry, ttl)
+    return entry
+
+def invalidate_verification(*qr_codes):
+    cache.delete_many([verify_cache_key(qr_code) for qr_code in qr_codes if qr_code])
+
+def conditional_verification_response(request, entry, build_response):
+    """Answer 304 when If-None-Match matches, otherwise build_response(payload); both carry validators"""
+    response = get_conditional_response(request, etag=entry['etag'])
+    if response is None:
+        response = build_response(entry['payload'])
+    response['ETag'] = entry['etag']
+    patch_cache_control(response, public=True, max_age=settings.QR_VERIFY_MAX_AGE)
+    return response
@@ -1,8 +1,26 @@
 from rest_framework import viewsets, status
-from rest_framework.decorators import api_view
+from rest_framework.decorators import api_view, parser_classes
+from rest_framework.parsers import JSONParser
 from rest_framework.response import Response
+from django.conf import settings
+from django.http import Http404, HttpResponse, HttpResponseForbidden, StreamingHttpResponse
 from django.contrib.auth.models import User
-from .models import Manufacturer, Distributor, Pharmacy, Batch, Transaction, PharmacyInventory, Cart, CartItem, Order, OrderItem, UserProfile
+from django.db import transaction as db_transaction
+from django.db.models import Count, F, Q
+from .models import Manufacturer, Distributor, Pharmacy, Batch, Transaction, PharmacyInventory, Cart, CartItem, Order, OrderItem, UserProfile, ChainVerification, WalletDirectory, InventoryAlert
+from .checkout import CheckoutError, place_order
+from .dashboard import get_pharmacy_dashboard
+from .blockfrost_utils import blockfrost_cache_stats, get_asset_history, get_lookup_executor, to_plain_data
+from .exports import EXPORT_FORMATS, export_lines, export_queryset, parse_export_bound
+from .journey import get_journey
+from .metrics import PROMETHEUS_CONTENT_TYPE, render_metrics, scrape_allowed
+from .ledger import apply_transactions, rebuild_batch_status, record_transactions
+from .minting import bulk_mint
+from .parsers import NDJSONParser
+from .pagination import KeysetPagination
+from .search import CHEAPEST_LIMIT, cheapest_listings, search_facets, search_listings
+from .wallets import lookup_wallet
+from .verify_cache import get_verification, conditional_verification_response
 from .serializers import (
     ManufacturerSerializer, 
     DistributorSerializer, 
@@ -13,34 +31,70 @@ from .serializers import (
     CartSerializer,
     CartItemSerializer,
     OrderSerializer,
-    OrderItemSerializer
+    OrderItemSerializer,
+    ChainVerificationSerializer
 )
+from math import ceil
+from types import GeneratorType
 import requests
 import uuid
 
+DASHBOARD_PAGE_SIZE = 50
+DASHBOARD_MAX_PAGE_SIZE = 500
+
+class EagerLoadingMixin:
+    """Apply the serializer's setup_eager_loading() so list rows never query per related object"""
+    
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        setup_eager_loading = getattr(self.get_serializer_class(), 'setup_eager_loading', None)
+        return setup_eager_loading(queryset) if setup_eager_loading else queryset
+
 class ManufacturerViewSet(viewsets.ModelViewSet):
     queryset = Manufacturer.objects.all()
     serializer_class = ManufacturerSerializer
+    keyset_ordering = ('-created_at', '-id')
 
 class DistributorViewSet(viewsets.ModelViewSet):
     queryset = Distributor.objects.all()
     serializer_class = DistributorSerializer
+    keyset_ordering = ('-created_at', '-id')
 
 class PharmacyViewSet(viewsets.ModelViewSet):
     queryset = Pharmacy.objects.all()
     serializer_class = PharmacySerializer
+    keyset_ordering = ('-created_at', '-id')
 
-class BatchViewSet(viewsets.ModelViewSet):
+class BatchViewSet(EagerLoadingMixin, viewsets.ModelViewSet):
     queryset = Batch.objects.all()
     serializer_class = BatchSerializer
+    keyset_ordering = ('-created_at', '-id')
 
-class TransactionViewSet(viewsets.ModelViewSet):
+class TransactionViewSet(EagerLoadingMixin, viewsets.ModelViewSet):
     queryset = Transaction.objects.all()
     serializer_class = TransactionSerializer
+    keyset_ordering = ('-timestamp', '-id')
+    
+    def perform_create(self, serializer):
+        apply_transactions([serializer.save()])
+    
+    # An edit or delete can reorder or retype history, so the affected
+    # batches are refolded from scratch instead of applied incrementally
+    def perform_update(self, serializer):
+        previous_batch_id = serializer.instance.batch_id
+        with db_transaction.atomic():
+            updated = serializer.save()
+            rebuild_batch_status(Batch.objects.filter(pk__in={previous_batch_id, updated.batch_id}))
+    
+    def perform_destroy(self, instance):
+        with db_transaction.atomic():
+            instance.delete()
+            rebuild_batch_status(Batch.objects.filter(pk=instance.batch_id))
 
-class PharmacyInventoryViewSet(viewsets.ModelViewSet):
+class PharmacyInventoryViewSet(EagerLoadingMixin, viewsets.ModelViewSet):
     queryset = PharmacyInventory.objects.all()
     serializer_class = PharmacyInventorySerializer
+    keyset_ordering = ('-date_added', '-id')
 
 @api_view(['POST'])
 def mint_batch(request):
@@ -83,12 +137,12 @@ def mint_batch(request):
             qr_code=qr_code
         )
         
-        Transaction.objects.create(
+        record_transactions([Transaction(
             batch=batch,
             transaction_type='MINT',
             to_wallet=batch_data['manufacturer_wallet'],
             tx_hash=batch_data['tx_hash']
-        )
+        )])
         
         return Response({
             'success': True,
@@ -103,38 +157,63 @@ def mint_batch(request):
             'error': str(e)
         }, status=status.HTTP_400_BAD_REQUEST)
 
-@api_view(['GET'])
-def verify_medicine(request, qr_code):
+@api_view(['POST'])
+@parser_classes([JSONParser, NDJSONParser])
+def mint_batch_bulk(request):
     try:
-        from .blockfrost_utils import get_asset_info
+        # Either {"manufacturer_id": ..., "batches": [...]} or a bare array / NDJSON
+        # stream with manufacturer_id (and manufacturer_wallet) in the query string
+        data = request.data
+        params = data if isinstance(data, dict) else request.query_params
+        batches = data.get('batches') if isinstance(data, dict) else data
+        manufacturer_id = params.get('manufacturer_id')
+        if not manufacturer_id:
+            return Response({
+                'success': False,
+                'error': 'manufacturer_id is required'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        if not isinstance(batches, (list, GeneratorType)):
+            return Response({
+                'success': False,
+                'error': 'batches must be a list'
+            }, status=status.HTTP_400_BAD_REQUEST)
         
-        batch = Batch.objects.get(qr_code=qr_code)
+        try:
+            manufacturer = Manufacturer.objects.get(id=manufacturer_id)
+        except Manufacturer.DoesNotExist:
+            return Response({
+                'success': False,
+                'error': f'Manufacturer with ID {manufacturer_id} does not exist. Please ensure your profile is fully set up.'
+            }, status=status.HTTP_400_BAD_REQUEST)
         
-        blockchain_data = None
-        if batch.policy_id and batch.asset_name:
-            result = get_asset_info(batch.policy_id, batch.asset_name)
-            if result['success']:
-                blockchain_data = result['data']
+        results = bulk_mint(manufacturer, batches, params.get('manufacturer_wallet'), chunk_size=settings.BULK_MINT_CHUNK_SIZE)
+        created = sum(1 for result in results if result['success'])
         
         return Response({
-            'success': True,
-            'medicine_name': batch.medicine_name,
-            'batch_id': batch.batch_id,
-            'manufacturer': batch.manufacturer.name,
-            'manufactured_date': batch.manufactured_date,
-            'expiry_date': batch.expiry_date,
-            'composition': batch.composition,
-            'verified': batch.nft_minted,
-            'policy_id': batch.policy_id,
-            'asset_name': batch.asset_name,
-            'blockchain_proof': blockchain_data
-        }, status=status.HTTP_200_OK)
+            'success': created == len(results),
+            'created': created,
+            'failed': len(results) - created,
+            'results': results
+        }, status=status.HTTP_201_CREATED if created else status.HTTP_400_BAD_REQUEST)
         
-    except Batch.DoesNotExist:
+    except Exception as e:
         return Response({
             'success': False,
-            'error': 'Invalid QR code'
-        }, status=status.HTTP_404_NOT_FOUND)
+            'error': str(e)
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+@api_view(['GET'])
+def verify_medicine(request, qr_code):
+    try:
+        entry = get_verification(qr_code)
+        if not entry['found']:
+            return Response({
+                'success': False,
+                'error': 'Invalid QR code'
+            }, status=status.HTTP_404_NOT_FOUND)
+        
+        return conditional_verification_response(request, entry, lambda payload: Response(payload, status=status.HTTP_200_OK))
+        
     except Exception as e:
         return Response({
             'success': False,
@@ -144,25 +223,19 @@ def verify_medicine(request, qr_code):
 @api_view(['GET'])
 def track_journey(request, batch_id):
     try:
-        batch = Batch.objects.get(batch_id=batch_id)
-        transactions = Transaction.objects.filter(batch=batch).order_by('timestamp')
-        
-        journey = []
-        for tx in transactions:
-            journey.append({
-                'type': tx.transaction_type,
-                'from': tx.from_wallet,
-                'to': tx.to_wallet,
-                'timestamp': tx.timestamp,
-                'tx_hash': tx.tx_hash
-            })
+        batch = Batch.objects.only('id', 'batch_id', 'medicine_name', 'policy_id', 'asset_name').get(batch_id=batch_id)
         
-        return Response({
-            'success': True,
-            'batch_id': batch_id,
-            'medicine_name': batch.medicine_name,
-            'journey': journey
-        }, status=status.HTTP_200_OK)
+        # Optionally fetch the on-chain history while the timeline is assembled
+        chain_history = None
+        if request.query_params.get('include_chain') in ('1', 'true', 'yes') and batch.policy_id and batch.asset_name:
+            chain_history = get_lookup_executor().submit(get_asset_history, batch.policy_id, batch.asset_name)
+        
+        response = {'success': True, **get_journey(batch)}
+        if chain_history is not None:
+            result = chain_history.result()
+            response['chain_history'] = to_plain_data(result['data']) if result['success'] else None
+        
+        return Response(response, status=status.HTTP_200_OK)
         
     except Batch.DoesNotExist:
         return Response({
@@ -178,7 +251,7 @@ def track_journey(request, batch_id):
 @api_view(['POST'])
 def transfer_batch(request):
     try:
-        from .blockfrost_utils import verify_wallet_has_asset, get_address_info, get_blockfrost_api
+        from .verification import check_transfer_holder, record_transfer, verification_mode_deferred, queue_verification
         
         transfer_data = request.data
         to_wallet = transfer_data.get('to_wallet')
@@ -195,35 +268,18 @@ def transfer_batch(request):
         asset_to_verify = batch.asset_name
         
         if policy_to_verify and asset_to_verify:
-            verification = verify_wallet_has_asset(to_wallet, policy_to_verify, asset_to_verify)
-            
-            # If standard check fails, try Stake Address match (handles HD wallet internal addresses)
-            if not verification.get('has_asset'):
-                target_info = get_address_info(to_wallet)
-                target_stake = target_info['data'].stake_address if target_info['success'] else None
-                
-                api = get_blockfrost_api()
-                holders = api.asset_addresses(f"{policy_to_verify}{asset_to_verify}")
-                if not isinstance(holders, list): holders = [holders] if hasattr(holders, 'address') else []
-
-                for holder_item in holders:
-                    holder_info = get_address_info(holder_item.address)
-                    holder_stake = holder_info['data'].stake_address if holder_info['success'] else None
-                    
-                    if target_stake and target_stake == holder_stake:
-                        verification = {'success': True, 'has_asset': True, 'quantity': holder_item.quantity}
-                        break
+            if verification_mode_deferred(request.data, request.query_params):
+                pending = queue_verification(ChainVerification.KIND_TRANSFER, batch, to_wallet, {
+                    'from_wallet': transfer_data['from_wallet'],
+                    'tx_hash': transfer_data['tx_hash']
+                })
+                return _verification_accepted(request, pending, batch)
             
+            verification = check_transfer_holder(to_wallet, policy_to_verify, asset_to_verify)
             if not verification.get('success') or not verification.get('has_asset'):
                 return Response({'success': False, 'error': 'Asset not found in receiving wallet'}, status=status.HTTP_400_BAD_REQUEST)
         
-        Transaction.objects.create(
-            batch=batch,
-            transaction_type='TRANSFER',
-            from_wallet=transfer_data['from_wallet'],
-            to_wallet=transfer_data['to_wallet'],
-            tx_hash=transfer_data['tx_hash']
-        )
+        record_transfer(batch, transfer_data['from_wallet'], transfer_data['to_wallet'], transfer_data['tx_hash'])
         
         return Response({
             'success': True,
@@ -242,6 +298,58 @@ def transfer_batch(request):
             'error': str(e)
         }, status=status.HTTP_400_BAD_REQUEST)
 
+@api_view(['POST'])
+def transfer_batch_bulk(request):
+    try:
+        from .verification import record_bulk_transfer
+        
+        transfer_data = request.data
+        batch_ids = transfer_data.get('batch_ids')
+        if not isinstance(batch_ids, list) or not batch_ids:
+            return Response({'success': False, 'error': 'batch_ids must be a non-empty list'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        missing = [field for field in ('from_wallet', 'to_wallet', 'tx_hash') if not transfer_data.get(field)]
+        if missing:
+            return Response({'success': False, 'error': f"Missing fields: {', '.join(missing)}"}, status=status.HTTP_400_BAD_REQUEST)
+        
+        # Every batch is checked against the outputs of the one shared transaction
+        results = record_bulk_transfer(batch_ids, transfer_data['from_wallet'], transfer_data['to_wallet'], transfer_data['tx_hash'])
+        recorded = sum(1 for result in results if result['success'])
+        
+        return Response({
+            'success': recorded == len(results),
+            'recorded': recorded,
+            'failed': len(results) - recorded,
+            'results': results
+        }, status=status.HTTP_201_CREATED if recorded else status.HTTP_400_BAD_REQUEST)
+        
+    except Exception as e:
+        return Response({
+            'success': False,
+            'error': str(e)
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+def _verification_accepted(request, pending, batch):
+    from .verification import verification_accepted_body
+    
+    return Response(verification_accepted_body(request, pending, batch), status=status.HTTP_202_ACCEPTED)
+
+@api_view(['GET'])
+def verification_status(request, verification_id):
+    try:
+        pending = ChainVerificationSerializer.setup_eager_loading(ChainVerification.objects.all()).get(id=verification_id)
+        serializer = ChainVerificationSerializer(pending)
+        
+        return Response({
+            'success': True,
+            'verification': serializer.data
+        }, status=status.HTTP_200_OK)
+        
+    except ChainVerification.DoesNotExist:
+        return Response({'error': 'Verification not found'}, status=status.HTTP_404_NOT_FOUND)
+    except Exception as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
 @api_view(['GET'])
 def pharmacy_dashboard_stats(request):
     try:
@@ -249,46 +357,12 @@ def pharmacy_dashboard_stats(request):
         if not wallet_address:
             return Response({'error': 'wallet_address required'}, status=status.HTTP_400_BAD_REQUEST)
         
-        # 1. Get Inventory
-        try:
-            pharmacy = Pharmacy.objects.get(wallet_address=wallet_address)
-            inventory = PharmacyInventory.objects.filter(pharmacy=pharmacy)
-            inventory_data = PharmacyInventorySerializer(inventory, many=True).data
-        except Pharmacy.DoesNotExist:
-            inventory_data = []
-            pharmacy = None
-
-        # 2. Get Incoming Transfers
-        # Any 'TRANSFER' transaction where to_wallet matches, 
-        # but the batch is NOT in the pharmacy's inventory yet.
-        incoming_txs = Transaction.objects.filter(
-            to_wallet=wallet_address,
-            transaction_type='TRANSFER'
-        ).select_related('batch')
-        
-        incoming_batches = []
-        already_in_inventory = set(PharmacyInventory.objects.filter(pharmacy=pharmacy).values_list('batch_id', flat=True)) if pharmacy else set()
-
-        for tx in incoming_txs:
-            if tx.batch.id not in already_in_inventory:
-                # Avoid duplicates if multiple transfers happened (take latest)
-                if not any(b['id'] == str(tx.batch.id) for b in incoming_batches):
-                    incoming_batches.append({
-                        'id': str(tx.batch.id),
-                        'batch_id': tx.batch.batch_id,
-                        'medicine_name': tx.batch.medicine_name,
-                        'composition': tx.batch.composition,
-                        'expiry_date': tx.batch.expiry_date,
-                        'from_wallet': tx.from_wallet,
-                        'timestamp': tx.timestamp
-                    })
-
+        entry = lookup_wallet(wallet_address, role=WalletDirectory.ROLE_PHARMACY)
+        dashboard = get_pharmacy_dashboard(wallet_address, entry['entity_id'] if entry else None)
+        
         return Response({
             'success': True,
-            'total_inventory': len(inventory_data),
-            'pending_transfers': len(incoming_batches),
-            'inventory': inventory_data,
-            'incoming': incoming_batches
+            **dashboard
         }, status=status.HTTP_200_OK)
         
     except Exception as e:
@@ -297,7 +371,7 @@ def pharmacy_dashboard_stats(request):
 @api_view(['POST'])
 def receive_batch(request):
     try:
-        from .blockfrost_utils import verify_wallet_has_asset
+        from .verification import check_receipt_holder, record_receipt, verification_mode_deferred, queue_verification
         
         data = request.data
         batch_id = data.get('batch_id')
@@ -309,38 +383,19 @@ def receive_batch(request):
             
         batch = Batch.objects.get(id=batch_id)
         
+        if verification_mode_deferred(request.data, request.query_params):
+            pending = queue_verification(ChainVerification.KIND_RECEIVE, batch, wallet_address, {
+                'price_per_unit': str(price)
+            })
+            return _verification_accepted(request, pending, batch)
+        
         # 1. Verify on blockchain
-        verification = verify_wallet_has_asset(wallet_address, batch.policy_id, batch.asset_name)
+        verification = check_receipt_holder(wallet_address, batch.policy_id, batch.asset_name)
         if not verification.get('has_asset'):
             return Response({'error': 'Asset not verified in your wallet on-chain'}, status=status.HTTP_400_BAD_REQUEST)
             
-        # 2. Get or create Pharmacy
-        pharmacy, created = Pharmacy.objects.get_or_create(
-            wallet_address=wallet_address,
-            defaults={'name': f"Pharmacy ({wallet_address[:8]}...)"}
-        )
-        
-        # 3. Add to inventory
-        inventory, created = PharmacyInventory.objects.update_or_create(
-            pharmacy=pharmacy,
-            batch=batch,
-            defaults={
-                'quantity_available': int(verification.get('quantity', 1)),
-                'price_per_unit': price,
-                'in_stock': True
-            }
-        )
-        
-        # 4. Record RECEIVED transaction
-        Transaction.objects.get_or_create(
-            batch=batch,
-            transaction_type='RECEIVED',
-            defaults={
-                'from_wallet': 'Unknown', 
-                'to_wallet': wallet_address,
-                'tx_hash': f"REC-{uuid.uuid4().hex[:16]}"
-            }
-        )
+        # 2. Add to inventory and record RECEIVED transaction
+        inventory = record_receipt(batch, wallet_address, price, int(verification.get('quantity', 1)))
         
         return Response({
             'success': True,
@@ -353,6 +408,31 @@ def receive_batch(request):
     except Exception as e:
         return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
+@api_view(['GET'])
+def export_transactions(request):
+    try:
+        # `format` is reserved by DRF content negotiation, hence export_format
+        export_format = request.query_params.get('export_format', 'csv')
+        if export_format not in EXPORT_FORMATS:
+            return Response({'error': f"export_format must be one of {', '.join(EXPORT_FORMATS)}"}, status=status.HTTP_400_BAD_REQUEST)
+        
+        journeys = request.query_params.get('group') == 'journey'
+        queryset = export_queryset(
+            manufacturer_id=request.query_params.get('manufacturer_id'),
+            batch_id=request.query_params.get('batch_id'),
+            start=parse_export_bound(request.query_params.get('start')),
+            end=parse_export_bound(request.query_params.get('end'), end=True),
+            journeys=journeys
+        )
+        
+        content_type = 'text/csv' if export_format == 'csv' else 'application/x-ndjson'
+        response = StreamingHttpResponse(export_lines(export_format, queryset, journeys), content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="transactions.{export_format}"'
+        return response
+        
+    except Exception as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
 @api_view(['GET'])
 def dashboard_stats(request):
     try:
@@ -361,59 +441,86 @@ def dashboard_stats(request):
         if not manufacturer_id:
             return Response({'error': 'manufacturer_id required'}, status=status.HTTP_400_BAD_REQUEST)
         
-        total_batches = Batch.objects.filter(manufacturer_id=manufacturer_id).count()
-        minted = Batch.objects.filter(manufacturer_id=manufacturer_id, nft_minted=True).count()
+        page = max(int(request.query_params.get('page', 1)), 1)
+        page_size = min(max(int(request.query_params.get('page_size', DASHBOARD_PAGE_SIZE)), 1), DASHBOARD_MAX_PAGE_SIZE)
         
         manufacturer_batches = Batch.objects.filter(manufacturer_id=manufacturer_id)
-        in_transit = Transaction.objects.filter(
-            batch__in=manufacturer_batches, 
-            transaction_type='TRANSFER'
-        ).values('batch').distinct().count()
-        
-        batch_list = []
-        
-        for batch in manufacturer_batches:
-            if batch.nft_minted:
-                # Check for receipt first
-                received = Transaction.objects.filter(batch=batch, transaction_type='RECEIVED').exists()
-                if received:
-                    status_text = "Delivered"
-                else:
-                    transfers = Transaction.objects.filter(batch=batch, transaction_type='TRANSFER').count()
-                    status_text = "In Transit" if transfers > 0 else "Minted"
-            else:
-                status_text = "Pending"
-            
-            batch_list.append({
-                'batch_id': batch.batch_id,
-                'medicine_name': batch.medicine_name,
-                'composition': batch.composition,
-                'expiry_date': batch.expiry_date,
-                'status': status_text,
-                'policy_id': batch.policy_id,
-                'asset_name': batch.asset_name
-            })
+        
+        stats = manufacturer_batches.aggregate(
+            total_batches=Count('pk'),
+            minted=Count('pk', filter=Q(nft_minted=True)),
+            in_transit=Count('pk', filter=Q(status=Batch.STATUS_IN_TRANSIT))
+        )
+        
+        batches = manufacturer_batches.order_by('-created_at', '-id').values(
+            'batch_id', 'medicine_name', 'composition', 'expiry_date', 'status', 'policy_id', 'asset_name'
+        )[(page - 1) * page_size:page * page_size]
+        
+        batch_list = [{
+            'batch_id': batch['batch_id'],
+            'medicine_name': batch['medicine_name'],
+            'composition': batch['composition'],
+            'expiry_date': batch['expiry_date'],
+            'status': batch['status'],
+            'policy_id': batch['policy_id'],
+            'asset_name': batch['asset_name']
+        } for batch in batches]
         
         return Response({
             'success': True,
-            'total_batches': total_batches,
-            'minted': minted,
-            'in_transit': in_transit,
+            'total_batches': stats['total_batches'],
+            'minted': stats['minted'],
+            'in_transit': stats['in_transit'],
+            'page': page,
+            'page_size': page_size,
+            'total_pages': max(ceil(stats['total_batches'] / page_size), 1),
             'batches': batch_list
         }, status=status.HTTP_200_OK)
         
     except Exception as e:
         return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
+@api_view(['GET'])
+def pharmacy_alerts(request):
+    try:
+        wallet_address = request.query_params.get('wallet_address')
+        if not wallet_address:
+            return Response({'error': 'wallet_address required'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        entry = lookup_wallet(wallet_address, role=WalletDirectory.ROLE_PHARMACY)
+        if not entry:
+            return Response({'error': 'Pharmacy not found'}, status=status.HTTP_404_NOT_FOUND)
+        
+        alerts = InventoryAlert.objects.filter(pharmacy_id=entry['entity_id'], resolved_at__isnull=True).values(
+            'id', 'kind', 'quantity_available', 'threshold', 'created_at',
+            'inventory_id', batch_id=F('inventory__batch__batch_id'), medicine_name=F('inventory__batch__medicine_name')
+        )
+        paginator = KeysetPagination()
+        page = paginator.paginate_queryset(alerts, request, ordering=('-created_at', '-id'))
+        
+        return Response({
+            'success': True,
+            'alerts': page,
+            'next': paginator.get_next_link()
+        }, status=status.HTTP_200_OK)
+        
+    except Exception as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
 @api_view(['GET'])
 def pharmacy_inventory(request, pharmacy_id):
     try:
-        inventory = PharmacyInventory.objects.filter(pharmacy_id=pharmacy_id, in_stock=True)
-        serializer = PharmacyInventorySerializer(inventory, many=True)
+        inventory = PharmacyInventorySerializer.setup_eager_loading(
+            PharmacyInventory.objects.filter(pharmacy_id=pharmacy_id, in_stock=True)
+        )
+        paginator = KeysetPagination()
+        page = paginator.paginate_queryset(inventory, request, ordering=('-date_added', '-id'))
+        serializer = PharmacyInventorySerializer(page, many=True)
         
         return Response({
             'success': True,
-            'inventory': serializer.data
+            'inventory': serializer.data,
+            'next': paginator.get_next_link()
         }, status=status.HTTP_200_OK)
         
     except Exception as e:
@@ -426,7 +533,7 @@ def get_cart(request):
         if not user_id:
             return Response({'error': 'user_id required'}, status=status.HTTP_400_BAD_REQUEST)
         
-        cart, created = Cart.objects.get_or_create(user_id=user_id)
+        cart, created = CartSerializer.setup_eager_loading(Cart.objects.all()).get_or_create(user_id=user_id)
         serializer = CartSerializer(cart)
         
         return Response({
@@ -447,6 +554,8 @@ def add_to_cart(request):
         cart, created = Cart.objects.get_or_create(user_id=user_id)
         inventory_item = PharmacyInventory.objects.get(id=inventory_id)
         
+        if not inventory_item.in_stock:
+            return Response({'error': 'Item is no longer available'}, status=status.HTTP_400_BAD_REQUEST)
         if quantity > inventory_item.quantity_available:
             return Response({'error': 'Not enough stock'}, status=status.HTTP_400_BAD_REQUEST)
         
@@ -487,9 +596,11 @@ def remove_from_cart(request, item_id):
 @api_view(['PUT'])
 def update_cart_item(request, item_id):
     try:
-        cart_item = CartItem.objects.get(id=item_id)
+        cart_item = CartItem.objects.select_related('inventory_item').get(id=item_id)
         quantity = request.data.get('quantity')
         
+        if not cart_item.inventory_item.in_stock:
+            return Response({'error': 'Item is no longer available'}, status=status.HTTP_400_BAD_REQUEST)
         if quantity > cart_item.inventory_item.quantity_available:
             return Response({'error': 'Not enough stock'}, status=status.HTTP_400_BAD_REQUEST)
         
@@ -525,46 +636,8 @@ def create_order(request):
         user_id = request.data.get('user_id')
         pharmacy_id = request.data.get('pharmacy_id')
         
-        cart = Cart.objects.get(user_id=user_id)
-        
-        if not cart.items.exists():
-            return Response({'error': 'Cart is empty'}, status=status.HTTP_400_BAD_REQUEST)
-        
-        # Verify all items belong to the same pharmacy if needed, 
-        # or filter cart items by pharmacy_id
         pharmacy = Pharmacy.objects.get(id=pharmacy_id)
-        
-        order = Order.objects.create(
-            user_id=user_id,
-            pharmacy_id=pharmacy_id,
-            total_amount=cart.total_price
-        )
-        
-        for cart_item in cart.items.all():
-            OrderItem.objects.create(
-                order=order,
-                inventory_item=cart_item.inventory_item,
-                quantity=cart_item.quantity,
-                price_per_unit=cart_item.inventory_item.price_per_unit,
-                subtotal=cart_item.subtotal
-            )
-            
-            # Record SOLD transaction for journey history
-            Transaction.objects.create(
-                batch=cart_item.inventory_item.batch,
-                transaction_type='SOLD',
-                from_wallet=pharmacy.wallet_address,
-                to_wallet=f"Patient-{user_id}",
-                tx_hash=f"SALE-{uuid.uuid4().hex[:16]}"
-            )
-            
-            inventory = cart_item.inventory_item
-            inventory.quantity_available -= cart_item.quantity
-            if inventory.quantity_available <= 0:
-                inventory.in_stock = False
-            inventory.save()
-        
-        cart.items.all().delete()
+        order = place_order(user_id, pharmacy)
         
         return Response({
             'success': True,
@@ -572,6 +645,10 @@ def create_order(request):
             'message': 'Order created successfully'
         }, status=status.HTTP_201_CREATED)
         
+    except Cart.DoesNotExist:
+        return Response({'error': 'Cart is empty'}, status=status.HTTP_400_BAD_REQUEST)
+    except CheckoutError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
     except Pharmacy.DoesNotExist:
         return Response({'error': 'Pharmacy not found'}, status=status.HTTP_404_NOT_FOUND)
     except Exception as e:
@@ -580,7 +657,7 @@ def create_order(request):
 @api_view(['GET'])
 def get_order(request, order_id):
     try:
-        order = Order.objects.get(id=order_id)
+        order = OrderSerializer.setup_eager_loading(Order.objects.all()).get(id=order_id)
         serializer = OrderSerializer(order)
         
         return Response({
@@ -595,12 +672,15 @@ def get_order(request, order_id):
 def get_user_orders(request):
     try:
         user_id = request.query_params.get('user_id')
-        orders = Order.objects.filter(user_id=user_id).order_by('-created_at')
-        serializer = OrderSerializer(orders, many=True)
+        orders = OrderSerializer.setup_eager_loading(Order.objects.filter(user_id=user_id))
+        paginator = KeysetPagination()
+        page = paginator.paginate_queryset(orders, request, ordering=('-created_at', '-id'))
+        serializer = OrderSerializer(page, many=True)
         
         return Response({
             'success': True,
-            'orders': serializer.data
+            'orders': serializer.data,
+            'next': paginator.get_next_link()
         }, status=status.HTTP_200_OK)
         
     except Exception as e:
@@ -645,11 +725,61 @@ def get_user(request, user_id):
 @api_view(['GET'])
 def list_marketplace_drugs(request):
     try:
-        inventory = PharmacyInventory.objects.filter(in_stock=True, quantity_available__gt=0)
-        serializer = PharmacyInventorySerializer(inventory, many=True)
+        inventory = PharmacyInventorySerializer.setup_eager_loading(
+            PharmacyInventory.objects.filter(in_stock=True, quantity_available__gt=0)
+        )
+        paginator = KeysetPagination()
+        page = paginator.paginate_queryset(inventory, request, ordering=('-date_added', '-id'))
+        serializer = PharmacyInventorySerializer(page, many=True)
+        return Response({
+            'success': True,
+            'drugs': serializer.data,
+            'next': paginator.get_next_link()
+        }, status=status.HTTP_200_OK)
+    except Exception as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+def serialize_listings(entries):
+    """Serialize the inventory rows behind InventorySearch entries, keeping their order"""
+    inventory = PharmacyInventorySerializer.setup_eager_loading(
+        PharmacyInventory.objects.filter(pk__in=[entry.inventory_id for entry in entries])
+    ).in_bulk()
+    return PharmacyInventorySerializer([inventory[entry.inventory_id] for entry in entries], many=True).data
+
+@api_view(['GET'])
+def search_marketplace(request):
+    try:
+        entries, facet_base, ordering = search_listings(request.query_params)
+        
+        paginator = KeysetPagination()
+        page = paginator.paginate_queryset(entries.only('id', 'inventory_id', 'price_per_unit', 'expiry_date'), request, ordering=ordering)
+        
+        response = {
+            'success': True,
+            'drugs': serialize_listings(page),
+            'next': paginator.get_next_link()
+        }
+        # Facets aggregate every match, so they are only computed on request
+        if request.query_params.get('facets') == 'true':
+            response['facets'] = search_facets(facet_base)
+        return Response(response, status=status.HTTP_200_OK)
+    except Exception as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+@api_view(['GET'])
+def cheapest_marketplace_listings(request):
+    try:
+        entries = cheapest_listings(
+            medicine=request.query_params.get('medicine'),
+            composition=request.query_params.get('composition'),
+            limit=request.query_params.get('limit', CHEAPEST_LIMIT),
+            per_pharmacy=request.query_params.get('per_pharmacy') == 'true',
+            pharmacies=request.query_params.getlist('pharmacy')
+        )
+        
         return Response({
             'success': True,
-            'drugs': serializer.data
+            'drugs': serialize_listings(list(entries.only('id', 'inventory_id')))
         }, status=status.HTTP_200_OK)
     except Exception as e:
         return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
@@ -659,11 +789,12 @@ def list_users_by_role(request):
     try:
         role = request.query_params.get('role')
         
+        users = User.objects.select_related('profile')
         if role:
-            profiles = UserProfile.objects.filter(role=role)
-            users = [profile.user for profile in profiles]
-        else:
-            users = User.objects.all()
+            users = users.filter(profile__role=role)
+        
+        paginator = KeysetPagination()
+        page = paginator.paginate_queryset(users, request, ordering=('-date_joined', '-id'))
         
         user_list = [{
             'id': user.id,
@@ -671,12 +802,21 @@ def list_users_by_role(request):
             'email': user.email,
             'role': user.profile.role,
             'date_joined': user.date_joined
-        } for user in users]
+        } for user in page]
         
         return Response({
             'success': True,
-            'users': user_list
+            'users': user_list,
+            'next': paginator.get_next_link()
         }, status=status.HTTP_200_OK)
         
     except Exception as e:
-        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
\ No newline at end of file
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+def metrics(request):
+    """Prometheus scrape endpoint for this worker's request metrics"""
+    if not settings.METRICS_ENABLED:
+        raise Http404
+    if not scrape_allowed(request):
+        return HttpResponseForbidden('Metrics require a staff session or the METRICS_TOKEN bearer token')
+    return HttpResponse(render_metrics(blockfrost_cache_stats()), content_type=PROMETHEUS_CONTENT_TYPE)
@@ -0,0 +1,81 @@
+from django.core.exceptions import ValidationError
+
+from .models import Manufacturer, Distributor, Pharmacy, WalletDirectory
+
+# Every entity model that owns a wallet, by WalletDirectory role
+ENTITY_MODELS = {
+    WalletDirectory.ROLE_MANUFACTURER: Manufacturer,
+    WalletDirectory.ROLE_DISTRIBUTOR: Distributor,
+    WalletDirectory.ROLE_PHARMACY: Pharmacy,
+}
+ENTITY_ROLES = {model: role for role, model in ENTITY_MODELS.items()}
+
+
+def sync_wallet_entries(entities):
+    """Upsert the directory rows for saved entities (any mix of the entity models)"""
+    WalletDirectory.objects.bulk_create(
+        [
+            WalletDirectory(
+                wallet_address=entity.wallet_address,
+                role=ENTITY_ROLES[type(entity)],
+                entity_id=entity.pk,
+                name=entity.name
+            )
+            for entity in entities
+        ],
+        update_conflicts=True,
+        unique_fields=['role', 'entity_id'],
+        update_fields=['wallet_address', 'name']
+    )
+
+
+def remove_wallet_entry(entity):
+    WalletDirectory.objects.filter(role=ENTITY_ROLES[type(entity)], entity_id=entity.pk).delete()
+
+
+def rebuild_wallet_directory(chunk_size=1000):
+    """Resync the directory from the entity tables, e.g. after rows were bulk created without signals"""
+    total = 0
+    for role, model in ENTITY_MODELS.items():
+        chunk = []
+        for entity in model.objects.only('id', 'name', 'wallet_address').iterator(chunk_size=chunk_size):
+            chunk.append(entity)
+            if len(chunk) == chunk_size:
+                sync_wallet_entries(chunk)
+                total += len(chunk)
+                chunk = []
+        sync_wallet_entries(chunk)
+        total += len(chunk)
+        ids = model.objects.values('id')
+        WalletDirectory.objects.filter(role=role).exclude(entity_id__in=ids).delete()
+    return total
+
+
+def resolve_wallets(wallet_addresses, role=None):
+    """Map wallet -> {'role', 'entity_id', 'name'} for many wallets in one indexed query"""
+    wallet_addresses = {wallet for wallet in wallet_addresses if wallet}
+    if not wallet_addresses:
+        return {}
+    entries = WalletDirectory.objects.filter(wallet_address__in=wallet_addresses)
+    if role:
+        entries = entries.filter(role=role)
+    # A wallet registered under several roles resolves to the first role alphabetically
+    resolved = {}
+    for wallet, entry_role, entity_id, name in entries.order_by('-role').values_list('wallet_address', 'role', 'entity_id', 'name'):
+        resolved[wallet] = {'role': entry_role, 'entity_id': entity_id, 'name': name}
+    return resolved
+
+
+def lookup_wallet(wallet_address, role=None):
+    """Return {'role', 'entity_id', 'name'} for one wallet, or None"""
+    return resolve_wallets([wallet_address], role).get(wallet_address)
+
+
+def entity_name(role, entity_id):
+    """Name of the entity behind a user profile, or None"""
+    if role not in ENTITY_MODELS or not entity_id:
+        return None
+    try:
+        return WalletDirectory.objects.filter(role=role, entity_id=entity_id).values_list('name', flat=True).first()
+    except ValidationError:
+        return None